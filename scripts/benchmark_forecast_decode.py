@@ -0,0 +1,111 @@
+"""Micro-benchmark for decoding GetForecastAsTimeseries responses.
+
+Compares the previous per-row dict decoding with the columnar decoder in
+dataplatform.forecast.decode, and prints rows/sec for both.
+
+Run from the repo root with:
+
+    PYTHONPATH=src python scripts/benchmark_forecast_decode.py --rows 100000
+"""
+
+import argparse
+import datetime
+import time
+
+import pandas as pd
+from google.protobuf.timestamp_pb2 import Timestamp
+from ocf.dp.dp_data import messages_pb2
+
+from dataplatform.forecast.decode import decode_forecast_timeseries
+
+
+def make_response(n_rows: int) -> messages_pb2.GetForecastAsTimeseriesResponse:
+    """Make a synthetic response with 5 minute targets and 30 minute init times."""
+    start = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    values = []
+    for i in range(n_rows):
+        target = start + datetime.timedelta(minutes=5 * i)
+        init = target - datetime.timedelta(minutes=30 * (i % 48))
+        values.append(
+            {
+                "target_timestamp_utc": Timestamp(seconds=int(target.timestamp())),
+                "initialization_timestamp_utc": Timestamp(seconds=int(init.timestamp())),
+                "created_timestamp_utc": Timestamp(seconds=int(init.timestamp()) + 600),
+                "effective_capacity_watts": 1_000_000,
+                "p50_value_fraction": 0.5,
+                "other_statistics_fractions": {"p10": 0.4, "p90": 0.6},
+            },
+        )
+    return messages_pb2.GetForecastAsTimeseriesResponse(
+        location_uuid="00000000-0000-0000-0000-000000000000",
+        values=values,
+    )
+
+
+def decode_rows(
+    resp: messages_pb2.GetForecastAsTimeseriesResponse,
+    forecaster_name: str,
+) -> pd.DataFrame:
+    """The previous decoding, one dict per value."""
+    rows = []
+    for val in resp.values:
+        row = {
+            "target_timestamp_utc": val.target_timestamp_utc.ToDatetime(tzinfo=datetime.UTC),
+            "initialization_timestamp_utc": val.initialization_timestamp_utc.ToDatetime(
+                tzinfo=datetime.UTC,
+            ),
+            "created_timestamp_utc": val.created_timestamp_utc.ToDatetime(tzinfo=datetime.UTC),
+            "effective_capacity_watts": val.effective_capacity_watts,
+            "forecaster_name": forecaster_name,
+            "location_uuid": resp.location_uuid,
+            "horizon_mins": (
+                val.target_timestamp_utc.ToDatetime(tzinfo=datetime.UTC)
+                - val.initialization_timestamp_utc.ToDatetime(tzinfo=datetime.UTC)
+            ).total_seconds()
+            // 60,
+            "p50_watts": int(val.p50_value_fraction * val.effective_capacity_watts),
+        }
+        if val.other_statistics_fractions:
+            row.update(
+                {
+                    f"{k}_watts": int(v * val.effective_capacity_watts)
+                    for k, v in val.other_statistics_fractions.items()
+                },
+            )
+        rows.append(row)
+
+    df = pd.DataFrame(rows)
+    df["target_timestamp_utc"] = pd.to_datetime(df["target_timestamp_utc"])
+    df["initialization_timestamp_utc"] = pd.to_datetime(df["initialization_timestamp_utc"])
+    return df
+
+
+def time_decoder(decoder: callable, resp, repeats: int) -> float:
+    """Return the best time in seconds over a number of repeats."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decoder(resp, "pvnet_v2")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    resp = make_response(args.rows)
+
+    for name, decoder in [
+        ("per-row dicts", decode_rows),
+        ("columnar", decode_forecast_timeseries),
+    ]:
+        seconds = time_decoder(decoder, resp, args.repeats)
+        print(f"{name:>15}: {seconds:8.3f} s, {args.rows / seconds:12,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
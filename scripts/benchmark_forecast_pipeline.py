@@ -0,0 +1,239 @@
+"""Benchmark suite for the dataplatform.forecast pipeline, with regression thresholds.
+
+Times protobuf decoding, the forecast and observation join, align_t0, building the
+accuracy cube, the summary tables, the quantile plot, the forecast revisions, and building
+and serializing the time series figure, on synthetic frames of each size. The results are written as JSON,
+and can be compared with a baseline JSON from an earlier run. A benchmark has regressed
+if it is slower than the baseline by more than its threshold, and then the script exits
+with status 1, so it can be run before a deploy.
+
+Run from the repo root with:
+
+    PYTHONPATH=src python scripts/benchmark_forecast_pipeline.py \\
+        --sizes 10000,100000,1000000 --output benchmark.json
+
+    PYTHONPATH=src python scripts/benchmark_forecast_pipeline.py \\
+        --baseline benchmark.json --thresholds scripts/benchmark_thresholds.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmark_forecast_decode import make_response
+from dataplatform.forecast.constant import observer_names
+from dataplatform.forecast.data import align_t0
+from dataplatform.forecast.decode import decode_forecast_timeseries
+from dataplatform.forecast.downsample import max_points_for_width
+from dataplatform.forecast.join import join_observations
+from dataplatform.forecast.metrics import make_metric_cube
+from dataplatform.forecast.plot import (
+    make_summary_data,
+    make_summary_data_metric_vs_horizon_minutes,
+    plot_forecast_time_series,
+    plot_quantile_plot,
+)
+from dataplatform.forecast.revisions import make_revisions
+
+forecaster_names = ["pvnet_v2", "blend"]
+n_horizons = 48
+
+# a benchmark can be this much slower than the baseline before it counts as a regression
+default_threshold = 1.25
+# differences smaller than this are timing noise
+min_regression_seconds = 0.005
+
+
+def make_forecasts(n_rows: int) -> pd.DataFrame:
+    """Synthetic forecasts, like fetch_timeseries returns, for two forecasters."""
+    rng = np.random.default_rng(0)
+    n_per_forecaster = max(n_rows // len(forecaster_names), n_horizons)
+    n_inits = n_per_forecaster // n_horizons
+    inits = pd.date_range("2025-01-01", periods=n_inits, freq="30min", tz="UTC")
+    horizons = np.tile(np.arange(n_horizons) * 30, n_inits)
+    init_timestamps = np.repeat(inits, n_horizons)
+
+    dfs = []
+    for forecaster_name in forecaster_names:
+        p50_watts = rng.uniform(0, 1_000_000, len(horizons))
+        dfs.append(
+            pd.DataFrame(
+                {
+                    "forecaster_name": forecaster_name,
+                    "initialization_timestamp_utc": init_timestamps,
+                    "init_timestamp": init_timestamps,
+                    "target_timestamp_utc": init_timestamps + pd.to_timedelta(horizons, unit="m"),
+                    "horizon_mins": horizons,
+                    "effective_capacity_watts": 1_000_000,
+                    "p10_watts": p50_watts * 0.8,
+                    "p50_watts": p50_watts,
+                    "p90_watts": p50_watts * 1.2,
+                },
+            ),
+        )
+    return pd.concat(dfs, ignore_index=True)
+
+
+def make_observations(forecast_df: pd.DataFrame) -> pd.DataFrame:
+    """Synthetic observations at every target time, from each observer."""
+    rng = np.random.default_rng(1)
+    targets = forecast_df["target_timestamp_utc"].drop_duplicates().sort_values()
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "target_timestamp_utc": targets.to_numpy(),
+                    "observer_name": observer_name,
+                    "value_watts": rng.uniform(0, 1_000_000, len(targets)),
+                    "effective_capacity_watts": 1_000_000,
+                },
+            )
+            for observer_name in observer_names
+        ],
+        ignore_index=True,
+    )
+
+
+def make_benchmarks(n_rows: int) -> dict[str, Callable[[], object]]:
+    """The benchmarks for one size, with their synthetic data made up front."""
+    response = make_response(n_rows)
+    forecast_df = make_forecasts(n_rows)
+    observations_df = make_observations(forecast_df)
+    merged_df = join_observations(forecast_df, observations_df)
+    merged_df["error"] = merged_df["p50_watts"] - merged_df["value_watts"]
+    cube = make_metric_cube(merged_df)
+
+    def time_series_figure():
+        return plot_forecast_time_series(
+            all_forecast_data_df=forecast_df,
+            all_observations_df=observations_df,
+            forecaster_names=forecaster_names,
+            observer_names=observer_names,
+            scale_factor=1e6,
+            units="MW",
+            selected_forecast_type="Current",
+            selected_forecast_horizon=0,
+            selected_t0s=None,
+            max_points_per_trace=max_points_for_width(),
+        )
+
+    figure = time_series_figure()
+
+    return {
+        "decode_forecast_timeseries": lambda: decode_forecast_timeseries(response, "pvnet_v2"),
+        "join_observations": lambda: join_observations(forecast_df, observations_df),
+        "align_t0": lambda: align_t0(merged_df),
+        "make_metric_cube": lambda: make_metric_cube(merged_df),
+        "make_summary_data": lambda: make_summary_data(cube, 0, 24 * 60, 1e6, "MW"),
+        "make_summary_data_metric_vs_horizon_minutes": (
+            lambda: make_summary_data_metric_vs_horizon_minutes(cube)
+        ),
+        "plot_quantile_plot": lambda: plot_quantile_plot(cube, forecaster_names),
+        "make_revisions": lambda: make_revisions(forecast_df),
+        "plot_forecast_time_series": time_series_figure,
+        "serialize_time_series_figure": figure.to_json,
+    }
+
+
+def best_seconds(benchmark: Callable[[], object], repeats: int) -> float:
+    """The best time in seconds over a number of repeats."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        benchmark()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: list[int], repeats: int, only: list[str] | None) -> list[dict]:
+    """Run the benchmarks for each size, printing each result."""
+    results = []
+    for n_rows in sizes:
+        for name, benchmark in make_benchmarks(n_rows).items():
+            if only and name not in only:
+                continue
+            seconds = best_seconds(benchmark, repeats)
+            results.append({"benchmark": name, "rows": n_rows, "seconds": seconds})
+            print(f"{name:>45} {n_rows:>9,} rows: {seconds:8.4f} s")
+    return results
+
+
+def find_regressions(
+    results: list[dict],
+    baseline: list[dict],
+    thresholds: dict[str, float],
+) -> list[str]:
+    """Messages for the results slower than the baseline by more than their threshold."""
+    baseline_seconds = {(r["benchmark"], r["rows"]): r["seconds"] for r in baseline}
+    regressions = []
+    for result in results:
+        before = baseline_seconds.get((result["benchmark"], result["rows"]))
+        if before is None:
+            continue
+        threshold = thresholds.get(result["benchmark"], thresholds.get("default", default_threshold))
+        if (
+            result["seconds"] > before * threshold
+            and result["seconds"] - before > min_regression_seconds
+        ):
+            regressions.append(
+                f"{result['benchmark']} at {result['rows']:,} rows took "
+                f"{result['seconds']:.4f} s, {result['seconds'] / before:.2f}x the baseline "
+                f"{before:.4f} s, over the {threshold:.2f}x threshold",
+            )
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmarks, write the results and check them against a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", default="", help="comma separated benchmark names")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="JSON results of an earlier run")
+    parser.add_argument(
+        "--thresholds",
+        type=Path,
+        help='JSON of slowdown thresholds per benchmark, e.g. {"default": 1.25}',
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = [name for name in args.only.split(",") if name]
+    results = run(sizes, args.repeats, only)
+
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "created_utc": datetime.now(tz=UTC).isoformat(),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "results": results,
+                },
+                indent=2,
+            ),
+        )
+
+    if args.baseline:
+        thresholds = json.loads(args.thresholds.read_text()) if args.thresholds else {}
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = find_regressions(results, baseline, thresholds)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
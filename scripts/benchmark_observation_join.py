@@ -0,0 +1,94 @@
+"""Micro-benchmark for joining forecasts with observations.
+
+Compares the previous pd.merge on target_timestamp_utc, which keeps a row per observer,
+with dataplatform.forecast.join.join_observations, and prints rows/sec for both.
+
+Run from the repo root with:
+
+    PYTHONPATH=src python scripts/benchmark_observation_join.py --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.forecast.constant import observer_names
+from dataplatform.forecast.join import join_observations
+
+
+def make_data(n_rows: int) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Make synthetic forecasts, with 48 horizons, and 30 minute observations per observer."""
+    rng = np.random.default_rng(0)
+    n_targets = max(n_rows // 48, 1)
+    targets = pd.date_range("2025-01-01", periods=n_targets, freq="30min", tz="UTC")
+
+    forecast_df = pd.DataFrame(
+        {
+            "target_timestamp_utc": np.repeat(targets, 48)[:n_rows],
+            "horizon_mins": np.tile(np.arange(48) * 30, n_targets)[:n_rows],
+            "forecaster_name": "pvnet_v2",
+            "p50_watts": rng.integers(0, 1_000_000, min(n_rows, n_targets * 48)),
+            "effective_capacity_watts": 1_000_000,
+        },
+    )
+    observations_df = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "target_timestamp_utc": targets,
+                    "observer_name": observer_name,
+                    "value_watts": rng.integers(0, 1_000_000, n_targets),
+                    "effective_capacity_watts": 1_000_000,
+                },
+            )
+            for observer_name in observer_names
+        ],
+        ignore_index=True,
+    )
+    return forecast_df, observations_df
+
+
+def merge_all_observers(forecast_df: pd.DataFrame, observations_df: pd.DataFrame) -> pd.DataFrame:
+    """The previous join, a row per forecast and observer."""
+    return pd.merge(
+        forecast_df,
+        observations_df,
+        on="target_timestamp_utc",
+        suffixes=("", "_observation"),
+    )
+
+
+def time_join(join: callable, forecast_df, observations_df, repeats: int) -> tuple[float, int]:
+    """Return the best time in seconds over a number of repeats, and the rows joined."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        merged_df = join(forecast_df, observations_df)
+        best = min(best, time.perf_counter() - start)
+    return best, len(merged_df)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    forecast_df, observations_df = make_data(args.rows)
+
+    for name, join in [
+        ("pd.merge", merge_all_observers),
+        ("join_observations", join_observations),
+    ]:
+        seconds, n_merged = time_join(join, forecast_df, observations_df, args.repeats)
+        print(
+            f"{name:>17}: {seconds:8.3f} s, {len(forecast_df) / seconds:12,.0f} rows/sec, "
+            f"{n_merged:,} rows out",
+        )
+
+
+if __name__ == "__main__":
+    main()
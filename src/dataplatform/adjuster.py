@@ -8,7 +8,6 @@ import asyncio
 import os
 from datetime import UTC, datetime, time
 
-import grpc.aio
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
@@ -16,9 +15,12 @@ from aiocache import Cache, cached
 from ocf.dp.dp import common_pb2
 from ocf.dp.dp_data import messages_pb2, service_pb2_grpc
 
+from dataplatform.channels import get_channel_manager
 from dataplatform.forecast.cache import key_builder_remove_client
 from dataplatform.forecast.constant import cache_seconds, observer_names
+from dataplatform.forecast.scheduler import RpcScheduler, ScheduledDataPlatformClient
 from dataplatform.forecast.setup import get_forecasters, get_location_names
+from export import lazy_download_button
 
 
 @cached(ttl=cache_seconds, cache=Cache.MEMORY, key_builder=key_builder_remove_client)
@@ -70,8 +72,9 @@ async def _async_dp_adjuster_page() -> None:
 
     data_platform_host = os.getenv("DATA_PLATFORM_HOST", "localhost")
     data_platform_port = int(os.getenv("DATA_PLATFORM_PORT", "50051"))
-    channel = grpc.aio.insecure_channel(f"{data_platform_host}:{data_platform_port}")
-    client = service_pb2_grpc.DataPlatformDataServiceStub(channel)
+    client = ScheduledDataPlatformClient(
+        get_channel_manager().client(data_platform_host, data_platform_port), RpcScheduler(),
+    )
 
     # Location type + location
     location_types = [
@@ -235,15 +238,16 @@ async def _async_dp_adjuster_page() -> None:
     st.subheader("Adjuster Values")
     st.dataframe(df)
 
-    st.download_button(
+    lazy_download_button(
         label="⬇️ Download adjuster values",
-        data=df.to_csv(index=False).encode("utf-8"),
+        df=df,
         file_name=(
             f"adjuster_{selected_location.location_uuid}_"
             f"{selected_forecaster.forecaster_name}_"
-            f"{pivot_timestamp_utc.date()}.csv"
+            f"{pivot_timestamp_utc.date()}"
         ),
-        mime="text/csv",
+        key="download_adjuster_values",
+        index=False,
     )
 
 # Required for the tests to run this as a script
@@ -0,0 +1,185 @@
+"""Process-wide gRPC channels for the Data Platform pages.
+
+grpc.aio channels are tied to the event loop they were made on, and each Streamlit rerun
+makes a new loop with asyncio.run. So the ChannelManager owns one event loop in a background
+thread, keeps long-lived channels on it, and runs every call there. Pages get a stub-like
+SharedChannelClient, which can be awaited from any loop, so the channels are reused across
+reruns, sessions and pages.
+"""
+
+import asyncio
+import dataclasses
+import threading
+from collections.abc import AsyncIterator, Callable, Coroutine
+
+import grpc
+import pandas as pd
+import streamlit as st
+from ocf.dp.dp_data import service_pb2_grpc
+
+channel_options = [
+    ("grpc.keepalive_time_ms", 30_000),
+    ("grpc.keepalive_timeout_ms", 10_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+]
+
+# Server streaming methods of the DataPlatformDataServiceStub, all others are unary
+streaming_methods = {"StreamForecastData"}
+
+_end_of_stream = object()
+
+
+@dataclasses.dataclass
+class RpcCounter:
+    """Counts of the RPCs sent for one target and method."""
+
+    started: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    in_flight: int = 0
+
+
+class ChannelManager:
+    """Long-lived gRPC channels on a dedicated event loop thread."""
+
+    def __init__(self) -> None:
+        """Start the event loop thread, channels are made when first used."""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="dataplatform-grpc", daemon=True,
+        )
+        self.thread.start()
+        # only touched from the event loop thread
+        self.channels: dict[str, grpc.aio.Channel] = {}
+        self.stubs: dict[str, service_pb2_grpc.DataPlatformDataServiceStub] = {}
+        self.counters: dict[tuple[str, str], RpcCounter] = {}
+
+    def client(self, host: str, port: int) -> "SharedChannelClient":
+        """Get a stub-like client for the Data Platform at host:port."""
+        return SharedChannelClient(self, f"{host}:{port}")
+
+    def _stub(self, target: str) -> service_pb2_grpc.DataPlatformDataServiceStub:
+        """Get the stub for a target, making the channel if needed. Runs on the loop thread."""
+        if target not in self.channels:
+            self.channels[target] = grpc.aio.insecure_channel(target, options=channel_options)
+            self.stubs[target] = service_pb2_grpc.DataPlatformDataServiceStub(
+                self.channels[target],
+            )
+        return self.stubs[target]
+
+    def _counter(self, target: str, method: str) -> RpcCounter:
+        return self.counters.setdefault((target, method), RpcCounter())
+
+    async def _on_loop(self, coro: Coroutine) -> object:
+        """Run a coroutine on the channel loop and await it from the caller's loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    async def _unary(
+        self, target: str, method: str, request: object, timeout: float | None,
+    ) -> object:
+        counter = self._counter(target, method)
+        counter.started += 1
+        counter.in_flight += 1
+        try:
+            response = await getattr(self._stub(target), method)(request, timeout=timeout)
+            counter.succeeded += 1
+            return response
+        except BaseException:
+            counter.failed += 1
+            raise
+        finally:
+            counter.in_flight -= 1
+
+    async def unary(
+        self, target: str, method: str, request: object, timeout: float | None = None,
+    ) -> object:
+        """Call a unary RPC on the channel loop."""
+        return await self._on_loop(self._unary(target, method, request, timeout))
+
+    async def _stream(
+        self, target: str, method: str, request: object, timeout: float | None,
+    ) -> AsyncIterator:
+        counter = self._counter(target, method)
+        counter.started += 1
+        counter.in_flight += 1
+        call = getattr(self._stub(target), method)(request, timeout=timeout)
+        try:
+            async for message in call:
+                yield message
+            counter.succeeded += 1
+        except GeneratorExit:
+            # the caller stopped reading early
+            raise
+        except BaseException:
+            counter.failed += 1
+            raise
+        finally:
+            counter.in_flight -= 1
+            call.cancel()
+
+    @staticmethod
+    async def _next(stream: AsyncIterator) -> object:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return _end_of_stream
+
+    async def stream(
+        self, target: str, method: str, request: object, timeout: float | None = None,
+    ) -> AsyncIterator:
+        """Call a server streaming RPC on the channel loop, yielding its messages."""
+        stream = self._stream(target, method, request, timeout)
+        try:
+            while (message := await self._on_loop(self._next(stream))) is not _end_of_stream:
+                yield message
+        finally:
+            await self._on_loop(stream.aclose())
+
+    def health(self) -> pd.DataFrame:
+        """Connectivity state of each channel and RPC counters per method."""
+
+        async def get_health() -> list[dict]:
+            return [
+                {
+                    "target": target,
+                    "method": method,
+                    "state": self.channels[target].get_state().name
+                    if target in self.channels
+                    else "NOT CONNECTED",
+                    **dataclasses.asdict(counter),
+                }
+                for (target, method), counter in self.counters.items()
+            ]
+
+        rows = asyncio.run_coroutine_threadsafe(get_health(), self.loop).result(timeout=5)
+        return pd.DataFrame(
+            rows,
+            columns=["target", "method", "state", *[f.name for f in dataclasses.fields(RpcCounter)]],
+        )
+
+
+class SharedChannelClient:
+    """DataPlatformDataServiceStub-like client that runs its calls on a ChannelManager."""
+
+    def __init__(self, manager: ChannelManager, target: str) -> None:
+        """Make a client for one target of the manager."""
+        self.manager = manager
+        self.target = target
+
+    def __getattr__(self, method: str) -> Callable:
+        """Get a stub method, which can be called from any event loop."""
+        if method in streaming_methods:
+            return lambda request, timeout=None: self.manager.stream(
+                self.target, method, request, timeout,
+            )
+        return lambda request, timeout=None: self.manager.unary(
+            self.target, method, request, timeout,
+        )
+
+
+@st.cache_resource
+def get_channel_manager() -> ChannelManager:
+    """Get the channel manager, shared by all the sessions in this process."""
+    return ChannelManager()
@@ -0,0 +1,484 @@
+"""In-process fake Data Platform, serving synthetic data over grpc.aio.
+
+FakeDataPlatform runs a real grpc.aio server on localhost, with a DataPlatformDataService
+that makes its data up: a solar curve for observations, and forecasts that drift from it
+with horizon. The volume and density of the data, and the latency and error rate of the
+calls, are set with a FakeDataConfig. So the Data Platform pages, and the fetch, decode
+and plot code, can be run and benchmarked without Docker or a network, e.g.
+
+    python -m dataplatform.fake_service --port 50051
+
+and then DATA_PLATFORM_HOST=localhost DATA_PLATFORM_PORT=50051 for the app.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import random
+import uuid
+from collections import Counter
+from datetime import UTC, datetime
+from typing import Self
+
+import grpc
+import numpy as np
+from google.protobuf.timestamp_pb2 import Timestamp
+from ocf.dp.dp import common_pb2
+from ocf.dp.dp_data import messages_pb2, service_pb2_grpc
+
+from dataplatform.forecast.constant import observer_names, plevel_names
+
+NANOS_PER_SECOND = 1_000_000_000
+NANOS_PER_MINUTE = 60 * NANOS_PER_SECOND
+NANOS_PER_DAY = 24 * 60 * NANOS_PER_MINUTE
+
+# spread of each p-level around p50, as a fraction of p50 at the longest horizon
+plevel_spreads = {"p10": -0.4, "p25": -0.2, "p75": 0.2, "p90": 0.4}
+
+
+@dataclasses.dataclass
+class FakeDataConfig:
+    """Synthetic data and behaviour of a FakeDataPlatform."""
+
+    n_gsps: int = 5
+    n_sites: int = 10
+    forecasters: list[tuple[str, str]] = dataclasses.field(
+        default_factory=lambda: [("pvnet_v2", "1.0.0"), ("pvnet_v2", "0.9.0"), ("blend", "2.1")],
+    )
+    observers: list[str] = dataclasses.field(default_factory=lambda: list(observer_names))
+    plevels: list[str] = dataclasses.field(default_factory=lambda: list(plevel_names))
+    init_interval_minutes: int = 30
+    target_interval_minutes: int = 30
+    max_horizon_minutes: int = 36 * 60
+    observation_interval_minutes: int = 30
+    capacity_watts: int = 10_000_000
+    # how far forecasts drift from the observations at the longest horizon
+    forecast_error: float = 0.2
+    latency_seconds: float = 0.0
+    latency_jitter_seconds: float = 0.0
+    error_rate: float = 0.0
+    error_code: grpc.StatusCode = grpc.StatusCode.UNAVAILABLE
+    stream_chunk_size: int = 1000
+    seed: int = 0
+
+
+@dataclasses.dataclass
+class FakeLocation:
+    """A location of the fake Data Platform."""
+
+    location_uuid: str
+    location_name: str
+    location_type: int
+    capacity_watts: int
+    index: int
+    gsp_id: int | None = None
+
+
+def make_locations(config: FakeDataConfig) -> list[FakeLocation]:
+    """One nation, then the GSPs and sites, with uuids that are the same for a seed."""
+    rng = random.Random(config.seed)
+
+    def new_uuid() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    locations = [
+        FakeLocation(
+            new_uuid(), "National", common_pb2.LocationType.LOCATION_TYPE_NATION,
+            config.capacity_watts * (config.n_gsps + 1), 0, gsp_id=0,
+        ),
+    ]
+    for i in range(config.n_gsps):
+        locations.append(
+            FakeLocation(
+                new_uuid(), f"GSP {i + 1}", common_pb2.LocationType.LOCATION_TYPE_GSP,
+                config.capacity_watts, len(locations), gsp_id=i + 1,
+            ),
+        )
+    for i in range(config.n_sites):
+        locations.append(
+            FakeLocation(
+                new_uuid(), f"Site {i + 1}", common_pb2.LocationType.LOCATION_TYPE_SITE,
+                config.capacity_watts // 1000, len(locations),
+            ),
+        )
+    return locations
+
+
+def solar_fraction(timestamp_ns: np.ndarray, location_index: int) -> np.ndarray:
+    """A clear-sky like generation curve, with some day to day variation."""
+    hours = (timestamp_ns % NANOS_PER_DAY) / (60 * NANOS_PER_MINUTE)
+    days = timestamp_ns // NANOS_PER_DAY
+    daylight = np.clip(np.sin(np.pi * (hours - 6) / 12), 0, None)
+    cloudiness = 0.75 + 0.2 * np.sin(days * 1.3 + location_index)
+    return (daylight * cloudiness).astype(np.float64)
+
+
+def forecast_fraction(
+    target_ns: np.ndarray,
+    init_ns: np.ndarray,
+    location_index: int,
+    forecaster_index: int,
+    config: FakeDataConfig,
+) -> np.ndarray:
+    """p50 forecasts, which drift further from the observations at longer horizons."""
+    horizon = (target_ns - init_ns) / (config.max_horizon_minutes * NANOS_PER_MINUTE)
+    drift = np.sin(init_ns / (3 * 60 * NANOS_PER_MINUTE) + forecaster_index * 0.9)
+    fraction = solar_fraction(target_ns, location_index) * (
+        1 + config.forecast_error * horizon * drift
+    )
+    return np.clip(fraction, 0, 1)
+
+
+def grid(start_ns: int, end_ns: int, interval_minutes: int) -> np.ndarray:
+    """Times on an interval grid from start_ns to end_ns, inclusive."""
+    interval = interval_minutes * NANOS_PER_MINUTE
+    first = -(-start_ns // interval) * interval
+    return np.arange(first, end_ns + 1, interval, dtype=np.int64)
+
+
+def to_ns(timestamp: Timestamp) -> int:
+    """Nanoseconds since the epoch of a protobuf Timestamp."""
+    return timestamp.seconds * NANOS_PER_SECOND + timestamp.nanos
+
+
+def to_timestamp(ns: int) -> Timestamp:
+    """Protobuf Timestamp of nanoseconds since the epoch."""
+    return Timestamp(seconds=int(ns // NANOS_PER_SECOND), nanos=int(ns % NANOS_PER_SECOND))
+
+
+def now_ns() -> int:
+    """Nanoseconds since the epoch now, data after this doesn't exist yet."""
+    return int(datetime.now(tz=UTC).timestamp() * NANOS_PER_SECOND)
+
+
+class FakeDataPlatformService(service_pb2_grpc.DataPlatformDataServiceServicer):
+    """DataPlatformDataService over synthetic data."""
+
+    def __init__(self, config: FakeDataConfig) -> None:
+        """Make the locations for the config, the data is made on each request."""
+        self.config = config
+        self.locations = make_locations(config)
+        self.calls: Counter[str] = Counter()
+        self.rng = random.Random(config.seed)
+
+    async def _begin(self, method: str, context: grpc.aio.ServicerContext) -> None:
+        """Count the call, wait for the latency and fail at the error rate."""
+        self.calls[method] += 1
+        config = self.config
+        delay = config.latency_seconds + self.rng.uniform(0, config.latency_jitter_seconds)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.rng.random() < config.error_rate:
+            await context.abort(config.error_code, f"Synthetic {method} error")
+
+    async def _location(
+        self, location_uuid: str, context: grpc.aio.ServicerContext,
+    ) -> FakeLocation:
+        for location in self.locations:
+            if location.location_uuid == location_uuid:
+                return location
+        await context.abort(grpc.StatusCode.NOT_FOUND, f"Location {location_uuid} not found")
+
+    def _forecaster_indexes(self, forecasters: list) -> list[int]:
+        """Indexes of the configured forecasters matching a request, all if none are given."""
+        if len(forecasters) == 0:
+            return list(range(len(self.config.forecasters)))
+        return [
+            i
+            for i, (name, version) in enumerate(self.config.forecasters)
+            for forecaster in forecasters
+            if forecaster.forecaster_name == name
+            and forecaster.forecaster_version in ("", version)
+        ]
+
+    def _plevel_fractions(self, p50: np.ndarray, horizon: np.ndarray) -> dict[str, np.ndarray]:
+        return {
+            plevel: np.clip(p50 * (1 + plevel_spreads[plevel] * horizon), 0, 1)
+            for plevel in self.config.plevels
+        }
+
+    async def ListLocations(self, request, context):
+        """All the locations, filtered by location type if one is given."""
+        await self._begin("ListLocations", context)
+        response = messages_pb2.ListLocationsResponse()
+        for location in self.locations:
+            if request.location_type_filter not in (0, location.location_type):
+                continue
+            summary = response.locations.add(
+                location_uuid=location.location_uuid,
+                location_name=location.location_name,
+                location_type=location.location_type,
+            )
+            if location.gsp_id is not None:
+                summary.metadata.update({"gsp_id": location.gsp_id})
+        return response
+
+    async def ListForecasters(self, request, context):
+        """Every configured forecaster version."""
+        await self._begin("ListForecasters", context)
+        return messages_pb2.ListForecastersResponse(
+            forecasters=[
+                messages_pb2.Forecaster(forecaster_name=name, forecaster_version=version)
+                for name, version in self.config.forecasters
+            ],
+        )
+
+    async def ListObservers(self, request, context):
+        """The configured observers."""
+        await self._begin("ListObservers", context)
+        return messages_pb2.ListObserversResponse(
+            observers=[{"observer_name": name} for name in self.config.observers],
+        )
+
+    async def GetForecastAsTimeseries(self, request, context):
+        """Forecasts of one t0, or for each target the latest with at least horizon_mins."""
+        await self._begin("GetForecastAsTimeseries", context)
+        config = self.config
+        location = await self._location(request.location_uuid, context)
+        forecaster_indexes = self._forecaster_indexes([request.forecaster])
+        if len(forecaster_indexes) == 0:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Forecaster not found")
+
+        start_ns = to_ns(request.time_window.start_timestamp_utc)
+        end_ns = to_ns(request.time_window.end_timestamp_utc)
+        max_horizon_ns = config.max_horizon_minutes * NANOS_PER_MINUTE
+        init_interval_ns = config.init_interval_minutes * NANOS_PER_MINUTE
+
+        if request.HasField("initialization_timestamp_utc"):
+            init_ns = to_ns(request.initialization_timestamp_utc)
+            target_ns = grid(
+                max(start_ns, init_ns), min(end_ns, init_ns + max_horizon_ns),
+                config.target_interval_minutes,
+            )
+            init_ns = np.full(len(target_ns), init_ns, dtype=np.int64)
+            if init_ns.size > 0 and init_ns[0] > now_ns():
+                target_ns, init_ns = target_ns[:0], init_ns[:0]
+        else:
+            target_ns = grid(start_ns, end_ns, config.target_interval_minutes)
+            latest_init_ns = target_ns - request.horizon_mins * NANOS_PER_MINUTE
+            init_ns = latest_init_ns // init_interval_ns * init_interval_ns
+            init_ns = np.minimum(init_ns, now_ns() // init_interval_ns * init_interval_ns)
+            keep = target_ns - init_ns <= max_horizon_ns
+            target_ns, init_ns = target_ns[keep], init_ns[keep]
+
+        horizon = (target_ns - init_ns) / max_horizon_ns
+        p50 = forecast_fraction(target_ns, init_ns, location.index, forecaster_indexes[0], config)
+        plevels = self._plevel_fractions(p50, horizon)
+
+        return messages_pb2.GetForecastAsTimeseriesResponse(
+            location_uuid=location.location_uuid,
+            values=[
+                {
+                    "target_timestamp_utc": to_timestamp(target_ns[i]),
+                    "initialization_timestamp_utc": to_timestamp(init_ns[i]),
+                    "created_timestamp_utc": to_timestamp(init_ns[i] + 10 * NANOS_PER_MINUTE),
+                    "effective_capacity_watts": location.capacity_watts,
+                    "p50_value_fraction": p50[i],
+                    "other_statistics_fractions": {
+                        plevel: fractions[i] for plevel, fractions in plevels.items()
+                    },
+                }
+                for i in range(len(target_ns))
+            ],
+        )
+
+    async def GetObservationsAsTimeseries(self, request, context):
+        """Observations up to now, pvlive_day_after only up to the start of today."""
+        await self._begin("GetObservationsAsTimeseries", context)
+        config = self.config
+        location = await self._location(request.location_uuid, context)
+        if request.observer_name not in config.observers:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Observer not found")
+
+        latest_ns = now_ns()
+        if request.observer_name == "pvlive_day_after":
+            latest_ns = latest_ns // NANOS_PER_DAY * NANOS_PER_DAY
+        timestamp_ns = grid(
+            to_ns(request.time_window.start_timestamp_utc),
+            min(to_ns(request.time_window.end_timestamp_utc), latest_ns),
+            config.observation_interval_minutes,
+        )
+        observer_offset = 0.02 * config.observers.index(request.observer_name)
+        fraction = np.clip(solar_fraction(timestamp_ns, location.index) + observer_offset, 0, 1)
+
+        return messages_pb2.GetObservationsAsTimeseriesResponse(
+            location_uuid=location.location_uuid,
+            values=[
+                {
+                    "timestamp_utc": to_timestamp(timestamp_ns[i]),
+                    "value_fraction": fraction[i],
+                    "effective_capacity_watts": location.capacity_watts,
+                }
+                for i in range(len(timestamp_ns))
+            ],
+        )
+
+    async def StreamForecastData(self, request, context):
+        """Every horizon of every init time in the window, in chunks."""
+        await self._begin("StreamForecastData", context)
+        config = self.config
+        # requests have either location_uuids or location_uuid
+        location_uuids = list(getattr(request, "location_uuids", [])) or [
+            getattr(request, "location_uuid", ""),
+        ]
+        locations = [await self._location(u, context) for u in location_uuids]
+        forecaster_indexes = self._forecaster_indexes(list(request.forecasters))
+
+        init_times_ns = grid(
+            to_ns(request.time_window.start_timestamp_utc),
+            min(to_ns(request.time_window.end_timestamp_utc), now_ns()),
+            config.init_interval_minutes,
+        )
+        horizons_mins = np.arange(
+            0, config.max_horizon_minutes + 1, config.target_interval_minutes, dtype=np.int64,
+        )
+
+        values = []
+        for location in locations:
+            for forecaster_index in forecaster_indexes:
+                name, version = config.forecasters[forecaster_index]
+                for init_ns in init_times_ns:
+                    target_ns = init_ns + horizons_mins * NANOS_PER_MINUTE
+                    init_ns_array = np.full(len(target_ns), init_ns, dtype=np.int64)
+                    p50 = forecast_fraction(
+                        target_ns, init_ns_array, location.index, forecaster_index, config,
+                    )
+                    plevels = self._plevel_fractions(
+                        p50, horizons_mins / config.max_horizon_minutes,
+                    )
+                    for i, horizon_mins in enumerate(horizons_mins):
+                        values.append(
+                            {
+                                "location_uuid": location.location_uuid,
+                                "forecaster_fullname": f"{name}:{version}",
+                                "effective_capacity_watts": location.capacity_watts,
+                                "p50_fraction": p50[i],
+                                "init_timestamp": to_timestamp(init_ns),
+                                "horizon_mins": int(horizon_mins),
+                                "created_timestamp_utc": to_timestamp(
+                                    init_ns + 10 * NANOS_PER_MINUTE,
+                                ),
+                                "other_statistics_fractions": {
+                                    plevel: fractions[i] for plevel, fractions in plevels.items()
+                                },
+                            },
+                        )
+                    if len(values) >= config.stream_chunk_size:
+                        yield messages_pb2.StreamForecastDataResponse(values=values)
+                        values = []
+        if values:
+            yield messages_pb2.StreamForecastDataResponse(values=values)
+
+    async def GetWeekAverageDeltas(self, request, context):
+        """Mean observed minus forecast over the week before the pivot, per horizon."""
+        await self._begin("GetWeekAverageDeltas", context)
+        config = self.config
+        location = await self._location(request.location_uuid, context)
+        forecaster_indexes = self._forecaster_indexes([request.forecaster])
+        if len(forecaster_indexes) == 0 or request.observer_name not in config.observers:
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Forecaster or observer not found")
+
+        pivot_ns = to_ns(request.pivot_timestamp_utc)
+        horizons_mins = np.arange(
+            0, config.max_horizon_minutes + 1, config.target_interval_minutes, dtype=np.int64,
+        )
+        # one row per day of the week before the pivot, one column per horizon
+        init_ns = pivot_ns - np.arange(1, 8, dtype=np.int64)[:, None] * NANOS_PER_DAY
+        target_ns = init_ns + horizons_mins[None, :] * NANOS_PER_MINUTE
+        forecast = forecast_fraction(
+            target_ns, np.broadcast_to(init_ns, target_ns.shape),
+            location.index, forecaster_indexes[0], config,
+        )
+        deltas = (solar_fraction(target_ns, location.index) - forecast).mean(axis=0)
+
+        return messages_pb2.GetWeekAverageDeltasResponse(
+            deltas=[
+                {
+                    "horizon_mins": int(horizon_mins),
+                    "delta_fraction": delta,
+                    "effective_capacity_watts": location.capacity_watts,
+                }
+                for horizon_mins, delta in zip(horizons_mins, deltas, strict=True)
+            ],
+        )
+
+
+class FakeDataPlatform:
+    """A grpc.aio server on localhost running a FakeDataPlatformService.
+
+    Use it as an async context manager, and connect to its target.
+    """
+
+    def __init__(
+        self, config: FakeDataConfig | None = None, host: str = "127.0.0.1", port: int = 0,
+    ) -> None:
+        """Make the server, port=0 picks a free port when it starts."""
+        self.service = FakeDataPlatformService(config or FakeDataConfig())
+        self.host = host
+        self.port = port
+        self.server: grpc.aio.Server | None = None
+
+    @property
+    def target(self) -> str:
+        """host:port to connect to."""
+        return f"{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        """Start serving."""
+        self.server = grpc.aio.server()
+        service_pb2_grpc.add_DataPlatformDataServiceServicer_to_server(self.service, self.server)
+        self.port = self.server.add_insecure_port(f"{self.host}:{self.port}")
+        await self.server.start()
+
+    async def stop(self) -> None:
+        """Stop serving, cancelling any calls in progress."""
+        if self.server is not None:
+            await self.server.stop(grace=None)
+            self.server = None
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+
+async def serve(config: FakeDataConfig, port: int) -> None:
+    """Run a fake Data Platform until it is stopped."""
+    async with FakeDataPlatform(config, host="0.0.0.0", port=port) as fake:
+        print(f"Fake Data Platform listening on port {fake.port}")
+        await fake.server.wait_for_termination()
+
+
+def main() -> None:
+    """Run a fake Data Platform from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=50051)
+    parser.add_argument("--n-gsps", type=int, default=FakeDataConfig.n_gsps)
+    parser.add_argument("--n-sites", type=int, default=FakeDataConfig.n_sites)
+    parser.add_argument(
+        "--init-interval-minutes", type=int, default=FakeDataConfig.init_interval_minutes,
+    )
+    parser.add_argument(
+        "--max-horizon-minutes", type=int, default=FakeDataConfig.max_horizon_minutes,
+    )
+    parser.add_argument("--latency-seconds", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-seconds", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeDataConfig(
+        n_gsps=args.n_gsps,
+        n_sites=args.n_sites,
+        init_interval_minutes=args.init_interval_minutes,
+        max_horizon_minutes=args.max_horizon_minutes,
+        latency_seconds=args.latency_seconds,
+        latency_jitter_seconds=args.latency_jitter_seconds,
+        error_rate=args.error_rate,
+    )
+    asyncio.run(serve(config, args.port))
+
+
+if __name__ == "__main__":
+    main()
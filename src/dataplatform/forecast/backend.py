@@ -2,119 +2,102 @@
 
 import asyncio
 import datetime
+from collections.abc import AsyncIterator
 
 import pandas as pd
 import streamlit as st
 
 from ocf.dp.dp_data import messages_pb2, service_pb2_grpc
 from ocf.dp.dp import common_pb2
-from google.protobuf.json_format import MessageToDict
 
+from dataplatform.forecast.chunking import observations_chunker, timeseries_chunker
+from dataplatform.forecast.constant import forecast_max_horizon_minutes
+from dataplatform.forecast.decode import (
+    decode_forecast_timeseries,
+    decode_stream_forecast_values,
+    stream_forecast_fractions_to_watts,
+)
+from dataplatform.forecast.segment_cache import segment_cache
+from dataplatform.forecast.tracing import frame_bytes, span
 
-async def fetch_timeseries(
+
+def show_errors(errors: list[str], n_requests: int) -> None:
+    """Show one error message for all the failed requests, rather than one each."""
+    if len(errors) > 0:
+        st.error(f"{len(errors)} of {n_requests} requests failed. {errors[0]}")
+
+
+async def fetch_timeseries_one(
     client: service_pb2_grpc.DataPlatformDataServiceStub,
     location_uuid: str,
     start_date: datetime.datetime,
     end_date: datetime.datetime,
     horizon_mins: int,
-    forecasters: list[messages_pb2.Forecaster],
-    init_times_utc: list[datetime.datetime] | None = None,
+    forecaster: messages_pb2.Forecaster,
+    init_time: datetime.datetime | None = None,
+    location_type: int = common_pb2.LocationType.LOCATION_TYPE_UNSPECIFIED,
+    label: str | None = None,
 ) -> pd.DataFrame:
-    """Directly calls GetForecastAsTimeseries for selected models and init times."""
-
-    time_window = messages_pb2.TimeWindow(
-        start_timestamp_utc=start_date, end_timestamp_utc=end_date
-    )
-    time_windows = []
-    current_start = start_date
-    while current_start < end_date:
-        current_end = min(current_start + datetime.timedelta(days=7), end_date)
-        time_windows.append(
-            messages_pb2.TimeWindow(
-                start_timestamp_utc=current_start, end_timestamp_utc=current_end
-            )
-        )
-        current_start = current_end
+    """Calls GetForecastAsTimeseries for one forecaster and init time, or the latest.
 
-    times_to_fetch = init_times_utc if init_times_utc else [None]
+    The data is cached per UTC day of target_timestamp_utc, in memory and on disk.
+    Requests are split into time windows sized for the location type.
+    Failures are raised, so nothing is cached for them.
+    The forecaster_name column is the label if one is given, such as name:version.
+    """
 
-    async def fetch_one(
-        forecaster_obj: messages_pb2.Forecaster,
-        window: messages_pb2.TimeWindow,
-        init_time: datetime.datetime | None,
-    ):
+    async def fetch_one(start: datetime.datetime, end: datetime.datetime) -> pd.DataFrame:
+        window = messages_pb2.TimeWindow(start_timestamp_utc=start, end_timestamp_utc=end)
         req = messages_pb2.GetForecastAsTimeseriesRequest(
             location_uuid=location_uuid,
             energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
             horizon_mins=horizon_mins,
             time_window=window,
-            forecaster=forecaster_obj,
+            forecaster=forecaster,
             initialization_timestamp_utc=init_time,
         )
+        resp = await client.GetForecastAsTimeseries(req)
+        with span("decode", "GetForecastAsTimeseries") as decode_span:
+            df = decode_forecast_timeseries(resp, forecaster.forecaster_name)
+            decode_span.rows, decode_span.bytes = len(df), frame_bytes(df)
+        return df
 
-        try:
-            resp = await client.GetForecastAsTimeseries(req)
-            rows = []
-            for val in resp.values:
-                row = {
-                    "target_timestamp_utc": val.target_timestamp_utc.ToDatetime(
-                        tzinfo=datetime.UTC
-                    ),
-                    "initialization_timestamp_utc": val.initialization_timestamp_utc.ToDatetime(
-                        tzinfo=datetime.UTC
-                    ),
-                    "created_timestamp_utc": val.created_timestamp_utc.ToDatetime(
-                        tzinfo=datetime.UTC
-                    ),
-                    "effective_capacity_watts": val.effective_capacity_watts,
-                    "forecaster_name": forecaster_obj.forecaster_name,
-                    "location_uuid": resp.location_uuid,
-                    "horizon_mins": (
-                        val.target_timestamp_utc.ToDatetime(tzinfo=datetime.UTC)
-                        - val.initialization_timestamp_utc.ToDatetime(
-                            tzinfo=datetime.UTC
-                        )
-                    ).total_seconds()
-                    // 60,
-                    "p50_watts": int(
-                        val.p50_value_fraction * val.effective_capacity_watts
-                    ),
-                }
-
-                if val.other_statistics_fractions:
-                    row.update(
-                        {
-                            f"{k}_watts": int(v * val.effective_capacity_watts)
-                            for k, v in val.other_statistics_fractions.items()
-                        }
-                    )
-                rows.append(row)
-
-            return rows
-        except Exception as e:
-            time_str = init_time.isoformat() if init_time else "Latest"
-            st.error(
-                f"Failed to fetch {forecaster_obj.forecaster_name} at {time_str}: {e}"
-            )
-            return []
+    async def fetch_window(
+        window_start: datetime.datetime, window_end: datetime.datetime,
+    ) -> pd.DataFrame:
+        results = await timeseries_chunker.fetch(
+            str(location_type), window_start, window_end, fetch_one,
+        )
+        return pd.concat(results, ignore_index=True)
 
-    tasks = [
-        fetch_one(f, w, t)
-        for f in forecasters
-        for t in times_to_fetch
-        for w in time_windows
-    ]
+    key_prefix = (
+        f"timeseries:{location_uuid}:{forecaster.forecaster_name}:"
+        f"{forecaster.forecaster_version}:{horizon_mins}:{init_time_label(init_time)}"
+    )
+    df = await segment_cache.get(
+        key_prefix=key_prefix,
+        location_uuid=location_uuid,
+        start_date=start_date,
+        end_date=end_date,
+        fetch=fetch_window,
+        time_column="target_timestamp_utc",
+    )
+    if label is not None and not df.empty:
+        df = df.assign(forecaster_name=label)
+    return df
+
+
+def init_time_label(init_time: datetime.datetime | None) -> str:
+    """Label of an init time, or Latest for the latest forecasts."""
+    return init_time.isoformat() if init_time else "Latest"
 
-    results = await asyncio.gather(*tasks)
-    all_rows = [item for sublist in results for item in sublist]
 
-    df = pd.DataFrame(all_rows)
+def combine_timeseries(results: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate and sort the results of fetch_timeseries_one."""
+    results = [result for result in results if not result.empty]
+
+    df = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
     if not df.empty:
-        df["target_timestamp_utc"] = pd.to_datetime(df["target_timestamp_utc"])
-        if "initialization_timestamp_utc" in df.columns:
-            df["initialization_timestamp_utc"] = pd.to_datetime(
-                df["initialization_timestamp_utc"]
-            )
         df = df.sort_values(
             ["forecaster_name", "initialization_timestamp_utc", "target_timestamp_utc"]
         ).reset_index(drop=True)
@@ -122,41 +105,81 @@ async def fetch_timeseries(
     return df
 
 
-async def fetch_observations(
+async def fetch_timeseries(
     client: service_pb2_grpc.DataPlatformDataServiceStub,
     location_uuid: str,
     start_date: datetime.datetime,
     end_date: datetime.datetime,
-    observers: list[str],
-    energy_source: common_pb2.EnergySource = common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+    horizon_mins: int,
+    forecasters: list[messages_pb2.Forecaster],
+    init_times_utc: list[datetime.datetime] | None = None,
+    location_type: int = common_pb2.LocationType.LOCATION_TYPE_UNSPECIFIED,
 ) -> pd.DataFrame:
-    """Directly calls GetObservationsAsTimeseries for selected observers."""
+    """Directly calls GetForecastAsTimeseries for selected models and init times."""
 
-    time_window = messages_pb2.TimeWindow(
-        start_timestamp_utc=start_date, end_timestamp_utc=end_date
-    )
-    time_windows = []
-    current_start = start_date
-    while current_start < end_date:
-        current_end = min(current_start + datetime.timedelta(days=7), end_date)
-        time_windows.append(
-            messages_pb2.TimeWindow(
-                start_timestamp_utc=current_start, end_timestamp_utc=current_end
+    times_to_fetch = init_times_utc if init_times_utc else [None]
+    errors = []
+
+    async def fetch_one_or_empty(
+        forecaster_obj: messages_pb2.Forecaster,
+        init_time: datetime.datetime | None,
+    ) -> pd.DataFrame:
+        try:
+            return await fetch_timeseries_one(
+                client, location_uuid, start_date, end_date, horizon_mins,
+                forecaster_obj, init_time, location_type,
             )
-        )
-        current_start = current_end
+        except Exception as e:
+            errors.append(
+                f"Failed to fetch {forecaster_obj.forecaster_name} "
+                f"at {init_time_label(init_time)}: {e}"
+            )
+            return pd.DataFrame()
 
-    # Run requests concurrently for all selected observers
-    async def fetch_one(obs_name: str, window: messages_pb2.TimeWindow):
+    tasks = [fetch_one_or_empty(f, t) for f in forecasters for t in times_to_fetch]
+
+    results = await asyncio.gather(*tasks)
+    show_errors(errors, len(tasks))
+    return combine_timeseries(results)
+
+
+obs_columns = [
+    "target_timestamp_utc",
+    "value_fraction",
+    "effective_capacity_watts",
+    "observer_name",
+    "location_uuid",
+    "value_watts",
+]
+
+
+async def fetch_observations_one(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location_uuid: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    obs_name: str,
+    energy_source: common_pb2.EnergySource = common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+    location_type: int = common_pb2.LocationType.LOCATION_TYPE_UNSPECIFIED,
+) -> pd.DataFrame:
+    """Calls GetObservationsAsTimeseries for one observer.
+
+    The data is cached per UTC day of target_timestamp_utc, in memory and on disk.
+    Requests are split into time windows sized for the location type.
+    Failures are raised, so nothing is cached for them. The pvlive_day_after
+    observations mark the days before their latest timestamp as settled in the cache.
+    """
+
+    async def fetch_one(start: datetime.datetime, end: datetime.datetime) -> list[dict]:
+        window = messages_pb2.TimeWindow(start_timestamp_utc=start, end_timestamp_utc=end)
         req = messages_pb2.GetObservationsAsTimeseriesRequest(
             location_uuid=location_uuid,
             observer_name=obs_name,
             energy_source=energy_source,
             time_window=window,
         )
-
-        try:
-            resp = await client.GetObservationsAsTimeseries(req)
+        resp = await client.GetObservationsAsTimeseries(req)
+        with span("decode", "GetObservationsAsTimeseries") as decode_span:
             rows = []
             for val in resp.values:
                 rows.append(
@@ -173,32 +196,47 @@ async def fetch_observations(
                         ),
                     }
                 )
-            return rows
-        except Exception as e:
-            st.error(f"Failed to fetch observations for {obs_name}: {e}")
-            return []
+            decode_span.rows = len(rows)
+        return rows
+
+    async def fetch_window(
+        window_start: datetime.datetime, window_end: datetime.datetime,
+    ) -> pd.DataFrame:
+        results = await observations_chunker.fetch(
+            str(location_type), window_start, window_end, fetch_one,
+        )
+        all_rows = [item for sublist in results for item in sublist]
+        df = pd.DataFrame(all_rows, columns=obs_columns)
+        df["target_timestamp_utc"] = pd.to_datetime(df["target_timestamp_utc"], utc=True)
+        return df
 
-    results = await asyncio.gather(
-        *[fetch_one(obs, w) for obs in observers for w in time_windows]
+    df = await segment_cache.get(
+        key_prefix=f"timeseries_observation:{location_uuid}:{obs_name}:{energy_source}",
+        location_uuid=location_uuid,
+        start_date=start_date,
+        end_date=end_date,
+        fetch=fetch_window,
+        time_column="target_timestamp_utc",
     )
-    all_rows = [item for sublist in results for item in sublist]
-
-    obs_columns = [
-        "target_timestamp_utc",
-        "value_fraction",
-        "effective_capacity_watts",
-        "observer_name",
-        "location_uuid",
-        "value_watts",
-    ]
+
+    # days before the latest pvlive_day_after update won't change any more
+    if obs_name == "pvlive_day_after" and not df.empty:
+        segment_cache.mark_immutable_before(location_uuid, df["target_timestamp_utc"].max())
+
+    return df
+
+
+def combine_observations(results: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate and sort the results of fetch_observations_one."""
+    results = [result for result in results if not result.empty]
+
     df = (
-        pd.DataFrame(all_rows, columns=obs_columns)
-        if all_rows
+        pd.concat(results, ignore_index=True)
+        if results
         else pd.DataFrame(columns=obs_columns)
     )
 
     if not df.empty:
-        df["target_timestamp_utc"] = pd.to_datetime(df["target_timestamp_utc"])
         df = df.sort_values(["observer_name", "target_timestamp_utc"]).reset_index(
             drop=True
         )
@@ -206,14 +244,48 @@ async def fetch_observations(
     return df
 
 
-async def fetch_all_forecasts(
+async def fetch_observations(
     client: service_pb2_grpc.DataPlatformDataServiceStub,
     location_uuid: str,
     start_date: datetime.datetime,
     end_date: datetime.datetime,
-    forecasters: list[messages_pb2.Forecaster],
+    observers: list[str],
+    energy_source: common_pb2.EnergySource = common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+    location_type: int = common_pb2.LocationType.LOCATION_TYPE_UNSPECIFIED,
 ) -> pd.DataFrame:
-    """Fetches all forecasts for all t0s within a time window using stream_forecast_data."""
+    """Directly calls GetObservationsAsTimeseries for selected observers."""
+
+    # Run requests concurrently for all selected observers
+    async def fetch_one_or_empty(obs_name: str) -> pd.DataFrame:
+        try:
+            return await fetch_observations_one(
+                client, location_uuid, start_date, end_date,
+                obs_name, energy_source, location_type,
+            )
+        except Exception as e:
+            errors.append(f"Failed to fetch observations for {obs_name}: {e}")
+            return pd.DataFrame(columns=obs_columns)
+
+    errors = []
+    tasks = [fetch_one_or_empty(obs) for obs in observers]
+    results = await asyncio.gather(*tasks)
+    show_errors(errors, len(tasks))
+    return combine_observations(results)
+
+
+async def stream_all_forecasts(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location_uuid: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    forecasters: list[messages_pb2.Forecaster],
+    keep_versions: bool = False,
+) -> AsyncIterator[pd.DataFrame]:
+    """Streams all forecasts for all t0s within a time window, one DataFrame per chunk.
+
+    Each chunk is decoded as soon as it arrives, so its protobuf messages can be released
+    before the next one is read. With keep_versions, forecaster_name is name:version.
+    """
 
     req = messages_pb2.StreamForecastDataRequest(
         location_uuids=[location_uuid],
@@ -224,86 +296,167 @@ async def fetch_all_forecasts(
         forecasters=forecasters,
     )
 
-    forecast_values = []
     async for chunk in client.StreamForecastData(req):
-        forecast_values.extend(chunk.values)
+        if len(chunk.values) > 0:
+            with span("decode", "StreamForecastData") as decode_span:
+                df = decode_stream_forecast_values(chunk.values)
+                if keep_versions:
+                    df["forecaster_name"] = df["forecaster_fullname"]
+                df = stream_forecast_fractions_to_watts(df)
+                decode_span.rows, decode_span.bytes = len(df), frame_bytes(df)
+            yield df
 
-    df = (
-        pd.DataFrame.from_dict(
-            [
-                MessageToDict(
-                    f,
-                    always_print_fields_with_no_presence=True,
-                    preserving_proto_field_name=True,
-                )
-                for f in forecast_values
-            ]
-        )
-        .pipe(lambda df: df.join(
-            pd.json_normalize(df["other_statistics_fractions"].tolist()).set_index(df.index)
-        ))
-        .drop(
-            "other_statistics_fractions",
-            axis=1,
-        )
-        .assign(
-            **{
-                f"{k}_watts": lambda df, k=k: (
-                    pd.to_numeric(df[k], errors="coerce") *
-                    pd.to_numeric(df["effective_capacity_watts"], errors="coerce")
-                )
-                .round()
-                .astype("Int64")
-                for k in chunk.values[0].other_statistics_fractions.keys()
-            },
+
+async def fetch_stream_t0s(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location_uuid: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    forecasters: list[messages_pb2.Forecaster],
+    t0s: list[datetime.datetime],
+    init_window: tuple[datetime.datetime, datetime.datetime],
+    keep_versions: bool = False,
+) -> pd.DataFrame:
+    """Streams the forecasts of an init time window, keeping the t0s and target times wanted.
+
+    This gives the same rows as a GetForecastAsTimeseries call per t0, in one request.
+    """
+    batch_dfs = [
+        batch_df
+        async for batch_df in stream_all_forecasts(
+            client, location_uuid, init_window[0], init_window[1], forecasters, keep_versions,
         )
-        .drop(
-            columns=[k for k in chunk.values[0].other_statistics_fractions.keys()],
+    ]
+    if len(batch_dfs) == 0:
+        return pd.DataFrame()
+
+    df = pd.concat(batch_dfs, ignore_index=True)
+    keep = (
+        df["initialization_timestamp_utc"].isin(pd.DatetimeIndex(t0s))
+        & (df["target_timestamp_utc"] >= start_date)
+        & (df["target_timestamp_utc"] <= end_date)
+    )
+    return watts_as_float(df[keep].reset_index(drop=True))
+
+
+def watts_as_float(df: pd.DataFrame) -> pd.DataFrame:
+    """Nullable watts from the stream, as floats like the timeseries p-levels."""
+    watts_columns = [col for col in df.columns if col.endswith("_watts")]
+    return df.astype({col: "float64" for col in watts_columns})
+
+
+async def fetch_all_horizons(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location_uuid: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    forecasters: list[messages_pb2.Forecaster],
+    keep_versions: bool = False,
+) -> pd.DataFrame:
+    """Streams every horizon of the forecasts with target times in a window.
+
+    The init times start the longest horizon before the window, so each target time in
+    the window has all its horizons, and any horizon can then be picked in memory.
+    """
+    init_start = start_date - datetime.timedelta(minutes=forecast_max_horizon_minutes)
+    batch_dfs = [
+        batch_df
+        async for batch_df in stream_all_forecasts(
+            client, location_uuid, init_start, end_date, forecasters, keep_versions,
         )
-        .assign(
-            **{
-                "p50_watts": lambda df: (
-                    pd.to_numeric(df["p50_fraction"], errors="coerce") *
-                    pd.to_numeric(df["effective_capacity_watts"], errors="coerce")
+    ]
+    if len(batch_dfs) == 0:
+        return pd.DataFrame()
+
+    df = pd.concat(batch_dfs, ignore_index=True)
+    keep = (df["target_timestamp_utc"] >= start_date) & (df["target_timestamp_utc"] <= end_date)
+    return watts_as_float(df[keep].reset_index(drop=True))
+
+
+async def stream_horizon_forecasts(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location_uuid: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    forecasters: list[messages_pb2.Forecaster],
+    horizons: list[int],
+    location_type: int = common_pb2.LocationType.LOCATION_TYPE_UNSPECIFIED,
+    keep_versions: bool = False,
+) -> AsyncIterator[pd.DataFrame]:
+    """Fetches the forecasts at each horizon with timeseries calls, one DataFrame per horizon.
+
+    The horizons are fetched concurrently and yielded as they finish. Only rows at
+    exactly the horizon are kept, as a call returns a longer horizon where it is missing.
+    With keep_versions, forecaster_name is name:version.
+    """
+
+    async def fetch_horizon(horizon_mins: int) -> pd.DataFrame:
+        results = await asyncio.gather(
+            *[
+                fetch_timeseries_one(
+                    client, location_uuid, start_date, end_date, horizon_mins,
+                    forecaster, None, location_type,
+                    f"{forecaster.forecaster_name}:{forecaster.forecaster_version}"
+                    if keep_versions
+                    else None,
                 )
-                .round()
-                .astype("Int64"),
-
-                "target_timestamp_utc": lambda df: (
-                    pd.to_datetime(df["init_timestamp"], utc=True, errors="coerce")
-                    + pd.to_timedelta(pd.to_numeric(df["horizon_mins"], errors="coerce"), unit="m")
-                ),
-                "initialization_timestamp_utc": lambda df: pd.to_datetime(
-                    df["init_timestamp"],
-                    utc=True,
-                    errors="coerce"
-                ),
-                "created_timestamp_utc": lambda df: pd.to_datetime(
-                    df["created_timestamp_utc"],
-                    utc=True,
-                    errors="coerce"
-                ),
-                "forecaster_name": lambda df: df["forecaster_fullname"].apply(
-                    lambda x: x.split(":")[0] if isinstance(x, str) and ":" in x else x
-                ),
-            },
-        )
-        .drop(
-            columns=[
-                "p50_fraction",
-                "init_timestamp",
-                "forecaster_fullname",
+                for forecaster in forecasters
             ],
         )
-        .sort_values(
-            by=[
-                "location_uuid",
-                "forecaster_name",
-                "initialization_timestamp_utc",
-                "created_timestamp_utc",
-                "target_timestamp_utc",
-            ]
+        df = combine_timeseries(list(results))
+        if df.empty:
+            return df
+        return df[df["horizon_mins"] == horizon_mins].reset_index(drop=True)
+
+    for next_df in asyncio.as_completed([fetch_horizon(h) for h in horizons]):
+        df = await next_df
+        if not df.empty:
+            yield df
+
+
+def stream_progress(
+    batch_df: pd.DataFrame,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+) -> float:
+    """Estimate how far through the time window a stream is, from the latest init time seen."""
+    if batch_df.empty:
+        return 0.0
+    latest = batch_df["initialization_timestamp_utc"].max()
+    fraction = (latest - start_date) / (end_date - start_date)
+    return min(max(fraction, 0.0), 1.0)
+
+
+async def fetch_all_forecasts(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location_uuid: str,
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+    forecasters: list[messages_pb2.Forecaster],
+) -> pd.DataFrame:
+    """Fetches all forecasts for all t0s within a time window using stream_forecast_data."""
+
+    batch_dfs = [
+        batch_df
+        async for batch_df in stream_all_forecasts(
+            client, location_uuid, start_date, end_date, forecasters
         )
+    ]
+
+    df = (
+        pd.concat(batch_dfs, ignore_index=True)
+        if batch_dfs
+        else stream_forecast_fractions_to_watts(decode_stream_forecast_values([]))
+    )
+
+    df = df.sort_values(
+        by=[
+            "location_uuid",
+            "forecaster_name",
+            "initialization_timestamp_utc",
+            "created_timestamp_utc",
+            "target_timestamp_utc",
+        ]
     )
 
     return df
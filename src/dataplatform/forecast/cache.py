@@ -4,18 +4,27 @@ from datetime import UTC, datetime, timedelta
 
 from ocf.dp.dp_data import service_pb2_grpc
 
+from dataplatform.channels import SharedChannelClient
 from dataplatform.forecast.constant import cache_seconds
+from dataplatform.forecast.scheduler import ScheduledDataPlatformClient
+
+client_types = (
+    service_pb2_grpc.DataPlatformDataServiceStub,
+    SharedChannelClient,
+    ScheduledDataPlatformClient,
+)
 
 
 def key_builder_remove_client(func: callable, *args: list, **kwargs: dict) -> str:
     """Custom key builder that ignores the client argument for caching purposes."""
     key = f"{func.__name__}:"
     for arg in args:
-        if not isinstance(arg, service_pb2_grpc.DataPlatformDataServiceStub):
+        if not isinstance(arg, client_types):
             key += f"{arg}-"
 
     for k, v in kwargs.items():
-        key += f"{k}={v}-"
+        if not isinstance(v, client_types):
+            key += f"{k}={v}-"
 
     # get the time now to the closest 5 minutes, this forces a new cache every 5 minutes
     current_time = datetime.now(UTC).replace(second=0, microsecond=0)
@@ -0,0 +1,172 @@
+"""Adaptive time window chunking for Data Platform requests.
+
+Long time windows are split into smaller windows, with one request each. The window
+length is tuned per request type and location type, from the rows per day and latency
+seen so far, so sparse sites use few large windows and dense national data uses small
+ones. It grows by a fixed step after each fast response (additive increase), and halves
+after a slow response or a deadline or message size error (multiplicative decrease).
+Windows that fail with a deadline or message size error are split in half and refetched.
+The chunkers are shared by the script threads of every session and the job runner
+thread, so the tunings are only read and changed while holding a lock.
+"""
+
+import asyncio
+import dataclasses
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from typing import TypeVar
+
+import grpc
+
+from dataplatform.forecast.constant import (
+    chunk_max_days,
+    chunk_min_days,
+    chunk_target_rows,
+    chunk_target_seconds,
+)
+from dataplatform.forecast.scheduler import rpc_busy_seconds
+
+T = TypeVar("T")
+
+# errors that mean the window was too big
+shrink_status_codes = {
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+}
+
+
+@dataclasses.dataclass
+class ChunkTuning:
+    """Current window length, and the rows per day seen, for one key."""
+
+    window_days: float
+    rows_per_day: float | None = None
+
+
+class AdaptiveChunker:
+    """Split time windows into requests, with AIMD tuning of the window length."""
+
+    def __init__(
+        self,
+        initial_days: float,
+        min_days: float = chunk_min_days,
+        max_days: float = chunk_max_days,
+        target_rows: int = chunk_target_rows,
+        target_seconds: float = chunk_target_seconds,
+        increase_days: float = 1.0,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        """Make a chunker, each new key starts with windows of initial_days."""
+        self.initial_days = initial_days
+        self.min_days = min_days
+        self.max_days = max_days
+        self.target_rows = target_rows
+        self.target_seconds = target_seconds
+        self.increase_days = increase_days
+        self.decrease_factor = decrease_factor
+        self.tunings: dict[str, ChunkTuning] = {}
+        self.lock = threading.Lock()
+
+    def tuning(self, key: str) -> ChunkTuning:
+        """Get the tuning for a key, e.g. a location type. Must be called holding the lock."""
+        return self.tunings.setdefault(key, ChunkTuning(window_days=self.initial_days))
+
+    def clamp(self, tuning: ChunkTuning) -> None:
+        """Keep the window between the limits, and under target_rows at the rows per day seen."""
+        max_days = self.max_days
+        if tuning.rows_per_day:
+            max_days = min(max_days, self.target_rows / tuning.rows_per_day)
+        tuning.window_days = min(max(tuning.window_days, self.min_days), max(max_days, self.min_days))
+
+    def plan(self, key: str, start_date: datetime, end_date: datetime) -> list[tuple[datetime, datetime]]:
+        """Split a time window into windows of the current length for a key."""
+        with self.lock:
+            window = timedelta(days=self.tuning(key).window_days)
+        windows = []
+        window_start = start_date
+        while window_start < end_date:
+            window_end = min(window_start + window, end_date)
+            windows.append((window_start, window_end))
+            window_start = window_end
+        return windows
+
+    def record_success(self, key: str, window: timedelta, n_rows: int, seconds: float) -> None:
+        """Grow the window after a fast response, or shrink it after a slow one."""
+        days = window / timedelta(days=1)
+        with self.lock:
+            tuning = self.tuning(key)
+            if days > 0:
+                rows_per_day = n_rows / days
+                # smooth, as a window can be partly at night or before the data starts
+                tuning.rows_per_day = (
+                    rows_per_day
+                    if tuning.rows_per_day is None
+                    else (tuning.rows_per_day + rows_per_day) / 2
+                )
+
+            if seconds > self.target_seconds:
+                tuning.window_days *= self.decrease_factor
+            else:
+                tuning.window_days += self.increase_days
+            self.clamp(tuning)
+
+    def record_failure(self, key: str) -> None:
+        """Shrink the window after a deadline or message size error."""
+        with self.lock:
+            tuning = self.tuning(key)
+            tuning.window_days *= self.decrease_factor
+            self.clamp(tuning)
+
+    async def fetch(
+        self,
+        key: str,
+        start_date: datetime,
+        end_date: datetime,
+        fetch_window: Callable[[datetime, datetime], Awaitable[T]],
+    ) -> list[T]:
+        """Fetch a time window in chunks, concurrently, and return the results in time order.
+
+        Args:
+            key: the tuning to use and update, e.g. the location type
+            start_date: start of the time window
+            end_date: end of the time window
+            fetch_window: async function that fetches the data between two datetimes,
+                returning something with a len, like a DataFrame or a list of rows
+        """
+
+        async def fetch_one(window_start: datetime, window_end: datetime) -> list[T]:
+            busy_seconds_before = rpc_busy_seconds.get()
+            start = time.perf_counter()
+            try:
+                result = await fetch_window(window_start, window_end)
+            except grpc.aio.AioRpcError as e:
+                window = window_end - window_start
+                if (
+                    e.code() not in shrink_status_codes
+                    or window / timedelta(days=1) <= self.min_days
+                ):
+                    raise
+                self.record_failure(key)
+                middle = window_start + window / 2
+                first, second = await asyncio.gather(
+                    fetch_one(window_start, middle), fetch_one(middle, window_end),
+                )
+                return [*first, *second]
+
+            # unscheduled clients don't record busy time, so fall back to the wall time
+            seconds = rpc_busy_seconds.get() - busy_seconds_before or time.perf_counter() - start
+            self.record_success(key, window_end - window_start, len(result), seconds)
+            return [result]
+
+        results = await asyncio.gather(
+            *[fetch_one(s, e) for s, e in self.plan(key, start_date, end_date)],
+        )
+        return [result for window_results in results for result in window_results]
+
+
+# one chunker per request type, shared by all sessions in this process
+timeseries_chunker = AdaptiveChunker(initial_days=7)
+observations_chunker = AdaptiveChunker(initial_days=7)
+forecast_stream_chunker = AdaptiveChunker(initial_days=30)
@@ -1,5 +1,8 @@
 """Constants for the forecast module."""
 
+import os
+import tempfile
+
 colours = [
     "#FFD480",
     "#FF8F73",
@@ -19,6 +22,50 @@ metrics = {
 }
 
 cache_seconds = 300  # 5 minutes
+immutable_cache_seconds = 7 * 24 * 60 * 60  # 7 days, for data that won't change any more
+# Cap on the day segments held in memory, the least recently used are dropped first
+memory_cache_max_bytes = int(os.getenv("DATA_PLATFORM_MEMORY_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# On-disk cache, shared by all the Streamlit processes on the same host
+disk_cache_dir = os.getenv(
+    "DATA_PLATFORM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "analysis-dashboard-cache"),
+)
+disk_cache_max_bytes = int(os.getenv("DATA_PLATFORM_CACHE_MAX_MB", "2048")) * 1024 * 1024
 
 # This is used for a specific case for the UK National and GSP
 observer_names = ["pvlive_in_day", "pvlive_day_after", "nednl"]
+
+# When several observers have a value for the same timestamp, metrics use the first of these
+observer_priority = ["pvlive_day_after", "pvlive_in_day", "nednl"]
+
+# Probabilistic levels that may appear in other_statistics_fractions, besides p50
+plevel_names = ["p10", "p25", "p75", "p90"]
+
+# Data Platform RPC scheduling, hedging is off unless DATA_PLATFORM_HEDGE_AFTER_SECONDS is set
+max_concurrent_rpcs = int(os.getenv("DATA_PLATFORM_MAX_CONCURRENT_RPCS", "8"))
+rpc_timeout_seconds = float(os.getenv("DATA_PLATFORM_RPC_TIMEOUT_SECONDS", "120"))
+# streams have no overall deadline, only a limit on the wait for each message
+stream_idle_timeout_seconds = float(os.getenv("DATA_PLATFORM_STREAM_IDLE_TIMEOUT_SECONDS", "300"))
+rpc_max_retries = 3
+rpc_backoff_seconds = 0.5
+rpc_hedge_after_seconds = float(os.getenv("DATA_PLATFORM_HEDGE_AFTER_SECONDS", "0")) or None
+
+# Adaptive request time windows, tuned per request type and location type
+chunk_min_days = 0.25
+chunk_max_days = 90
+chunk_target_rows = 200_000
+chunk_target_seconds = 10.0
+
+# Request cost model, used to choose between per-t0 or per-horizon timeseries calls and
+# forecast streams. The fixed cost of each request is counted as a number of rows, a
+# stream costs more as the server scans every horizon of its init times.
+forecast_interval_minutes = 30  # between init times, and between target times
+forecast_max_horizon_minutes = 36 * 60
+timeseries_rpc_cost_rows = int(os.getenv("DATA_PLATFORM_TIMESERIES_RPC_COST_ROWS", "5000"))
+stream_rpc_cost_rows = int(os.getenv("DATA_PLATFORM_STREAM_RPC_COST_ROWS", "20000"))
+
+# Finished background jobs are kept this long, so a session can pick up their results
+job_keep_seconds = 15 * 60
+
+# Forecasts already in memory are merged and folded into the metrics this many rows at a time
+metrics_batch_rows = 100_000
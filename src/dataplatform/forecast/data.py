@@ -1,18 +1,40 @@
 """Functions to get forecast and observation data from Data Platform."""
 
-import time
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import pandas as pd
-from aiocache import Cache, cached
 from google.protobuf.json_format import MessageToDict
 
-from dataplatform.forecast.cache import key_builder_remove_client
-from dataplatform.forecast.constant import cache_seconds, observer_names
+from dataplatform.forecast.chunking import forecast_stream_chunker, observations_chunker
+from dataplatform.forecast.constant import observer_names
+from dataplatform.forecast.decode import decode_stream_forecast_values
+from dataplatform.forecast.join import join_observations
+from dataplatform.forecast.planner import FetchRequest, run_plan
+from dataplatform.forecast.segment_cache import segment_cache
 from ocf.dp.dp import common_pb2
 from ocf.dp.dp_data import messages_pb2, service_pb2_grpc
 
 
+def forecast_requests(
+    dpc: service_pb2_grpc.DataPlatformDataServiceStub,
+    location: messages_pb2.ListLocationsResponse.LocationSummary,
+    start_date: datetime,
+    end_date: datetime,
+    selected_forecasters: list[messages_pb2.Forecaster],
+) -> list[FetchRequest]:
+    """One fetch plan request per forecaster."""
+    return [
+        FetchRequest(
+            kind="forecast",
+            label=forecaster.forecaster_name,
+            fetch=lambda forecaster=forecaster: get_forecast_data_one_forecaster(
+                dpc, location, start_date, end_date, forecaster,
+            ),
+        )
+        for forecaster in selected_forecasters
+    ]
+
+
 async def get_forecast_data(
     dpc: service_pb2_grpc.DataPlatformDataServiceStub,
     location: messages_pb2.ListLocationsResponse.LocationSummary,
@@ -20,21 +42,17 @@ async def get_forecast_data(
     end_date: datetime,
     selected_forecasters: list[messages_pb2.Forecaster],
 ) -> pd.DataFrame:
-    """Get forecast data for the given location and time window."""
-    all_data_df = []
-
-    for forecaster in selected_forecasters:
-        forecaster_data_df = await get_forecast_data_one_forecaster(
-            dpc,
-            location,
-            start_date,
-            end_date,
-            forecaster,
-        )
-        if forecaster_data_df is not None:
-            all_data_df.append(forecaster_data_df)
+    """Get forecast data for the given location and time window, all forecasters at once."""
+    plan_result = await run_plan(
+        forecast_requests(dpc, location, start_date, end_date, selected_forecasters),
+    )
+    plan_result.raise_first_error()
+    return combine_forecast_data(plan_result.frames("forecast"))
 
-    if len(all_data_df) == 0:
+
+def combine_forecast_data(forecaster_dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate the forecasts of each forecaster, and add the watt values."""
+    if len(forecaster_dfs) == 0:
         all_data_df = pd.DataFrame(columns=[
             "location_uuid",
             "forecaster_name",
@@ -45,7 +63,7 @@ async def get_forecast_data(
             "target_timestamp_utc",
         ])
     else:
-        all_data_df = pd.concat(all_data_df, ignore_index=True)
+        all_data_df = pd.concat(forecaster_dfs, ignore_index=True)
 
     all_data_df["effective_capacity_watts"] = all_data_df["effective_capacity_watts"].astype(float)
 
@@ -62,7 +80,6 @@ async def get_forecast_data(
     return all_data_df
 
 
-@cached(ttl=cache_seconds, cache=Cache.MEMORY, key_builder=key_builder_remove_client)
 async def get_forecast_data_one_forecaster(
     dpc: service_pb2_grpc.DataPlatformDataServiceStub,
     location: messages_pb2.ListLocationsResponse.LocationSummary,
@@ -70,142 +87,133 @@ async def get_forecast_data_one_forecaster(
     end_date: datetime,
     selected_forecaster: messages_pb2.Forecaster,
 ) -> pd.DataFrame | None:
-    """Get forecast data for one forecaster for the given location and time window."""
-    all_data_list_dict = []
+    """Get forecast data for one forecaster for the given location and time window.
+
+    The data is cached per UTC day of init_timestamp, so only missing days are fetched.
+    """
+    forecaster_key = (
+        f"{selected_forecaster.forecaster_name}:{selected_forecaster.forecaster_version}"
+    )
+    return await segment_cache.get(
+        key_prefix=f"forecast:{location.location_uuid}:{forecaster_key}",
+        location_uuid=location.location_uuid,
+        start_date=start_date,
+        end_date=end_date,
+        fetch=lambda start, end: fetch_forecast_data_one_forecaster(
+            dpc, location, start, end, selected_forecaster,
+        ),
+        time_column="init_timestamp",
+    )
 
-    # Grab all the data, in chunks of 30 days to avoid too large requests
-    temp_start_date = start_date
-    while temp_start_date <= end_date:
-        temp_end_date = min(temp_start_date + timedelta(days=30), end_date)
 
-        # fetch data
+async def fetch_forecast_data_one_forecaster(
+    dpc: service_pb2_grpc.DataPlatformDataServiceStub,
+    location: messages_pb2.ListLocationsResponse.LocationSummary,
+    start_date: datetime,
+    end_date: datetime,
+    selected_forecaster: messages_pb2.Forecaster,
+) -> pd.DataFrame:
+    """Fetch forecast data for one forecaster from the Data Platform, without caching."""
+
+    async def fetch_window(window_start: datetime, window_end: datetime) -> pd.DataFrame:
         stream_forecast_data_request = messages_pb2.StreamForecastDataRequest(
             location_uuid=location.location_uuid,
             energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
             time_window=messages_pb2.TimeWindow(
-                start_timestamp_utc=temp_start_date,
-                end_timestamp_utc=temp_end_date,
+                start_timestamp_utc=window_start,
+                end_timestamp_utc=window_end,
             ),
             forecasters=[messages_pb2.Forecaster(forecaster_name=selected_forecaster.forecaster_name, 
                                                  forecaster_version=selected_forecaster.forecaster_version)],
         )
 
-        forecasts = []
-        async for chunk in dpc.StreamForecastData(stream_forecast_data_request):
-            forecasts.extend(chunk.values)
-        
-        if len(forecasts) > 0:
-            all_data_list_dict.extend(MessageToDict(f, always_print_fields_with_no_presence=True) for f in forecasts)
-
-        temp_start_date = temp_start_date + timedelta(days=30)
-
-    all_data_df = pd.DataFrame.from_dict(all_data_list_dict)
-
-    # change from camelCase to snake_case
-    all_data_df = all_data_df.rename(
-        columns={
-            "locationUuid": "location_uuid",
-            "forecasterFullname": "forecaster_fullname",
-            "forecasterName": "forecaster_name",
-            "effectiveCapacityWatts": "effective_capacity_watts",
-            "p50Fraction": "p50_fraction",
-            "initTimestamp": "init_timestamp",
-            "horizonMins": "horizon_mins",
-            "targetTimestampUtc": "target_timestamp_utc",
-            "otherStatisticsFractions": "other_statistics_fractions",
-        },
+        # decode each chunk straight into columns, p-levels become {plevel}_fraction
+        window_dfs = [
+            decode_stream_forecast_values(chunk.values)
+            async for chunk in dpc.StreamForecastData(stream_forecast_data_request)
+            if len(chunk.values) > 0
+        ]
+        if len(window_dfs) == 0:
+            return decode_stream_forecast_values([])
+        return pd.concat(window_dfs, ignore_index=True)
+
+    # Grab all the data, in time windows sized for the location type to avoid too large requests
+    all_data_df = await forecast_stream_chunker.fetch(
+        str(location.location_type), start_date, end_date, fetch_window,
     )
+    all_data_df = [df for df in all_data_df if not df.empty]
 
     if len(all_data_df) == 0:
-        return pd.DataFrame(columns=[
-            "location_uuid",
-            "forecaster_fullname",
-            "forecaster_name",
-            "effective_capacity_watts",
-            "p50_fraction",
-            "init_timestamp",
-            "horizon_mins",
-            "target_timestamp_utc",
-        ])
-
-    # get plevels into columns and rename them 'fraction
-    columns_before_expand = set(all_data_df.columns)
-    if "other_statistics_fractions" in all_data_df.columns:
-        all_data_df = all_data_df.pipe(
-            lambda df: df.join(pd.json_normalize(df["other_statistics_fractions"])),
-        ).drop("other_statistics_fractions", axis=1)
-    new_columns = set(all_data_df.columns) - columns_before_expand
-    if len(new_columns) > 0:
-        all_data_df = all_data_df.rename(columns={col: f"{col}_fraction" for col in new_columns})
-
-    # create column forecaster_name, its forecaster_fullname with version removed
-    all_data_df["forecaster_name"] = all_data_df["forecaster_fullname"]\
-        .str.rsplit(":", n=1).str[0]  # split from right, max 1 split
+        return decode_stream_forecast_values([])
 
-    return all_data_df
+    return pd.concat(all_data_df, ignore_index=True)
 
 
-@cached(ttl=cache_seconds, cache=Cache.MEMORY, key_builder=key_builder_remove_client)
-async def get_all_observations(
+async def get_observations_one_observer(
     client: service_pb2_grpc.DataPlatformDataServiceStub,
     location: messages_pb2.ListLocationsResponse.LocationSummary,
+    observer_name: str,
     start_date: datetime,
     end_date: datetime,
 ) -> pd.DataFrame:
-    """Get all observations for the given location and time window."""
-    all_observations_df = []
-
-    for observer_name in observer_names:
-        # Get all the observations for this observer_name, in chunks of 7 days
-        observation_one_df = []
-        temp_start_date = start_date
-        while temp_start_date <= end_date:
-            temp_end_date = min(temp_start_date + timedelta(days=7), end_date)
-
-            get_observations_request = messages_pb2.GetObservationsAsTimeseriesRequest(
-                observer_name=observer_name,
-                location_uuid=location.location_uuid,
-                energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
-                time_window=messages_pb2.TimeWindow(start_timestamp_utc=temp_start_date, 
-                                                    end_timestamp_utc=temp_end_date),
-            )
-            get_observations_response = await client.GetObservationsAsTimeseries(
-                get_observations_request,
-            )
-
-            observations = [
-                MessageToDict(chunk, always_print_fields_with_no_presence=True)
-                for chunk in get_observations_response.values
-            ]
+    """Get the observations of one observer for the given location and time window.
+
+    The data is cached per UTC day, so only missing days are fetched.
+    """
+    observation_one_df = await segment_cache.get(
+        key_prefix=f"observation:{location.location_uuid}:{observer_name}",
+        location_uuid=location.location_uuid,
+        start_date=start_date,
+        end_date=end_date,
+        fetch=lambda start, end: fetch_observations_one_observer(
+            client, location, observer_name, start, end,
+        ),
+        time_column="timestamp_utc",
+    )
 
-            observation_one_df.append(pd.DataFrame.from_dict(observations))
+    # days before the latest pvlive_day_after update won't change any more
+    if observer_name == "pvlive_day_after" and not observation_one_df.empty:
+        segment_cache.mark_immutable_before(
+            location.location_uuid, observation_one_df["timestamp_utc"].max(),
+        )
 
-            temp_start_date = temp_start_date + timedelta(days=7)
+    return observation_one_df
 
-        observation_one_df = pd.concat(observation_one_df, ignore_index=True)
 
-        # rename varibales from Camel case to snake case
-        observation_one_df = observation_one_df.rename(columns={
-            "timestampUtc": "timestamp_utc",
-            "effectiveCapacityWatts": "effective_capacity_watts",
-            "valueFraction": "value_fraction",
-        })
+def observation_requests(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location: messages_pb2.ListLocationsResponse.LocationSummary,
+    start_date: datetime,
+    end_date: datetime,
+) -> list[FetchRequest]:
+    """One fetch plan request per observer."""
+    return [
+        FetchRequest(
+            kind="observation",
+            label=observer_name,
+            fetch=lambda observer_name=observer_name: get_observations_one_observer(
+                client, location, observer_name, start_date, end_date,
+            ),
+        )
+        for observer_name in observer_names
+    ]
 
-        # Handle case where no observation data is returned
-        if (
-            not observation_one_df.empty
-            and "timestamp_utc" in observation_one_df.columns
-        ):
-            observation_one_df = observation_one_df.sort_values(by="timestamp_utc")
-        else:
-            observation_one_df = pd.DataFrame()
 
-        if not observation_one_df.empty:
-            observation_one_df["observer_name"] = observer_name
+async def get_all_observations(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location: messages_pb2.ListLocationsResponse.LocationSummary,
+    start_date: datetime,
+    end_date: datetime,
+) -> pd.DataFrame:
+    """Get all observations for the given location and time window, all observers at once."""
+    plan_result = await run_plan(observation_requests(client, location, start_date, end_date))
+    plan_result.raise_first_error()
+    return combine_observations(plan_result.frames("observation"))
 
-        all_observations_df.append(observation_one_df)
 
-    all_observations_df = pd.concat(all_observations_df, ignore_index=True)
+def combine_observations(observer_dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate the observations of each observer, and add the watt values."""
+    all_observations_df = pd.concat(observer_dfs, ignore_index=True)
     # If no observations were returned at all, return empty dataframe
     if all_observations_df.empty:
         return pd.DataFrame()
@@ -217,52 +225,92 @@ async def get_all_observations(
     all_observations_df["value_watts"] = (
         all_observations_df["value_fraction"] * all_observations_df["effective_capacity_watts"]
     )
-    all_observations_df["timestamp_utc"] = pd.to_datetime(all_observations_df["timestamp_utc"])
 
     return all_observations_df
 
 
-async def get_all_data(
+async def fetch_observations_one_observer(
     client: service_pb2_grpc.DataPlatformDataServiceStub,
-    selected_location: messages_pb2.ListLocationsResponse.LocationSummary,
+    location: messages_pb2.ListLocationsResponse.LocationSummary,
+    observer_name: str,
     start_date: datetime,
     end_date: datetime,
-    selected_forecasters: list[messages_pb2.Forecaster],
-) -> dict:
-    """Get all forecast and observation data, and merge them."""
-    # get generation data
-    time_start = time.time()
-    all_observations_df = await get_all_observations(
-        client,
-        selected_location,
-        start_date,
-        end_date,
+) -> pd.DataFrame:
+    """Fetch observations for one observer from the Data Platform, without caching."""
+
+    async def fetch_window(window_start: datetime, window_end: datetime) -> pd.DataFrame:
+        get_observations_request = messages_pb2.GetObservationsAsTimeseriesRequest(
+            observer_name=observer_name,
+            location_uuid=location.location_uuid,
+            energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+            time_window=messages_pb2.TimeWindow(start_timestamp_utc=window_start, 
+                                                end_timestamp_utc=window_end),
+        )
+        get_observations_response = await client.GetObservationsAsTimeseries(
+            get_observations_request,
+        )
+
+        observations = [
+            MessageToDict(chunk, always_print_fields_with_no_presence=True)
+            for chunk in get_observations_response.values
+        ]
+
+        return pd.DataFrame.from_dict(observations)
+
+    # Get all the observations for this observer_name, in time windows sized for the location type
+    observation_one_df = await observations_chunker.fetch(
+        str(location.location_type), start_date, end_date, fetch_window,
     )
-    observation_seconds = time.time() - time_start
-
-    # get forcast all data
-    time_start = time.time()
-    all_forecast_data_df = await get_forecast_data(
-        client,
-        selected_location,
-        start_date,
-        end_date,
-        selected_forecasters,
+
+    observation_one_df = (
+        pd.concat(observation_one_df, ignore_index=True)
+        if observation_one_df
+        else pd.DataFrame()
     )
-    forecast_seconds = time.time() - time_start
 
-    # If the observation data includes pvlive_day_after and pvlive_in_day,
-    # then lets just take pvlive_day_after
-    one_observations_df = all_observations_df
+    # rename varibales from Camel case to snake case
+    observation_one_df = observation_one_df.rename(columns={
+        "timestampUtc": "timestamp_utc",
+        "effectiveCapacityWatts": "effective_capacity_watts",
+        "valueFraction": "value_fraction",
+    })
+
+    # Handle case where no observation data is returned
     if (
-        not all_observations_df.empty
-        and "observer_name" in all_observations_df.columns
-        and "pvlive_day_after" in all_observations_df["observer_name"].values
+        observation_one_df.empty
+        or "timestamp_utc" not in observation_one_df.columns
     ):
+        return pd.DataFrame()
 
-        one_observations_df = all_observations_df[
-            all_observations_df["observer_name"] == "pvlive_day_after"
-        ]
+    observation_one_df["timestamp_utc"] = pd.to_datetime(observation_one_df["timestamp_utc"])
+    observation_one_df = observation_one_df.sort_values(by="timestamp_utc")
+    observation_one_df["observer_name"] = observer_name
+
+    return observation_one_df
+
+
+async def get_all_data(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    selected_location: messages_pb2.ListLocationsResponse.LocationSummary,
+    start_date: datetime,
+    end_date: datetime,
+    selected_forecasters: list[messages_pb2.Forecaster],
+) -> dict:
+    """Get all forecast and observation data, and merge them.
+
+    The forecasters and observers are all fetched at once. forecast_seconds and
+    observation_seconds are when the last request of each kind finished.
+    """
+    plan_result = await run_plan(
+        observation_requests(client, selected_location, start_date, end_date)
+        + forecast_requests(client, selected_location, start_date, end_date, selected_forecasters),
+    )
+    plan_result.raise_first_error()
+
+    all_observations_df = combine_observations(plan_result.frames("observation"))
+    all_forecast_data_df = combine_forecast_data(plan_result.frames("forecast"))
+    observation_seconds = plan_result.kind_seconds("observation")
+    forecast_seconds = plan_result.kind_seconds("forecast")
 
     # make target_timestamp_utc
     all_forecast_data_df["init_timestamp"] = pd.to_datetime(all_forecast_data_df["init_timestamp"])
@@ -286,13 +334,14 @@ async def get_all_data(
     ]
 
     # take the foecast data, and group by horizonMins, forecasterFullName
-    # calculate mean absolute error between p50Fraction and observations valueFraction
-    merged_df = pd.merge(
+    # calculate mean absolute error between p50Fraction and observations valueFraction.
+    # Where several observers have a value, pvlive_day_after is used over pvlive_in_day
+    merged_df = join_observations(
         all_forecast_data_df[forecast_cols],
-        one_observations_df[obs_cols],
-        left_on=["target_timestamp_utc"],
-        right_on=["timestamp_utc"],
-        how="inner",
+        all_observations_df,
+        forecast_time_column="target_timestamp_utc",
+        observation_time_column="timestamp_utc",
+        observation_columns=obs_cols,
         suffixes=("_forecast", "_observation"),
     )
 
@@ -0,0 +1,180 @@
+"""Columnar decoding of Data Platform protobuf responses into DataFrames.
+
+Rather than building a Python dict per value, each field is read once into a
+NumPy array and one DataFrame is built per response.
+"""
+
+from collections.abc import Iterable
+
+import numpy as np
+import pandas as pd
+from ocf.dp.dp_data import messages_pb2
+
+from dataplatform.forecast.constant import plevel_names
+
+NANOS_PER_SECOND = 1_000_000_000
+NANOS_PER_MINUTE = 60 * NANOS_PER_SECOND
+
+stream_forecast_columns = [
+    "location_uuid",
+    "forecaster_fullname",
+    "forecaster_name",
+    "effective_capacity_watts",
+    "p50_fraction",
+    "init_timestamp",
+    "horizon_mins",
+    "target_timestamp_utc",
+    "created_timestamp_utc",
+]
+
+
+def timestamps_to_ns(timestamps: Iterable, count: int) -> np.ndarray:
+    """Convert protobuf Timestamps to int64 nanoseconds since the epoch."""
+    return np.fromiter(
+        (ts.seconds * NANOS_PER_SECOND + ts.nanos for ts in timestamps),
+        dtype=np.int64,
+        count=count,
+    )
+
+
+def ns_to_utc_datetime(ns: np.ndarray) -> pd.DatetimeIndex:
+    """Convert int64 nanoseconds since the epoch to tz-aware UTC datetimes."""
+    return pd.to_datetime(ns, unit="ns", utc=True)
+
+
+def plevel_fractions(
+    maps: list,
+    count: int,
+    plevels: list[str] = plevel_names,
+) -> dict[str, np.ndarray]:
+    """Read the p-level fractions from other_statistics_fractions maps.
+
+    Only p-levels that appear in at least one value are returned, missing values are NaN.
+    """
+    fractions = {}
+    for plevel in plevels:
+        values = np.fromiter(
+            (m.get(plevel, np.nan) for m in maps),
+            dtype=np.float32,
+            count=count,
+        )
+        if not np.isnan(values).all():
+            fractions[plevel] = values
+    return fractions
+
+
+def fraction_to_watts(fraction: np.ndarray, capacity_watts: np.ndarray) -> np.ndarray:
+    """Multiply a fraction by the capacity, truncating to whole watts where possible."""
+    watts = np.trunc(fraction.astype(np.float64) * capacity_watts)
+    if np.isnan(watts).any():
+        return watts
+    return watts.astype(np.int64)
+
+
+def decode_forecast_timeseries(
+    response: messages_pb2.GetForecastAsTimeseriesResponse,
+    forecaster_name: str,
+) -> pd.DataFrame:
+    """Decode a GetForecastAsTimeseriesResponse into a DataFrame.
+
+    The columns are target_timestamp_utc, initialization_timestamp_utc,
+    created_timestamp_utc, effective_capacity_watts, forecaster_name, location_uuid,
+    horizon_mins, p50_watts and a {plevel}_watts column for each p-level present.
+    """
+    values = response.values
+    n = len(values)
+    if n == 0:
+        return pd.DataFrame()
+
+    target_ns = timestamps_to_ns((v.target_timestamp_utc for v in values), n)
+    init_ns = timestamps_to_ns((v.initialization_timestamp_utc for v in values), n)
+    created_ns = timestamps_to_ns((v.created_timestamp_utc for v in values), n)
+    capacity_watts = np.fromiter(
+        (v.effective_capacity_watts for v in values), dtype=np.int64, count=n,
+    )
+    p50_fraction = np.fromiter(
+        (v.p50_value_fraction for v in values), dtype=np.float32, count=n,
+    )
+    other_fractions = plevel_fractions([v.other_statistics_fractions for v in values], n)
+
+    columns = {
+        "target_timestamp_utc": ns_to_utc_datetime(target_ns),
+        "initialization_timestamp_utc": ns_to_utc_datetime(init_ns),
+        "created_timestamp_utc": ns_to_utc_datetime(created_ns),
+        "effective_capacity_watts": capacity_watts,
+        "forecaster_name": forecaster_name,
+        "location_uuid": response.location_uuid,
+        "horizon_mins": (target_ns - init_ns) // NANOS_PER_MINUTE,
+        "p50_watts": fraction_to_watts(p50_fraction, capacity_watts),
+    }
+    for plevel, fraction in other_fractions.items():
+        columns[f"{plevel}_watts"] = fraction_to_watts(fraction, capacity_watts)
+
+    return pd.DataFrame(columns)
+
+
+def decode_stream_forecast_values(
+    values: list,
+    plevels: list[str] = plevel_names,
+) -> pd.DataFrame:
+    """Decode StreamForecastData values into a DataFrame of fractions.
+
+    The columns are location_uuid, forecaster_fullname, forecaster_name,
+    effective_capacity_watts, p50_fraction, a {plevel}_fraction column for each p-level
+    in plevels that is present, init_timestamp, horizon_mins, target_timestamp_utc
+    and created_timestamp_utc.
+    """
+    n = len(values)
+    if n == 0:
+        return pd.DataFrame(columns=stream_forecast_columns)
+
+    init_ns = timestamps_to_ns((v.init_timestamp for v in values), n)
+    created_ns = timestamps_to_ns((v.created_timestamp_utc for v in values), n)
+    horizon_mins = np.fromiter((v.horizon_mins for v in values), dtype=np.int64, count=n)
+    forecaster_fullname = pd.Series([v.forecaster_fullname for v in values], dtype=object)
+
+    columns = {
+        "location_uuid": [v.location_uuid for v in values],
+        "forecaster_fullname": forecaster_fullname,
+        # forecaster_fullname is name:version, so remove the version
+        "forecaster_name": forecaster_fullname.str.rsplit(":", n=1).str[0],
+        "effective_capacity_watts": np.fromiter(
+            (v.effective_capacity_watts for v in values), dtype=np.int64, count=n,
+        ),
+        "p50_fraction": np.fromiter((v.p50_fraction for v in values), dtype=np.float32, count=n),
+    }
+    other_fractions = plevel_fractions([v.other_statistics_fractions for v in values], n, plevels)
+    for plevel, fraction in other_fractions.items():
+        columns[f"{plevel}_fraction"] = fraction
+    columns["init_timestamp"] = ns_to_utc_datetime(init_ns)
+    columns["horizon_mins"] = horizon_mins
+    columns["target_timestamp_utc"] = ns_to_utc_datetime(
+        init_ns + horizon_mins * NANOS_PER_MINUTE,
+    )
+    columns["created_timestamp_utc"] = ns_to_utc_datetime(created_ns)
+
+    return pd.DataFrame(columns)
+
+
+def stream_forecast_fractions_to_watts(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn decoded StreamForecastData fractions into rounded watt columns.
+
+    The fraction columns are replaced by {plevel}_watts columns, init_timestamp is
+    renamed to initialization_timestamp_utc and forecaster_fullname is dropped.
+    """
+    capacity_watts = df["effective_capacity_watts"].to_numpy(dtype=np.float64)
+    fraction_columns = [col for col in df.columns if col.endswith("_fraction")]
+
+    watts = {
+        f"{col.removesuffix('_fraction')}_watts": pd.Series(
+            np.round(df[col].to_numpy(dtype=np.float64) * capacity_watts),
+            index=df.index,
+        ).astype("Int64")
+        for col in fraction_columns
+    }
+
+    return (
+        df.drop(columns=[*fraction_columns, "forecaster_fullname"])
+        .rename(columns={"init_timestamp": "initialization_timestamp_utc"})
+        .assign(**watts)
+    )
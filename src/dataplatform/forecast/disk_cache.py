@@ -0,0 +1,71 @@
+"""On-disk Parquet cache for decoded Data Platform DataFrames.
+
+This sits behind the in-memory caches, so that restarts and deploys don't refetch long
+historical time windows. Files are named by a hash of their cache key, and written
+atomically, so several Streamlit processes on the same host can share one directory.
+The directory is kept under a size cap by deleting the least recently used files.
+"""
+
+import hashlib
+import os
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from dataplatform.forecast.constant import disk_cache_dir, disk_cache_max_bytes
+
+
+class DiskCache:
+    """Parquet files in a directory, with a size cap and LRU eviction."""
+
+    def __init__(self, directory: str = disk_cache_dir, max_bytes: int = disk_cache_max_bytes):
+        """Use a cache directory, which is made when the first file is written."""
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> Path:
+        """Path of the file for a cache key."""
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()}.parquet"
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        """Read a DataFrame, or None if it is not cached."""
+        path = self.path(key)
+        try:
+            df = pd.read_parquet(path)
+            # the modified time is used as the last used time for eviction
+            os.utime(path)
+        except (FileNotFoundError, OSError):
+            return None
+        return df
+
+    def set(self, key: str, df: pd.DataFrame) -> None:
+        """Write a DataFrame, then evict old files if the cache is too big."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        # write to a temporary file and rename, so other processes never read a partial file
+        temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            df.to_parquet(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete the least recently used files until the cache is under its size cap."""
+        files = []
+        for path in self.directory.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # another process has just deleted it
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
@@ -0,0 +1,100 @@
+"""Downsampling of time series before they are sent to the browser.
+
+Long time windows with several forecasters make Plotly figures of tens of MB. Each
+trace is cut down to a few points per pixel of chart width with Largest-Triangle-
+Three-Buckets (LTTB), which keeps the peaks and troughs a line chart needs. A selected
+sub-range is filtered first, so zooming in gets the full resolution back. The page can't
+read the width a chart is drawn at, so it is picked on the page, defaulting to a full
+width chart.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.forecast.join import time_index_ns
+
+# roughly the width of a full width chart, and the points per pixel worth sending
+chart_width_px = 1400
+points_per_px = 2
+
+# chart widths to choose from on the page, for small windows up to 4K screens
+chart_widths_px = [700, 1000, 1400, 2000, 2800, 3840]
+
+
+def max_points_for_width(width_px: int = chart_width_px) -> int:
+    """Maximum points per trace for a chart width."""
+    return width_px * points_per_px
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept. The points in between are split into
+    n_out - 2 buckets, and from each bucket the point making the largest triangle with
+    the previous kept point and the mean of the next bucket is kept. x must be sorted.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype(float)
+    # missing values are drawn as gaps, so they shouldn't win a bucket
+    y = np.nan_to_num(y.astype(float))
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[previous] - mean_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (mean_y - y[previous]),
+        )
+        previous = start + int(np.argmax(area))
+        indices[bucket + 1] = previous
+
+    return indices
+
+
+def downsample(
+    df: pd.DataFrame,
+    x_column: str,
+    y_column: str,
+    max_points: int | None,
+) -> pd.DataFrame:
+    """Keep at most max_points rows of a time series, chosen by LTTB on one y column.
+
+    All the other columns keep the same rows, so p10 and p90 bands stay aligned with
+    the p50 line. max_points=None keeps everything.
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+
+    df = df.sort_values(x_column)
+    indices = lttb_indices(
+        time_index_ns(df[x_column]),
+        df[y_column].to_numpy(dtype=float, na_value=np.nan),
+        max_points,
+    )
+    return df.iloc[indices]
+
+
+def filter_x_range(
+    df: pd.DataFrame,
+    x_column: str,
+    x_range: tuple[pd.Timestamp, pd.Timestamp] | None,
+) -> pd.DataFrame:
+    """Keep the rows in a selected x range, or all of them if there is no selection."""
+    if x_range is None or df.empty:
+        return df
+    return df[(df[x_column] >= x_range[0]) & (df[x_column] <= x_range[1])]
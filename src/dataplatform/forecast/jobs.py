@@ -0,0 +1,178 @@
+"""Background jobs for long fetch and compute pipelines on the Data Platform pages.
+
+Each Streamlit rerun runs the page in a new asyncio.run, so work awaited by the page is
+abandoned whenever a widget changes. Instead, a JobRunner runs pipelines on its own
+event loop in a background thread, shared by every session in the process. Jobs are
+keyed by what they compute, so a page can poll its job for progress and partial
+results, and pick it up again after a rerun. Two sessions asking for the same key share
+one job, which is only cancelled once every session attached to it has cancelled.
+"""
+
+import asyncio
+import threading
+import time
+from collections.abc import Callable, Coroutine, Hashable
+
+import streamlit as st
+
+from dataplatform.forecast.constant import job_keep_seconds
+from dataplatform.forecast.setup import PageConfig
+from dataplatform.forecast.tracing import Tracer, current_tracer
+
+
+def page_config_key(cfg: PageConfig) -> tuple:
+    """The parts of a page config that change the data fetched.
+
+    The scale factor, units and metric only change how results are shown, so sessions
+    that differ in those still share jobs. With all_horizons, neither does the horizon.
+    """
+    horizon = None if cfg.all_horizons else (cfg.forecast_horizon, cfg.strict_horizon_filtering)
+    return (
+        cfg.location.location_uuid,
+        tuple(sorted(f"{f.forecaster_name}:{f.forecaster_version}" for f in cfg.forecasters)),
+        cfg.start_date.isoformat(),
+        cfg.end_date.isoformat(),
+        cfg.forecast_type,
+        horizon,
+        tuple(t0.isoformat() for t0 in cfg.t0s or []),
+        cfg.all_horizons,
+        cfg.compare_versions,
+    )
+
+
+class Job:
+    """A pipeline running in the background, with its progress, partial result and outcome.
+
+    state is running, done, failed or cancelled. The pipeline updates the progress and
+    partial result from the runner's thread, and pages read them from theirs.
+    """
+
+    def __init__(self, key: Hashable) -> None:
+        """Make a job that hasn't started."""
+        self.key = key
+        self.state = "running"
+        self.progress = 0.0
+        self.message = ""
+        self.partial = None
+        self.result = None
+        self.error: BaseException | None = None
+        self.tracer = Tracer({"job": str(key)})
+        self.sessions: set[str] = set()
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        self.future = None
+        self.lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether the job hasn't finished yet."""
+        return self.state == "running"
+
+    @property
+    def seconds(self) -> float:
+        """Seconds the job has been running for, or took."""
+        return (self.finished or time.monotonic()) - self.started
+
+    def update(self, progress: float, message: str = "", partial: object = None) -> None:
+        """Report progress from 0 to 1, and optionally a partial result."""
+        with self.lock:
+            self.progress = progress
+            self.message = message
+            if partial is not None:
+                self.partial = partial
+
+    def snapshot(self) -> tuple[float, str, object]:
+        """The progress, message and partial result, read together."""
+        with self.lock:
+            return self.progress, self.message, self.partial
+
+
+class JobRunner:
+    """Runs jobs on an event loop in a background thread, one job per key."""
+
+    def __init__(self) -> None:
+        """Start the event loop thread."""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="dataplatform-jobs", daemon=True,
+        )
+        self.thread.start()
+        self.jobs: dict[Hashable, Job] = {}
+        self.lock = threading.Lock()
+
+    def submit(
+        self,
+        key: Hashable,
+        pipeline: Callable[[Job], Coroutine],
+        session_id: str,
+    ) -> Job:
+        """Attach to the job for a key, starting pipeline(job) if there isn't one.
+
+        A job that failed or was cancelled is started again. The pipeline runs on the
+        runner's loop, so it mustn't call Streamlit.
+        """
+        with self.lock:
+            self.prune()
+            job = self.jobs.get(key)
+            if job is None or job.state in ("failed", "cancelled"):
+                job = Job(key)
+                self.jobs[key] = job
+                job.future = asyncio.run_coroutine_threadsafe(self._run(job, pipeline), self.loop)
+            job.sessions.add(session_id)
+            return job
+
+    async def _run(self, job: Job, pipeline: Callable[[Job], Coroutine]) -> None:
+        """Run a pipeline, recording its result or error on the job."""
+        current_tracer.set(job.tracer)
+        try:
+            result = await pipeline(job)
+            state = "done"
+        except asyncio.CancelledError:
+            result, state = None, "cancelled"
+        except Exception as e:
+            job.error = e
+            result, state = None, "failed"
+        with self.lock:
+            # a cancelled job is marked as soon as it is cancelled
+            if job.running:
+                job.result = result
+                job.state = state
+                job.finished = time.monotonic()
+
+    def get(self, key: Hashable) -> Job | None:
+        """The job for a key, if there is one."""
+        with self.lock:
+            return self.jobs.get(key)
+
+    def detach(self, key: Hashable, session_id: str) -> None:
+        """Stop a session following a job, without cancelling it."""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                job.sessions.discard(session_id)
+
+    def cancel(self, key: Hashable, session_id: str) -> None:
+        """Detach a session from a job, and cancel the job if no other session is attached."""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                return
+            job.sessions.discard(session_id)
+            if job.running and len(job.sessions) == 0:
+                job.future.cancel()
+                # marked here, as a job cancelled before it started never runs _run
+                job.state = "cancelled"
+                job.finished = time.monotonic()
+
+    def prune(self) -> None:
+        """Forget finished jobs that no session has picked up for a while."""
+        now = time.monotonic()
+        for key, job in list(self.jobs.items()):
+            if job.finished is not None and now - job.finished > job_keep_seconds:
+                del self.jobs[key]
+
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    """Get the job runner, shared by all the sessions in this process."""
+    return JobRunner()
@@ -0,0 +1,117 @@
+"""Join forecasts with observations, using one observation per timestamp.
+
+The observations frame holds every observer, so a plain merge on the timestamp duplicates
+each forecast row once per observer. Instead, one observation is picked per timestamp by
+an observer priority list, and forecasts are matched to it on an int64 nanosecond time
+index with a binary search, rather than a hash merge on datetimes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.forecast.constant import observer_priority as default_observer_priority
+
+
+def time_index_ns(timestamps: pd.Series) -> np.ndarray:
+    """Nanoseconds since the epoch, as int64, for a datetime column."""
+    return pd.DatetimeIndex(timestamps).as_unit("ns").asi8
+
+
+def select_observations(
+    observations_df: pd.DataFrame,
+    time_column: str,
+    observer_priority: list[str] = default_observer_priority,
+) -> pd.DataFrame:
+    """Pick one observation per timestamp, by observer priority, sorted by time.
+
+    Observers that are not in the priority list are used last.
+    """
+    if observations_df.empty:
+        return observations_df
+
+    if "observer_name" in observations_df.columns:
+        ranks = {name: rank for rank, name in enumerate(observer_priority)}
+        # a categorical observer_name maps to a categorical, so make it floats to fill
+        rank = (
+            observations_df["observer_name"]
+            .map(ranks)
+            .astype(float)
+            .fillna(len(observer_priority))
+            .to_numpy()
+        )
+    else:
+        rank = np.zeros(len(observations_df))
+
+    time_ns = time_index_ns(observations_df[time_column])
+    order = np.lexsort((rank, time_ns))
+    sorted_time_ns = time_ns[order]
+    # the first row of each timestamp has the best rank
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_time_ns[1:] != sorted_time_ns[:-1]
+
+    return observations_df.iloc[order[first]].reset_index(drop=True)
+
+
+def join_observations(
+    forecast_df: pd.DataFrame,
+    observations_df: pd.DataFrame,
+    forecast_time_column: str = "target_timestamp_utc",
+    observation_time_column: str = "target_timestamp_utc",
+    observation_columns: list[str] | None = None,
+    suffixes: tuple[str, str] = ("", "_observation"),
+    observer_priority: list[str] = default_observer_priority,
+) -> pd.DataFrame:
+    """Inner join forecasts with one observation per timestamp.
+
+    Like pd.merge with how="inner", the forecast row order is kept, and columns in both
+    frames get the suffixes. The observation time column is only kept when it has a
+    different name to the forecast time column.
+
+    Args:
+        forecast_df: forecasts, with a datetime forecast_time_column
+        observations_df: observations for any observers, with a datetime
+            observation_time_column and optionally observer_name
+        forecast_time_column: the forecast column to join on
+        observation_time_column: the observation column to join on
+        observation_columns: the observation columns to keep, defaults to all of them
+        suffixes: added to the forecast and observation column names that clash
+        observer_priority: the preferred observers, best first
+    """
+    if observation_columns is None:
+        observation_columns = list(observations_df.columns)
+    if observations_df.empty:
+        observations_df = pd.DataFrame(
+            columns=list(dict.fromkeys([observation_time_column, *observation_columns])),
+        )
+    observation_columns = [
+        column
+        for column in observation_columns
+        if not (column == observation_time_column == forecast_time_column)
+    ]
+
+    selected_df = select_observations(observations_df, observation_time_column, observer_priority)
+    observation_time_ns = time_index_ns(selected_df[observation_time_column])
+    forecast_time_ns = time_index_ns(forecast_df[forecast_time_column])
+
+    # binary search each forecast time in the sorted, unique observation times
+    position = np.searchsorted(observation_time_ns, forecast_time_ns)
+    position = np.minimum(position, max(len(observation_time_ns) - 1, 0))
+    if len(observation_time_ns) > 0:
+        matched = observation_time_ns[position] == forecast_time_ns
+    else:
+        matched = np.zeros(len(forecast_time_ns), dtype=bool)
+
+    clashing = set(forecast_df.columns) & set(observation_columns)
+    joined_forecast_df = (
+        forecast_df[matched]
+        .reset_index(drop=True)
+        .rename(columns={c: f"{c}{suffixes[0]}" for c in clashing})
+    )
+    joined_observation_df = (
+        selected_df[observation_columns]
+        .iloc[position[matched]]
+        .reset_index(drop=True)
+        .rename(columns={c: f"{c}{suffixes[1]}" for c in clashing})
+    )
+
+    return pd.concat([joined_forecast_df, joined_observation_df], axis=1)
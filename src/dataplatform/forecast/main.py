@@ -4,44 +4,289 @@ import asyncio
 import os
 import dataclasses
 import datetime
+import time
+
+from collections.abc import AsyncIterator
 
 import pandas as pd
 import streamlit as st
-import grpc.aio
-from ocf.dp.dp import common_pb2
-from ocf.dp.dp_data import service_pb2_grpc
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from dataplatform.channels import get_channel_manager
 
 from dataplatform.forecast.constant import metrics, observer_names
 from dataplatform.forecast.backend import (
-    fetch_observations,
-    fetch_timeseries,
-    fetch_all_forecasts,
+    show_errors,
+    stream_all_forecasts,
+    stream_horizon_forecasts,
+    stream_progress,
+)
+from dataplatform.forecast.constant import (
+    forecast_interval_minutes,
+    forecast_max_horizon_minutes,
+    metrics_batch_rows,
+)
+from dataplatform.forecast.downsample import (
+    chart_width_px,
+    chart_widths_px,
+    max_points_for_width,
 )
+from dataplatform.forecast.jobs import Job, JobRunner, get_job_runner, page_config_key
+from dataplatform.forecast.join import join_observations
+from dataplatform.forecast.metrics import MetricAccumulator, MetricCubeBuilder
+from dataplatform.forecast.planner import fetch_page_data
 from dataplatform.forecast.plot import (
     plot_forecast_metric_per_day,
     plot_forecast_metric_vs_horizon_minutes,
     plot_forecast_time_series,
+    plot_revision_heatmap,
+    figure_payload_stats,
     make_summary_data,
     make_summary_data_metric_vs_horizon_minutes,
     plot_quantile_plot
 )
-from dataplatform.forecast.setup import setup_page
+from dataplatform.forecast.revisions import (
+    make_revision_heatmap,
+    make_revision_stats,
+    make_revisions,
+)
+from dataplatform.forecast.scheduler import RpcScheduler, ScheduledDataPlatformClient
+from dataplatform.forecast.schema import compaction_df
+from dataplatform.forecast.selection import ForecastIndex
+from dataplatform.forecast.setup import PageConfig, setup_page
+from dataplatform.forecast.strategy import FetchStrategy, choose_horizon_strategy, horizon_band
+from dataplatform.forecast.tracing import (
+    Tracer,
+    current_tracer,
+    frame_bytes,
+    span,
+    spans_df,
+    stage_summary_df,
+)
+from dataplatform.forecast.versions import StreamDeduper, forecaster_labels
+from export import data_fingerprint, lazy_download_button
 
 data_platform_host = os.getenv("DATA_PLATFORM_HOST", "localhost")
 data_platform_port = int(os.getenv("DATA_PLATFORM_PORT", "50051"))
 
+# how often to poll a metrics job, and redraw its partial plot
+partial_plot_seconds = 2
+
+
+def selected_x_range(event: dict) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    """The UTC time range of a box selection on a plotly chart, if there is one."""
+    boxes = event.get("selection", {}).get("box", []) if event else []
+    if len(boxes) == 0 or "x" not in boxes[0]:
+        return None
+    x_values = [pd.Timestamp(x) for x in boxes[0]["x"]]
+    x_values = [x.tz_localize("UTC") if x.tzinfo is None else x for x in x_values]
+    return min(x_values), max(x_values)
+
+
+@dataclasses.dataclass
+class MetricsJobResult:
+    """What a metrics job hands back to the page."""
+
+    cube: MetricAccumulator
+    n_forecast_rows: int
+    rpc_timings_df: pd.DataFrame
+
+
+async def frame_batches(df: pd.DataFrame) -> AsyncIterator[pd.DataFrame]:
+    """Yield a DataFrame that is already in memory in slices, like a stream."""
+    for start in range(0, len(df), metrics_batch_rows):
+        yield df.iloc[start : start + metrics_batch_rows]
+
+
+async def metrics_pipeline(
+    job: Job,
+    channel_client: object,
+    lcfg: PageConfig,
+    all_observations_df: pd.DataFrame,
+    metrics_strategy: FetchStrategy | None,
+    band_forecast_df: pd.DataFrame | None,
+    min_horizon: int,
+    max_horizon: int,
+    align_t0s: bool,
+) -> MetricsJobResult:
+    """Fetch the forecasts in a band of horizons, join the observations and roll up metrics.
+
+    This runs as a background job, so it reports its progress and the partial summary
+    to the job rather than to the page. If the forecasts in the band are already in
+    memory, band_forecast_df is used rather than fetching them with metrics_strategy.
+    """
+    # the job runs on its own event loop, so it gets its own scheduler
+    scheduler = RpcScheduler()
+    client = ScheduledDataPlatformClient(channel_client, scheduler)
+    last_partial_time = time.monotonic()
+
+    # Merge each chunk as it arrives and fold it into the cube, then drop it, so the
+    # merged data isn't held all at once, and partial metrics can be shown while streaming.
+    # If aligning init times, MetricCubeBuilder holds back sums of unaligned forecasts.
+    cube_builder = MetricCubeBuilder(
+        forecaster_labels(lcfg.forecasters, lcfg.compare_versions), align_t0s,
+    )
+    # version duplicates can be in different batches, so they are dropped across batches
+    deduper = StreamDeduper()
+    n_forecast_rows = 0
+    n_batches = 0
+    if band_forecast_df is not None:
+        batches = frame_batches(band_forecast_df)
+    elif metrics_strategy.strategy == "stream":
+        batches = stream_all_forecasts(
+            client=client,
+            location_uuid=lcfg.location.location_uuid,
+            start_date=lcfg.start_date,
+            end_date=lcfg.end_date,
+            forecasters=lcfg.forecasters,
+            keep_versions=lcfg.compare_versions,
+        )
+    else:
+        batches = stream_horizon_forecasts(
+            client=client,
+            location_uuid=lcfg.location.location_uuid,
+            start_date=lcfg.start_date,
+            end_date=lcfg.end_date,
+            forecasters=lcfg.forecasters,
+            horizons=metrics_strategy.timeseries_keys,
+            location_type=lcfg.location.location_type,
+            keep_versions=lcfg.compare_versions,
+        )
+    async for batch_df in batches:
+        n_batches += 1
+        if band_forecast_df is not None:
+            progress = min(n_batches * metrics_batch_rows / len(band_forecast_df), 1.0)
+        elif metrics_strategy.strategy == "stream":
+            progress = stream_progress(batch_df, lcfg.start_date, lcfg.end_date)
+        else:
+            progress = n_batches / len(metrics_strategy.timeseries_keys)
+        # the stream has every horizon, so keep the ones in the band
+        batch_df = batch_df[
+            (batch_df["horizon_mins"] >= min_horizon) & (batch_df["horizon_mins"] <= max_horizon)
+        ]
+        if not lcfg.compare_versions:
+            # the versions of a forecaster are merged into one series
+            batch_df, _ = deduper.dedupe(batch_df)
+        n_forecast_rows += len(batch_df)
+        with span("merge", "join_observations") as merge_span:
+            merged_batch_df = join_observations(batch_df, all_observations_df)
+            merged_batch_df["error"] = (
+                merged_batch_df["p50_watts"] - merged_batch_df["value_watts"]
+            )
+            merge_span.rows = len(merged_batch_df)
+            merge_span.bytes = frame_bytes(merged_batch_df)
+        with span("aggregate", "MetricCubeBuilder.add") as aggregate_span:
+            cube_builder.add(merged_batch_df)
+            aggregate_span.rows = len(merged_batch_df)
+
+        partial_summary_df = None
+        if time.monotonic() - last_partial_time > partial_plot_seconds:
+            last_partial_time = time.monotonic()
+            partial_summary_df = cube_builder.cube.summary_df()
+        job.update(
+            progress, f"Fetched `{n_forecast_rows}` forecast rows...", partial_summary_df,
+        )
+
+    # only the init times that every forecaster has are counted if aligning,
+    # and the summary tables and plots are all rolled up from this cube
+    with span("aggregate", "MetricCubeBuilder.finish") as aggregate_span:
+        cube = cube_builder.finish()
+        aggregate_span.rows = cube.n_rows
+
+    return MetricsJobResult(cube, n_forecast_rows, scheduler.timings_df())
+
+
+@st.fragment(run_every=partial_plot_seconds)
+def show_metrics_job(
+    job_runner: JobRunner, session_id: str, lcfg: PageConfig, metric: str,
+) -> None:
+    """Poll the session's metrics job, showing its progress until it finishes.
+
+    Only this fragment reruns while polling. Once the job has finished, its results are
+    put in the session state and the whole page reruns to show them.
+    """
+    key = st.session_state.metrics_job_key
+    job = job_runner.get(key)
+    if job is None:
+        st.session_state.metrics_job_key = None
+        st.rerun()
+
+    if job.running:
+        progress, message, partial_summary_df = job.snapshot()
+        st.progress(progress, text=message or "Streaming forecasts...")
+        if len(job.sessions) > 1:
+            st.caption(f"Shared with `{len(job.sessions) - 1}` other sessions.")
+        if partial_summary_df is not None:
+            st.plotly_chart(
+                plot_forecast_metric_vs_horizon_minutes(
+                    partial_summary_df,
+                    forecaster_labels(lcfg.forecasters, lcfg.compare_versions),
+                    metric,
+                    lcfg.scale_factor,
+                    lcfg.units,
+                    False,
+                ),
+            )
+        if st.button("Cancel"):
+            job_runner.cancel(key, session_id)
+            st.session_state.metrics_job_key = None
+            st.session_state.metrics_job_notice = "Calculating metrics was cancelled."
+            st.rerun()
+        return
+
+    job_runner.detach(key, session_id)
+    st.session_state.metrics_job_key = None
+    if job.state == "done":
+        result = job.result
+        st.session_state.metric_cube = result.cube
+        st.session_state.fetch_time_stats = (
+            f"Fetched `{result.n_forecast_rows}` forecast rows "
+            f"in `{job.seconds:.2f}` seconds."
+        )
+        st.session_state.rpc_timings_df = result.rpc_timings_df
+        st.session_state.fetch_spans_df = spans_df(job.tracer.spans)
+    elif job.state == "failed":
+        st.session_state.metrics_job_notice = f"Calculating metrics failed: {job.error}"
+    else:
+        st.session_state.metrics_job_notice = "Calculating metrics was cancelled."
+    st.rerun()
+
 
 def init_session_state():
     if "forecast_df" not in st.session_state:
         st.session_state.forecast_df = None
     if "observations_df" not in st.session_state:
         st.session_state.observations_df = None
-    if "merged_metrics_df" not in st.session_state:
-        st.session_state.merged_metrics_df = None
+    if "metric_cube" not in st.session_state:
+        st.session_state.metric_cube = None
+    if "revisions_df" not in st.session_state:
+        st.session_state.revisions_df = None
     if "fetch_time_stats" not in st.session_state:
         st.session_state.fetch_time_stats = ""
+    if "version_stats" not in st.session_state:
+        st.session_state.version_stats = ""
     if "locked_params" not in st.session_state:
         st.session_state.locked_params = None
+    if "rpc_timings_df" not in st.session_state:
+        st.session_state.rpc_timings_df = None
+    if "request_timings_df" not in st.session_state:
+        st.session_state.request_timings_df = None
+    if "forecast_index" not in st.session_state:
+        st.session_state.forecast_index = None
+    if "time_series_x_range" not in st.session_state:
+        st.session_state.time_series_x_range = None
+    if "fetch_strategy" not in st.session_state:
+        st.session_state.fetch_strategy = None
+    if "fetch_spans_df" not in st.session_state:
+        st.session_state.fetch_spans_df = None
+    if "compaction_df" not in st.session_state:
+        st.session_state.compaction_df = None
+    if "metrics_job_key" not in st.session_state:
+        st.session_state.metrics_job_key = None
+    if "fetch_fingerprint" not in st.session_state:
+        st.session_state.fetch_fingerprint = None
+    if "metrics_job_notice" not in st.session_state:
+        st.session_state.metrics_job_notice = None
 
 
 def dp_forecast_page() -> None:
@@ -55,227 +300,412 @@ async def async_dp_forecast_page() -> None:
     st.title("Data Platform Forecast Page")
     st.write("This is the forecast page from the Data Platform module.")
 
-    channel = grpc.aio.insecure_channel(f"{data_platform_host}:{data_platform_port}")
-    client = service_pb2_grpc.DataPlatformDataServiceStub(channel)
-
-    try:
-        cfg = await setup_page(client)
-        st.divider()
-        st.subheader("View Forecasts & Observations")
-
-        if st.button("Fetch Forecast & Observations", type="primary"):
-            with st.spinner("Fetching data from gRPC API..."):
-                start_time = datetime.datetime.now()
-
-                df_forecast = await fetch_timeseries(
-                    client=client,
-                    location_uuid=cfg.location.location_uuid,
-                    start_date=cfg.start_date,
-                    end_date=cfg.end_date,
-                    horizon_mins=cfg.forecast_horizon,
-                    forecasters=cfg.forecasters,
-                    init_times_utc=cfg.t0s,
-                )
-
-                df_obs = await fetch_observations(
-                    client=client,
-                    location_uuid=cfg.location.location_uuid,
-                    start_date=cfg.start_date,
-                    end_date=cfg.end_date,
-                    observers=observer_names,
-                    energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
-                )
-
-                fetch_duration = (datetime.datetime.now() - start_time).total_seconds()
-
-                st.session_state.forecast_df = df_forecast
-                st.session_state.observations_df = df_obs
-                st.session_state.merged_metrics_df = None  # Reset metrics on new fetch
-                st.session_state.locked_config = dataclasses.replace(
-                    cfg
-                )  # Copy the config to a new instance
-
-                st.session_state.fetch_time_stats = (
-                    f"Fetched `{len(df_forecast)}` forecast rows "
-                    f"in `{fetch_duration:.2f}` seconds."
-                )
-
-        if st.session_state.fetch_time_stats:
-            st.success(st.session_state.fetch_time_stats)
-
-        # Ensure we have data before trying to plot
-        if (
-            st.session_state.forecast_df is not None
-            and not st.session_state.forecast_df.empty
-        ):
-            all_forecast_data_df = st.session_state.forecast_df
-            all_observations_df = st.session_state.observations_df
-
-            csv = all_forecast_data_df.to_csv().encode("utf-8")
-            st.download_button(
-                label="⬇️ Download Raw Forecast Data",
-                data=csv,
-                file_name=f"site_forecast_{cfg.location.location_uuid}_{cfg.start_date}_{cfg.end_date}.csv",
-                mime="text/csv",
+    # every RPC, decode, merge, aggregation and figure of this run is traced
+    tracer = Tracer({"page": "dp_forecast"})
+    current_tracer.set(tracer)
+
+    # the channel is shared with other reruns and pages,
+    # and all the calls on this page share one scheduler, so the number of RPCs in flight is bounded
+    scheduler = RpcScheduler()
+    client = ScheduledDataPlatformClient(
+        get_channel_manager().client(data_platform_host, data_platform_port), scheduler,
+    )
+
+    cfg = await setup_page(client)
+    tracer.attributes.update(
+        location_uuid=cfg.location.location_uuid,
+        start_date=cfg.start_date,
+        end_date=cfg.end_date,
+    )
+    st.divider()
+    st.subheader("View Forecasts & Observations")
+
+    if st.button("Fetch Forecast & Observations", type="primary"):
+        with st.spinner("Fetching data from gRPC API..."):
+            # all the forecast and observation requests run together,
+            # sharing the scheduler's concurrency budget
+            page_data = await fetch_page_data(client, cfg)
+            show_errors(
+                page_data.plan_result.error_messages, len(page_data.plan_result.requests),
             )
+            df_forecast = page_data.forecast_df
+            df_obs = page_data.observations_df
 
-            st.header("Time Series Plot")
-            show_probabilistic = st.checkbox("Show Probabilistic Forecasts", value=True)
+            st.session_state.forecast_df = df_forecast
+            # sorted once, so the Current and Horizon selections don't rescan it every rerun
+            st.session_state.forecast_index = (
+                ForecastIndex(df_forecast) if not df_forecast.empty else None
+            )
+            st.session_state.observations_df = df_obs
+            st.session_state.fetch_fingerprint = (
+                data_fingerprint(df_forecast, index=False),
+                data_fingerprint(df_obs, index=False),
+            )
+            st.session_state.metric_cube = None  # Reset metrics on new fetch
+            st.session_state.revisions_df = None
+            st.session_state.time_series_x_range = None
+            # Copy the config to a new instance, with the forecaster versions fetched
+            st.session_state.locked_config = dataclasses.replace(
+                cfg, forecasters=page_data.forecasters,
+            )
+            st.session_state.version_stats = (
+                page_data.versions.describe() if page_data.versions is not None else ""
+            )
 
-            lcfg = st.session_state.locked_config
+            st.session_state.fetch_time_stats = (
+                f"Fetched `{len(df_forecast)}` forecast rows. "
+                f"{page_data.plan_result.summary()}"
+            )
+            st.session_state.request_timings_df = page_data.plan_result.timings_df()
+            st.session_state.fetch_strategy = page_data.strategy
+            st.session_state.compaction_df = compaction_df(page_data.compaction)
+            st.session_state.rpc_timings_df = scheduler.timings_df()
+            st.session_state.fetch_spans_df = spans_df(tracer.drain())
+
+    if st.session_state.fetch_time_stats:
+        st.success(st.session_state.fetch_time_stats)
+    if st.session_state.version_stats:
+        st.info(st.session_state.version_stats)
+
+    if st.session_state.fetch_strategy is not None:
+        st.info(st.session_state.fetch_strategy.describe())
+        with st.expander("Fetch plan options"):
+            st.dataframe(st.session_state.fetch_strategy.options_df())
+
+    if st.session_state.request_timings_df is not None:
+        with st.expander("Request timings"):
+            st.dataframe(st.session_state.request_timings_df)
+
+    if st.session_state.rpc_timings_df is not None:
+        with st.expander("RPC timings"):
+            st.dataframe(st.session_state.rpc_timings_df)
+
+    if st.session_state.compaction_df is not None:
+        with st.expander("Session memory"):
+            st.caption(
+                "The fetched data is kept for this session with compact dtypes, "
+                f"saving `{st.session_state.compaction_df['mb_saved'].sum():.2f}` MB."
+            )
+            st.dataframe(st.session_state.compaction_df)
+
+    with st.expander("Data Platform connection"):
+        st.dataframe(get_channel_manager().health())
+
+    # Ensure we have data before trying to plot
+    if (
+        st.session_state.forecast_df is not None
+        and not st.session_state.forecast_df.empty
+    ):
+        all_forecast_data_df = st.session_state.forecast_df
+        all_observations_df = st.session_state.observations_df
+
+        lazy_download_button(
+            label="⬇️ Download Raw Forecast Data",
+            df=all_forecast_data_df,
+            file_name=f"site_forecast_{cfg.location.location_uuid}_{cfg.start_date}_{cfg.end_date}",
+            key="download_raw_forecast",
+        )
+
+        st.header("Time Series Plot")
+        show_probabilistic = st.checkbox("Show Probabilistic Forecasts", value=True)
+        # Streamlit doesn't tell the script how wide the chart is drawn, so it is a setting
+        chart_width = st.select_slider(
+            "Chart width (px)",
+            options=chart_widths_px,
+            value=chart_width_px,
+            help="The width the plot is drawn at on your screen. Each line is "
+            "downsampled to a few points per pixel of this width.",
+        )
+
+        lcfg = st.session_state.locked_config
+        # with every horizon fetched, the horizon widgets slice the data without a refetch
+        horizon_cfg = cfg if lcfg.all_horizons and cfg.forecast_type == "Horizon" else lcfg
+        as_of = None
+        if lcfg.forecast_type == "As of":
+            as_of = as_of_slider(all_forecast_data_df, lcfg.end_date)
+        with span("figure", "plot_forecast_time_series") as figure_span:
             fig = plot_forecast_time_series(
                 all_forecast_data_df=all_forecast_data_df,
                 all_observations_df=all_observations_df,
-                forecaster_names=list({f.forecaster_name for f in lcfg.forecasters}),
+                forecaster_names=forecaster_labels(lcfg.forecasters, lcfg.compare_versions),
                 observer_names=observer_names,
                 scale_factor=lcfg.scale_factor,
                 units=lcfg.units,
                 selected_forecast_type=lcfg.forecast_type,
-                selected_forecast_horizon=lcfg.forecast_horizon,
+                selected_forecast_horizon=horizon_cfg.forecast_horizon,
                 selected_t0s=lcfg.t0s,
                 show_probabilistic=show_probabilistic,
-                strict_horizon_filtering=lcfg.strict_horizon_filtering,
+                strict_horizon_filtering=horizon_cfg.strict_horizon_filtering,
+                max_points_per_trace=max_points_for_width(chart_width),
+                x_range=st.session_state.time_series_x_range,
+                forecast_index=st.session_state.forecast_index,
+                as_of=as_of,
             )
-            st.plotly_chart(fig)
+            figure_span.rows = len(all_forecast_data_df)
+        # selecting a range with the box select tool re-serves it at full resolution
+        event = st.plotly_chart(
+            fig, key="forecast_time_series", on_select="rerun", selection_mode="box",
+        )
+        x_range = selected_x_range(event)
+        if x_range is not None and x_range != st.session_state.time_series_x_range:
+            st.session_state.time_series_x_range = x_range
+            st.rerun()
+        if st.session_state.time_series_x_range is not None and st.button("Show full time range"):
+            st.session_state.time_series_x_range = None
+            st.rerun()
+
+        with span("serialize", "forecast_time_series") as serialize_span:
+            n_points, payload_bytes = figure_payload_stats(fig)
+            serialize_span.rows, serialize_span.bytes = n_points, payload_bytes
+        st.caption(
+            f"Rendered `{n_points}` points, `{payload_bytes / 1e6:.2f}` MB of plot data."
+        )
 
-            st.divider()
-            st.header("Accuracy & Metrics")
-            st.write(
-                "Calculating metrics requires fetching all the forecasts for the given time frame. It can take a while."
+        st.divider()
+        st.header("Accuracy & Metrics")
+        st.write(
+            "Calculating metrics requires fetching all the forecasts for the given time frame. It can take a while."
+        )
+
+        align_t0s_ui = st.checkbox(
+            "Align t0s (Only common t0s across all forecaster are used)", value=True
+        )
+
+        # a narrow band of horizons can be cheaper to fetch with a call per horizon
+        # than with a stream of every horizon
+        metric_min_horizon, metric_max_horizon = st.slider(
+            "Horizon Mins Range to Calculate Metrics For",
+            0,
+            forecast_max_horizon_minutes,
+            (0, forecast_max_horizon_minutes),
+            step=forecast_interval_minutes,
+        )
+        if lcfg.all_horizons:
+            # every horizon has been fetched already, so the band is sliced from memory
+            metrics_strategy = None
+            band_forecast_df = st.session_state.forecast_index.horizon_range(
+                metric_min_horizon, metric_max_horizon,
             )
-
-            align_t0s_ui = st.checkbox(
-                "Align t0s (Only common t0s across all forecaster are used)", value=True
+            st.caption(
+                "Metrics reuse the fetched forecasts of every horizon, with no more requests."
+            )
+        else:
+            band_forecast_df = None
+            metrics_strategy = choose_horizon_strategy(
+                lcfg.location.location_type,
+                lcfg.start_date,
+                lcfg.end_date,
+                horizon_band(metric_min_horizon, metric_max_horizon),
+                len(lcfg.forecasters),
+            )
+            st.caption(metrics_strategy.describe())
+
+        # the metrics are calculated in a background job, shared with any other session
+        # asking for the same data, and picked up again after a rerun
+        job_runner = get_job_runner()
+        session_id = get_script_run_ctx().session_id
+        # the fingerprint of the fetched data is in the key, so after a refetch with new
+        # observations or forecasts, a finished job for the old data isn't reused
+        metrics_key = (
+            "metrics",
+            page_config_key(lcfg),
+            st.session_state.fetch_fingerprint,
+            metric_min_horizon,
+            metric_max_horizon,
+            align_t0s_ui,
+        )
+        if st.button("Calculate Metrics"):
+            if st.session_state.metrics_job_key not in (None, metrics_key):
+                job_runner.cancel(st.session_state.metrics_job_key, session_id)
+            st.session_state.metrics_job_key = metrics_key
+            st.session_state.metrics_job_notice = None
+            # resolved here, as st.cache_resource mustn't be used from the job's thread
+            channel_client = get_channel_manager().client(data_platform_host, data_platform_port)
+            job_runner.submit(
+                metrics_key,
+                lambda job: metrics_pipeline(
+                    job,
+                    channel_client,
+                    lcfg,
+                    all_observations_df,
+                    metrics_strategy,
+                    band_forecast_df,
+                    metric_min_horizon,
+                    metric_max_horizon,
+                    align_t0s_ui,
+                ),
+                session_id,
             )
 
-            if st.button("Calculate Metrics"):
-                with st.spinner(
-                    "Fetching data across all horizons and computing metrics..."
-                ):
-                    start_time = datetime.datetime.now(tz=datetime.UTC)
-                    all_horizons_df = await fetch_all_forecasts(
-                        client=client,
-                        location_uuid=lcfg.location.location_uuid,
-                        start_date=lcfg.start_date,
-                        end_date=lcfg.end_date,
-                        forecasters=lcfg.forecasters,
-                    )
-                    fetch_duration = (
-                        datetime.datetime.now(tz=datetime.UTC) - start_time
-                    ).total_seconds()
-                    st.session_state.fetch_time_stats = (
-                        f"Fetched `{len(all_horizons_df)}` forecast rows "
-                        f"in `{fetch_duration:.2f}` seconds."
-                    )
-                    if st.session_state.fetch_time_stats:
-                        st.success(st.session_state.fetch_time_stats)
-
-                    merged_df = pd.merge(
-                        all_horizons_df,
-                        all_observations_df,
-                        on="target_timestamp_utc",
-                        suffixes=("", "_observation"),
-                    )
-
-                    if align_t0s_ui:
-                        num_forecasters = merged_df["forecaster_name"].nunique()
-                        # Count number of forecasters that have each t0 time
-                        counts = merged_df.groupby("initialization_timestamp_utc")[
-                            "forecaster_name"
-                        ].nunique()
-                        # Filter to just those t0s that all forecasters have
-                        common_t0s = counts[counts == num_forecasters].index
-                        merged_df = merged_df[merged_df["initialization_timestamp_utc"].isin(common_t0s)]
-
-                    merged_df["error"] = (
-                        merged_df["p50_watts"] - merged_df["value_watts"]
-                    )
-                    merged_df["absolute_error"] = merged_df["error"].abs()
-
-                    st.session_state.merged_metrics_df = merged_df
+        if st.session_state.metrics_job_notice:
+            st.warning(st.session_state.metrics_job_notice)
+        if st.session_state.metrics_job_key is not None:
+            show_metrics_job(job_runner, session_id, lcfg, cfg.metric)
 
-            # Render Metrics if calculated
-            if st.session_state.merged_metrics_df is not None:
-                merged_df = st.session_state.merged_metrics_df
+        # Render Metrics if calculated
+        if st.session_state.metric_cube is not None:
+            cube = st.session_state.metric_cube
 
-                st.write(metrics)
-                st.subheader("Metric vs Forecast Horizon")
+            st.write(metrics)
+            st.subheader("Metric vs Forecast Horizon")
 
-                show_sem = False
-                if cfg.metric == "MAE":  # This is not locked on purpose
-                    show_sem = st.checkbox(
-                        "Show Uncertainty",
-                        value=True,
-                        help="Shows uncertainty bands associated with the MAE using SEM.",
-                    )
+            show_sem = False
+            if cfg.metric == "MAE":  # This is not locked on purpose
+                show_sem = st.checkbox(
+                    "Show Uncertainty",
+                    value=True,
+                    help="Shows uncertainty bands associated with the MAE using SEM.",
+                )
 
-                summary_df = make_summary_data_metric_vs_horizon_minutes(merged_df)
+            with span("aggregate", "make_summary_data_metric_vs_horizon_minutes") as aggregate_span:
+                summary_df = make_summary_data_metric_vs_horizon_minutes(cube)
+                aggregate_span.rows = len(summary_df)
 
+            with span("figure", "plot_forecast_metric_vs_horizon_minutes"):
                 fig2 = plot_forecast_metric_vs_horizon_minutes(
                     summary_df,
-                    list({f.forecaster_name for f in lcfg.forecasters}),
+                    forecaster_labels(lcfg.forecasters, lcfg.compare_versions),
                     cfg.metric,  # This is not locked on purpose
                     lcfg.scale_factor,
                     lcfg.units,
                     show_sem,
                 )
-                st.plotly_chart(fig2)
-
-                csv_summary = summary_df.to_csv().encode("utf-8")
-                st.download_button(
-                    label="⬇️ Download Summary",
-                    data=csv_summary,
-                    file_name=f"summary_accuracy_{cfg.location.location_uuid}.csv",
-                    mime="text/csv",
-                )
+            st.plotly_chart(fig2)
 
-                st.subheader("Summary Accuracy Table")
-                if len(summary_df) > 0:
-                    default_min_horizon = int(summary_df["horizon_mins"].min())
-                    default_max_horizon = int(summary_df["horizon_mins"].max())
-                else:
-                    default_min_horizon, default_max_horizon = 0, 1440
-
-                min_horizon, max_horizon = st.slider(
-                    "Select Horizon Mins Range",
-                    default_min_horizon,
-                    default_max_horizon,
-                    (default_min_horizon, default_max_horizon),
-                    step=30,
-                )
+            lazy_download_button(
+                label="⬇️ Download Summary",
+                df=summary_df,
+                file_name=f"summary_accuracy_{cfg.location.location_uuid}",
+                key="download_summary",
+            )
+
+            st.subheader("Summary Accuracy Table")
+            if len(summary_df) > 0:
+                default_min_horizon = int(summary_df["horizon_mins"].min())
+                default_max_horizon = int(summary_df["horizon_mins"].max())
+            else:
+                default_min_horizon, default_max_horizon = 0, 1440
+
+            min_horizon, max_horizon = st.slider(
+                "Select Horizon Mins Range",
+                default_min_horizon,
+                default_max_horizon,
+                (default_min_horizon, default_max_horizon),
+                step=30,
+            )
 
+            with span("aggregate", "make_summary_data") as aggregate_span:
                 summary_table_df = make_summary_data(
-                    merged_df=merged_df,
+                    cube=cube,
                     min_horizon=min_horizon,
                     max_horizon=max_horizon,
                     scale_factor=lcfg.scale_factor,
                     units=lcfg.units,
                 )
-                st.dataframe(summary_table_df)
+                aggregate_span.rows = len(summary_table_df)
+            st.dataframe(summary_table_df)
 
-                st.subheader("Daily Metrics Plots")
+            st.subheader("Daily Metrics Plots")
+            with span("figure", "plot_forecast_metric_per_day"):
                 fig3 = plot_forecast_metric_per_day(
-                    merged_df=merged_df,
-                    forecaster_names=[f.forecaster_name for f in lcfg.forecasters],
+                    cube=cube,
+                    forecaster_names=forecaster_labels(lcfg.forecasters, lcfg.compare_versions),
                     scale_factor=lcfg.scale_factor,
                     units=lcfg.units,
                     selected_metric=cfg.metric,  # This is also not locked on purpose
                 )
-                st.plotly_chart(fig3)
+            st.plotly_chart(fig3)
 
-                st.subheader("Quantile Plots")
-                st.text("We plot the probability of the observed value being less than "
-                         "the forecasted plevel value.")
+            st.subheader("Quantile Plots")
+            st.text("We plot the probability of the observed value being less than "
+                     "the forecasted plevel value.")
+            with span("figure", "plot_quantile_plot"):
                 fig4 = plot_quantile_plot(
-                    merged_df=merged_df,
-                    forecaster_names=[f.forecaster_name for f in lcfg.forecasters],
+                    cube=cube,
+                    forecaster_names=forecaster_labels(lcfg.forecasters, lcfg.compare_versions),
                     )
-                st.plotly_chart(fig4)
+            st.plotly_chart(fig4)
 
-        else:
-            st.info(
-                "Configure your filters in the sidebar and click 'Fetch Forecast & Observations' to begin."
-            )
+        st.divider()
+        show_revisions(lcfg)
+
+    else:
+        st.info(
+            "Configure your filters in the sidebar and click 'Fetch Forecast & Observations' to begin."
+        )
+
+    show_performance(st.session_state.fetch_spans_df, spans_df(tracer.spans), tracer.trace_id)
+
+
+def as_of_slider(forecast_df: pd.DataFrame, default: datetime.datetime) -> pd.Timestamp:
+    """Pick the wall-clock time to show the forecasts as of, between the first and last created.
+
+    Moving the slider re-slices the fetched forecasts, without fetching again.
+    """
+    if forecast_df.empty or "created_timestamp_utc" not in forecast_df.columns:
+        return pd.Timestamp(default)
+    # the slider works in naive datetimes, so these are UTC without a timezone
+    first = forecast_df["created_timestamp_utc"].min().floor(f"{forecast_interval_minutes}min")
+    last = forecast_df["created_timestamp_utc"].max().ceil(f"{forecast_interval_minutes}min")
+    as_of = st.slider(
+        "Show the forecasts as of (UTC)",
+        min_value=first.tz_convert(None).to_pydatetime(),
+        max_value=last.tz_convert(None).to_pydatetime(),
+        value=last.tz_convert(None).to_pydatetime(),
+        step=datetime.timedelta(minutes=forecast_interval_minutes),
+        format="YYYY-MM-DD HH:mm",
+        key="as_of_time",
+    )
+    return pd.Timestamp(as_of, tz="UTC")
+
+
+def show_revisions(lcfg: PageConfig) -> None:
+    """Show how the p50 of each target time is revised over successive init times.
+
+    The revisions need every init time, so they are only shown when every horizon has
+    been fetched. They are worked out once per fetch, on first use.
+    """
+    st.header("Forecast Revisions")
+    if not lcfg.all_horizons:
+        st.caption(
+            "Fetch all horizons, or use the As of forecast type, to see how the forecasts "
+            "of each target time are revised."
+        )
+        return
+
+    if st.session_state.revisions_df is None:
+        with span("aggregate", "make_revisions") as aggregate_span:
+            st.session_state.revisions_df = make_revisions(st.session_state.forecast_df)
+            aggregate_span.rows = len(st.session_state.revisions_df)
+    revisions_df = st.session_state.revisions_df
+
+    st.subheader("Revision Statistics")
+    st.caption(f"Changes in p50 between successive init times, in {lcfg.units}.")
+    st.dataframe(make_revision_stats(revisions_df, lcfg.scale_factor))
+
+    forecaster_names = forecaster_labels(lcfg.forecasters, lcfg.compare_versions)
+    forecaster_name = st.selectbox("Forecaster to show revisions for", forecaster_names)
+    with span("aggregate", "make_revision_heatmap") as aggregate_span:
+        heatmap_df = make_revision_heatmap(revisions_df, forecaster_name)
+        aggregate_span.rows = heatmap_df.size
+    with span("figure", "plot_revision_heatmap"):
+        fig = plot_revision_heatmap(heatmap_df, forecaster_name, lcfg.scale_factor, lcfg.units)
+    st.plotly_chart(fig)
+
+
+def show_performance(
+    fetch_spans_df: pd.DataFrame | None, run_spans_df: pd.DataFrame, trace_id: str,
+) -> None:
+    """Where the seconds went, for the last fetch and for drawing this run of the page."""
+    with st.expander("Performance"):
+        st.caption(
+            f"Trace `{trace_id}`. Each span is also logged as a JSON line. "
+            "Concurrent spans, like RPCs, are summed in the stage totals."
+        )
+        for title, df in [("Last fetch", fetch_spans_df), ("This page run", run_spans_df)]:
+            if df is None or df.empty:
+                continue
+            st.write(title)
+            st.dataframe(stage_summary_df(df))
+            st.dataframe(df)
 
-    finally:
-        await channel.close()
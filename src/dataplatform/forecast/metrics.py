@@ -0,0 +1,264 @@
+"""Running metric accumulators for forecasts merged with observations.
+
+Batches of merged forecasts and observations are folded into running sums as they
+arrive, so metrics can be shown while a long stream is still running.
+
+The same sums, kept per forecaster, horizon, UTC date and hour of day, make the
+accuracy cube. It is built once per fetch, and all the summary tables and metric plots
+are rolled up from it, so changing a slider or metric doesn't rescan the merged data.
+The cube is built batch by batch too, so the merged data is never held all at once,
+even when only the init times that every forecaster has are counted.
+"""
+
+import numpy as np
+import pandas as pd
+
+capacity_watts_col = "effective_capacity_watts_observation"
+
+# the finest grouping of the accuracy cube
+cube_keys = ["forecaster_name", "horizon_mins", "date_utc", "hour_utc"]
+
+init_col = "initialization_timestamp_utc"
+
+# probabilistic levels counted in the cube, if their p{plevel}_watts column is there
+plevel_percents = [10, 25, 50, 75, 90]
+
+
+class MetricAccumulator:
+    """Running error sums per forecaster and horizon, or any finer keys."""
+
+    keys = ["horizon_mins", "forecaster_name"]
+
+    def __init__(self, keys: list[str] | None = None) -> None:
+        """Start with no data, keys can include date_utc and hour_utc of the target time."""
+        if keys is not None:
+            self.keys = keys
+        self.totals: pd.DataFrame | None = None
+
+    @property
+    def n_rows(self) -> int:
+        """Number of merged rows folded in so far."""
+        return 0 if self.totals is None else int(self.totals["count"].sum())
+
+    @property
+    def plevels(self) -> list[int]:
+        """The probabilistic levels that have exceedance counts."""
+        if self.totals is None:
+            return []
+        return [p for p in plevel_percents if f"p{p}_below" in self.totals.columns]
+
+    def add(self, merged_df: pd.DataFrame) -> None:
+        """Fold a batch of merged forecasts and observations into the running sums.
+
+        merged_df needs the columns error, value_watts and
+        effective_capacity_watts_observation, as well as the key columns.
+        date_utc and hour_utc are made from target_timestamp_utc. Rows without an error,
+        as their p50 or observation is missing, aren't counted.
+        """
+        error = merged_df["error"].astype(float)
+        if error.isna().any():
+            merged_df = merged_df[error.notna()]
+            error = error[error.notna()]
+        if merged_df.empty:
+            return
+
+        value_watts = merged_df["value_watts"].astype(float)
+        columns = {}
+        for key in self.keys:
+            if key == "date_utc":
+                columns[key] = merged_df["target_timestamp_utc"].dt.floor("D")
+            elif key == "hour_utc":
+                columns[key] = merged_df["target_timestamp_utc"].dt.hour
+            else:
+                columns[key] = merged_df[key]
+        columns.update(
+            {
+                "count": 1,
+                "sum_error": error,
+                "sum_absolute_error": error.abs(),
+                "sum_squared_error": error**2,
+                "sum_value_watts": value_watts,
+                "sum_capacity_watts": merged_df[capacity_watts_col].astype(float),
+                "count_observed": (value_watts != 0).astype(int),
+            },
+        )
+
+        # p-level exceedance counts, missing p-level values count as not exceeding
+        for plevel in plevel_percents:
+            plevel_col = f"p{plevel}_watts"
+            if plevel_col in merged_df.columns:
+                plevel_watts = merged_df[plevel_col].astype(float)
+                columns[f"p{plevel}_below"] = (plevel_watts > value_watts).astype(int)
+                columns[f"p{plevel}_at_or_above_observed"] = (
+                    (plevel_watts >= value_watts) & (value_watts != 0)
+                ).astype(int)
+
+        self.add_totals(pd.DataFrame(columns).groupby(self.keys, observed=True).sum())
+
+    def add_totals(self, batch_totals: pd.DataFrame) -> None:
+        """Fold sums that are already grouped by the keys into the running sums."""
+        if self.totals is None:
+            self.totals = batch_totals
+        else:
+            self.totals = self.totals.add(batch_totals, fill_value=0)
+
+    def rollup(self, keys: list[str]) -> pd.DataFrame:
+        """Sum the totals up to coarser keys, with the keys as columns."""
+        if self.totals is None:
+            return pd.DataFrame(
+                columns=[
+                    *keys,
+                    "count",
+                    "sum_error",
+                    "sum_absolute_error",
+                    "sum_value_watts",
+                    "sum_capacity_watts",
+                ],
+            )
+        return self.totals.groupby(keys, observed=True).sum().reset_index()
+
+    def summary_df(self) -> pd.DataFrame:
+        """Metrics per horizon and forecaster, like make_summary_data_metric_vs_horizon_minutes."""
+        summary_keys = ["horizon_mins", "forecaster_name"]
+        if self.totals is None:
+            return pd.DataFrame(
+                columns=[*summary_keys, "MAE", "absolute_error_std", "absolute_error_count", "ME"],
+            )
+
+        totals = self.rollup(summary_keys)
+        count = totals["count"]
+
+        summary_df = totals[summary_keys].copy()
+        summary_df["MAE"] = totals["sum_absolute_error"] / count
+        # sample standard deviation of the absolute error, from the running sums
+        variance = (totals["sum_squared_error"] - count * summary_df["MAE"] ** 2) / (count - 1)
+        summary_df["absolute_error_std"] = np.sqrt(variance.clip(lower=0).where(count > 1))
+        summary_df["absolute_error_count"] = count.astype(int)
+        summary_df["ME"] = totals["sum_error"] / count
+        summary_df["sem"] = summary_df["absolute_error_std"] / count**0.5
+        summary_df[capacity_watts_col] = totals["sum_capacity_watts"] / count
+
+        mean_observed_generation = totals["sum_value_watts"].sum() / count.sum()
+        summary_df["NMAE (by capacity)"] = summary_df["MAE"] / summary_df[capacity_watts_col]
+        summary_df["NMAE (by mean observed generation)"] = (
+            summary_df["MAE"] / mean_observed_generation
+        )
+
+        return summary_df
+
+    def forecaster_means_df(self, min_horizon: int, max_horizon: int) -> pd.DataFrame:
+        """Mean errors, generation, capacity and p-level exceedance per forecaster."""
+        totals = self.rollup(["forecaster_name", "horizon_mins"])
+        in_range = (totals["horizon_mins"] >= min_horizon) & (totals["horizon_mins"] <= max_horizon)
+        totals = totals[in_range].groupby("forecaster_name", observed=True).sum()
+        count = totals["count"]
+
+        means_df = pd.DataFrame(
+            {
+                "ME": totals["sum_error"] / count,
+                "MAE": totals["sum_absolute_error"] / count,
+                "Mean Observed Generation": totals["sum_value_watts"] / count,
+                "Mean Capacity": totals["sum_capacity_watts"] / count,
+            },
+        )
+        for plevel in self.plevels:
+            means_df[f"p{plevel}_below"] = totals[f"p{plevel}_below"] / count
+        return means_df
+
+    def daily_df(self) -> pd.DataFrame:
+        """MAE and ME per UTC date and forecaster."""
+        totals = self.rollup(["date_utc", "forecaster_name"])
+        daily_df = totals[["date_utc", "forecaster_name"]].copy()
+        daily_df["MAE"] = totals["sum_absolute_error"] / totals["count"]
+        daily_df["ME"] = totals["sum_error"] / totals["count"]
+        return daily_df
+
+    def quantile_df(self, forecaster_name: str, plevels: list[int]) -> pd.DataFrame:
+        """Fraction of non-zero observations at or below each p-level, for one forecaster."""
+        if plevels == [] or self.totals is None:
+            return pd.DataFrame(columns=["plevel", "value"])
+        totals = self.rollup(["forecaster_name"])
+        totals = totals[totals["forecaster_name"] == forecaster_name].sum(numeric_only=True)
+        values = [
+            {
+                "plevel": plevel / 100,
+                "value": totals[f"p{plevel}_at_or_above_observed"] / totals["count_observed"],
+            }
+            for plevel in plevels
+            if plevel in self.plevels
+        ]
+        return pd.DataFrame(data=values, columns=["plevel", "value"])
+
+
+def make_metric_cube(merged_df: pd.DataFrame) -> MetricAccumulator:
+    """Make the accuracy cube, per forecaster, horizon, UTC date and hour of day."""
+    cube = MetricAccumulator(keys=cube_keys)
+    cube.add(merged_df)
+    return cube
+
+
+class MetricCubeBuilder:
+    """Builds the accuracy cube one merged batch at a time.
+
+    With align_t0s, only init times that every forecaster has are counted. The sums of
+    an init time are held back, also keyed by init time, until every forecaster has been
+    seen at it, and then folded into the cube. At the end, init times with every
+    forecaster that had any data are folded too, and the rest are dropped.
+
+    The held back sums have a row per forecaster, horizon and init time, as the date and
+    hour follow from those, so a row per forecast that is waiting for other forecasters.
+    When the batches have every forecaster's init times together, few are held back.
+    But if one forecaster's stream runs ahead of the others, its forecasts are held back
+    until the others catch up, which can be as many rows as the merged data.
+    """
+
+    def __init__(self, forecaster_names: list[str], align_t0s: bool) -> None:
+        """Start an empty cube for the forecasters expected in the batches."""
+        self.cube = MetricAccumulator(keys=cube_keys)
+        self.align_t0s = align_t0s
+        self.n_forecasters = len(set(forecaster_names))
+        self.pending = MetricAccumulator(keys=[*cube_keys, init_col])
+        # the (init time, forecaster) pairs seen so far, and the init times with them all
+        self.seen_df: pd.DataFrame | None = None
+        self.aligned_inits = pd.Index([])
+
+    def add(self, merged_df: pd.DataFrame) -> None:
+        """Fold a merged batch into the cube, or hold it back until its init time is aligned."""
+        if not self.align_t0s:
+            self.cube.add(merged_df)
+            return
+        if merged_df.empty:
+            return
+
+        pairs_df = (
+            merged_df[[init_col, "forecaster_name"]]
+            .astype({"forecaster_name": str})
+            .drop_duplicates()
+        )
+        if self.seen_df is not None:
+            pairs_df = pd.concat([self.seen_df, pairs_df]).drop_duplicates()
+        self.seen_df = pairs_df
+        is_aligned = merged_df[init_col].isin(self.aligned_inits)
+        self.cube.add(merged_df[is_aligned])
+        self.pending.add(merged_df[~is_aligned])
+        self.fold(self.n_forecasters)
+
+    def fold(self, n_forecasters: int) -> None:
+        """Move the held back sums of init times with n_forecasters into the cube."""
+        counts = self.seen_df.groupby(init_col)["forecaster_name"].size()
+        self.aligned_inits = pd.Index(counts.index[counts >= n_forecasters])
+        if self.pending.totals is None:
+            return
+        is_ready = self.pending.totals.index.get_level_values(init_col).isin(self.aligned_inits)
+        if is_ready.any():
+            self.cube.add_totals(
+                self.pending.totals[is_ready].groupby(cube_keys, observed=True).sum(),
+            )
+            self.pending.totals = self.pending.totals[~is_ready]
+
+    def finish(self) -> MetricAccumulator:
+        """Fold the init times that every forecaster with data has, and return the cube."""
+        if self.align_t0s and self.seen_df is not None:
+            self.fold(self.seen_df["forecaster_name"].nunique())
+            self.pending = MetricAccumulator(keys=[*cube_keys, init_col])
+        return self.cube
@@ -0,0 +1,372 @@
+"""Concurrent fetch planner for the Data Platform pages.
+
+Rather than awaiting each forecaster, init time and observer in turn, the planner builds
+every request a page needs up front and runs them all at once. The RPCs they send share
+the page's RpcScheduler, so its concurrency limit is the budget for the whole page, and
+forecasts and observations queue for it together. Once everything has finished, the
+timings show the critical path: the request that finished last, which the page waited on.
+"""
+
+import asyncio
+import dataclasses
+import time
+from collections.abc import Awaitable, Callable
+
+import pandas as pd
+from ocf.dp.dp_data import service_pb2_grpc
+
+from dataplatform.forecast.backend import (
+    combine_observations,
+    combine_timeseries,
+    fetch_all_horizons,
+    fetch_observations_one,
+    fetch_stream_t0s,
+    fetch_timeseries_one,
+    init_time_label,
+)
+from dataplatform.forecast.constant import observer_names
+from dataplatform.forecast.scheduler import RpcTotals, rpc_totals
+from dataplatform.forecast.schema import (
+    CompactionReport,
+    compact,
+    forecast_schema,
+    observation_schema,
+)
+from dataplatform.forecast.setup import PageConfig
+from dataplatform.forecast.strategy import (
+    FetchStrategy,
+    choose_t0_strategy,
+    n_timeseries_windows,
+)
+from dataplatform.forecast.versions import (
+    VersionResolution,
+    dedupe_forecasts,
+    resolve_versions,
+    version_label,
+)
+from ocf.dp.dp import common_pb2
+
+
+@dataclasses.dataclass
+class FetchRequest:
+    """One request of a fetch plan, kind is forecast or observation."""
+
+    kind: str
+    label: str
+    fetch: Callable[[], Awaitable[pd.DataFrame]]
+
+
+@dataclasses.dataclass
+class RequestTiming:
+    """Timing of one request of a fetch plan, in seconds from the start of the plan."""
+
+    kind: str
+    label: str
+    status: str
+    rows: int
+    start_seconds: float
+    end_seconds: float
+    rpc_calls: int
+    rpc_seconds: float
+    queued_seconds: float
+
+
+@dataclasses.dataclass
+class PlanResult:
+    """Results and timings of a fetch plan, in the order of its requests."""
+
+    requests: list[FetchRequest]
+    results: list[pd.DataFrame | None]
+    timings: list[RequestTiming]
+    errors: list[tuple[FetchRequest, Exception]]
+    wall_seconds: float
+
+    def frames(self, kind: str) -> list[pd.DataFrame]:
+        """The successful results of one kind of request."""
+        return [
+            result
+            for request, result in zip(self.requests, self.results, strict=True)
+            if request.kind == kind and result is not None
+        ]
+
+    @property
+    def error_messages(self) -> list[str]:
+        """A message for each failed request."""
+        return [f"Failed to fetch {request.label}: {e}" for request, e in self.errors]
+
+    def raise_first_error(self) -> None:
+        """Raise the error of the first failed request, if any failed."""
+        if len(self.errors) > 0:
+            raise self.errors[0][1]
+
+    def kind_seconds(self, kind: str) -> float:
+        """Seconds from the start of the plan until the last request of one kind finished."""
+        return max((t.end_seconds for t in self.timings if t.kind == kind), default=0.0)
+
+    @property
+    def critical_path(self) -> RequestTiming | None:
+        """The request that finished last."""
+        return max(self.timings, key=lambda t: t.end_seconds, default=None)
+
+    @property
+    def sequential_seconds(self) -> float:
+        """How long the requests would have taken one after another."""
+        return sum(t.end_seconds - t.start_seconds for t in self.timings)
+
+    def timings_df(self) -> pd.DataFrame:
+        """Timings of all the requests as a DataFrame."""
+        return pd.DataFrame(
+            [dataclasses.asdict(t) for t in self.timings],
+            columns=[f.name for f in dataclasses.fields(RequestTiming)],
+        )
+
+    def summary(self) -> str:
+        """One line on the wall time and the critical path."""
+        critical = self.critical_path
+        if critical is None:
+            return "Nothing to fetch."
+        return (
+            f"`{len(self.requests)}` requests took `{self.wall_seconds:.2f}` seconds, "
+            f"`{self.sequential_seconds:.2f}` seconds one after another. "
+            f"Critical path: {critical.kind} `{critical.label}`, "
+            f"`{critical.end_seconds - critical.start_seconds:.2f}` seconds with "
+            f"`{critical.rpc_seconds:.2f}` in RPCs "
+            f"and `{critical.queued_seconds:.2f}` queued for the concurrency budget."
+        )
+
+
+async def run_plan(requests: list[FetchRequest]) -> PlanResult:
+    """Run all the requests at once, recording their timings and catching failures."""
+    plan_start = time.perf_counter()
+
+    async def run_one(
+        request: FetchRequest,
+    ) -> tuple[pd.DataFrame | None, RequestTiming, Exception | None]:
+        # each request counts the RPCs it sends, including from the tasks it starts
+        totals = RpcTotals()
+        rpc_totals.set(totals)
+        start = time.perf_counter()
+        result = None
+        error = None
+        try:
+            result = await request.fetch()
+        except Exception as e:
+            error = e
+        timing = RequestTiming(
+            kind=request.kind,
+            label=request.label,
+            status="OK" if error is None else type(error).__name__,
+            rows=0 if result is None else len(result),
+            start_seconds=start - plan_start,
+            end_seconds=time.perf_counter() - plan_start,
+            rpc_calls=totals.calls,
+            rpc_seconds=totals.busy_seconds,
+            queued_seconds=totals.queued_seconds,
+        )
+        return result, timing, error
+
+    # gather runs each request in its own task, so they each get their own totals
+    outcomes = await asyncio.gather(*[run_one(request) for request in requests])
+
+    return PlanResult(
+        requests=requests,
+        results=[result for result, _, _ in outcomes],
+        timings=[timing for _, timing, _ in outcomes],
+        errors=[
+            (request, error)
+            for request, (_, _, error) in zip(requests, outcomes, strict=True)
+            if error is not None
+        ],
+        wall_seconds=time.perf_counter() - plan_start,
+    )
+
+
+def plan_page_requests(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    cfg: PageConfig,
+    observers: list[str] = observer_names,
+    strategy: FetchStrategy | None = None,
+) -> list[FetchRequest]:
+    """All the forecast and observation requests for a page config.
+
+    There is one forecast request per forecaster and selected t0, or per forecaster for
+    the latest forecasts, and one observation request per observer. With a strategy for
+    the t0s, only its timeseries t0s get their own requests, and there is one request
+    per stream window instead. With all_horizons, one stream request fetches every
+    horizon for all the forecasters. With compare_versions, forecaster_name is
+    name:version, so each version is its own series.
+    """
+    location_uuid = cfg.location.location_uuid
+    location_type = cfg.location.location_type
+    init_times = cfg.t0s if cfg.t0s else [None]
+    stream_windows = []
+    if strategy is not None:
+        init_times = strategy.timeseries_keys
+        stream_windows = strategy.stream_windows
+
+    def series_label(forecaster) -> str | None:
+        return version_label(forecaster) if cfg.compare_versions else None
+
+    forecast_requests = [
+        FetchRequest(
+            kind="forecast",
+            label=(
+                f"{series_label(forecaster) or forecaster.forecaster_name} "
+                f"at {init_time_label(init_time)}"
+            ),
+            fetch=lambda forecaster=forecaster, init_time=init_time: fetch_timeseries_one(
+                client,
+                location_uuid,
+                cfg.start_date,
+                cfg.end_date,
+                cfg.forecast_horizon,
+                forecaster,
+                init_time,
+                location_type,
+                series_label(forecaster),
+            ),
+        )
+        for forecaster in cfg.forecasters
+        for init_time in init_times
+    ]
+    if cfg.all_horizons:
+        forecast_requests = [
+            FetchRequest(
+                kind="forecast",
+                label="stream of all horizons",
+                fetch=lambda: fetch_all_horizons(
+                    client,
+                    location_uuid,
+                    cfg.start_date,
+                    cfg.end_date,
+                    cfg.forecasters,
+                    cfg.compare_versions,
+                ),
+            ),
+        ]
+
+    stream_requests = [
+        FetchRequest(
+            kind="forecast",
+            label=f"stream of t0s from {init_window[0].isoformat()}",
+            fetch=lambda init_window=init_window: fetch_stream_t0s(
+                client,
+                location_uuid,
+                cfg.start_date,
+                cfg.end_date,
+                cfg.forecasters,
+                cfg.t0s,
+                init_window,
+                cfg.compare_versions,
+            ),
+        )
+        for init_window in stream_windows
+    ]
+
+    observation_requests = [
+        FetchRequest(
+            kind="observation",
+            label=f"observations for {observer_name}",
+            fetch=lambda observer_name=observer_name: fetch_observations_one(
+                client,
+                location_uuid,
+                cfg.start_date,
+                cfg.end_date,
+                observer_name,
+                common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+                location_type,
+            ),
+        )
+        for observer_name in observers
+    ]
+
+    return forecast_requests + stream_requests + observation_requests
+
+
+def choose_page_strategy(cfg: PageConfig) -> FetchStrategy | None:
+    """Choose how to fetch the selected t0s, or None if there are none."""
+    if not cfg.t0s or not cfg.forecasters or cfg.all_horizons:
+        return None
+    return choose_t0_strategy(
+        cfg.location.location_type,
+        cfg.start_date,
+        cfg.end_date,
+        cfg.t0s,
+        len(cfg.forecasters),
+    )
+
+
+def n_timeseries_rpcs(cfg: PageConfig, n_forecasters: int, strategy: FetchStrategy | None) -> int:
+    """Number of GetForecastAsTimeseries calls a page config makes for some forecasters."""
+    if cfg.all_horizons:
+        return 0
+    if strategy is not None:
+        n_init_times = len(strategy.timeseries_keys)
+    else:
+        n_init_times = len(cfg.t0s) if cfg.t0s else 1
+    n_windows = n_timeseries_windows(cfg.location.location_type, cfg.start_date, cfg.end_date)
+    return n_forecasters * n_init_times * n_windows
+
+
+@dataclasses.dataclass
+class PageData:
+    """Forecasts and observations for a page config, and how they were fetched.
+
+    The DataFrames have the compact dtypes of the schema module, and compaction has the
+    memory this saved. forecasters are the versions fetched, and versions is how they
+    were resolved, or None when comparing versions.
+    """
+
+    forecast_df: pd.DataFrame
+    observations_df: pd.DataFrame
+    plan_result: PlanResult
+    strategy: FetchStrategy | None
+    compaction: list[CompactionReport]
+    forecasters: list
+    versions: VersionResolution | None
+
+
+async def fetch_page_data(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    cfg: PageConfig,
+    observers: list[str] = observer_names,
+) -> PageData:
+    """Fetch the forecasts and observations for a page config concurrently.
+
+    Failed requests are left out of the DataFrames, and are in plan_result.errors.
+    Unless comparing versions, only the versions with data are fetched, and their rows
+    are merged.
+    """
+    versions = None
+    if not cfg.compare_versions:
+        versions = await resolve_versions(
+            client, cfg.location.location_uuid, cfg.start_date, cfg.end_date, cfg.forecasters,
+        )
+        all_versions_cfg = cfg
+        cfg = dataclasses.replace(cfg, forecasters=versions.forecasters)
+
+    strategy = choose_page_strategy(cfg)
+    plan_result = await run_plan(plan_page_requests(client, cfg, observers, strategy))
+    forecast_df = combine_timeseries(plan_result.frames("forecast"))
+    if versions is not None:
+        forecast_df, versions.duplicate_rows = dedupe_forecasts(forecast_df)
+        versions.rpcs_saved = (
+            n_timeseries_rpcs(all_versions_cfg, len(all_versions_cfg.forecasters), strategy)
+            - n_timeseries_rpcs(cfg, len(cfg.forecasters), strategy)
+            - versions.probe_rpcs
+        )
+    forecast_df, forecast_report = compact(forecast_df, forecast_schema, "forecast_df")
+    observations_df, observations_report = compact(
+        combine_observations(plan_result.frames("observation")),
+        observation_schema,
+        "observations_df",
+    )
+    return PageData(
+        forecast_df=forecast_df,
+        observations_df=observations_df,
+        plan_result=plan_result,
+        strategy=strategy,
+        compaction=[forecast_report, observations_report],
+        forecasters=cfg.forecasters,
+        versions=versions,
+    )
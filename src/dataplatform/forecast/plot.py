@@ -2,63 +2,88 @@
 
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
 from dataplatform.forecast.constant import colours
+from dataplatform.forecast.downsample import downsample, filter_x_range
+from dataplatform.forecast.metrics import MetricAccumulator
+from dataplatform.forecast.selection import ForecastIndex
 
 
-def make_time_series_trace(
-    fig: go.Figure,
+# above this many points in a figure, the traces are drawn with WebGL
+webgl_min_points = 20_000
+
+
+def utc_datetime_array(timestamps: pd.Series) -> np.ndarray:
+    """UTC datetime64 array for plotting, rather than an object array of Timestamps."""
+    if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    return timestamps.to_numpy(dtype="datetime64[ns]")
+
+
+def scaled_array(values: pd.Series, scale_factor: float) -> np.ndarray:
+    """Float array of values divided by the scale factor, with NaN for missing values."""
+    return values.to_numpy(dtype=float, na_value=np.nan) / scale_factor
+
+
+def make_time_series_traces(
     forecaster_df: pd.DataFrame,
     forecaster_name: str,
     scale_factor: float,
     i: int,
     show_probabilistic: bool = True,
-) -> go.Figure:
-    """Make time series trace for a forecaster.
+    max_points: int | None = None,
+) -> list[dict]:
+    """Make time series traces for a forecaster, as keyword arguments for a scatter trace.
 
     Include p10 and p90 shading if show_probabilistic is True.
+    The forecaster is downsampled to max_points, using the p50 values,
+    and all the traces share one x array.
     """
-    fig.add_trace(
-        go.Scatter(
-            x=forecaster_df["target_timestamp_utc"],
-            y=forecaster_df["p50_watts"] / scale_factor,
-            mode="lines",
-            name=forecaster_name,
-            line={"color": colours[i % len(colours)]},
-            legendgroup=forecaster_name,
-        ),
-    )
+    forecaster_df = downsample(forecaster_df, "target_timestamp_utc", "p50_watts", max_points)
+    x = utc_datetime_array(forecaster_df["target_timestamp_utc"])
+    colour = colours[i % len(colours)]
+
+    traces = [
+        {
+            "x": x,
+            "y": scaled_array(forecaster_df["p50_watts"], scale_factor),
+            "mode": "lines",
+            "name": forecaster_name,
+            "line": {"color": colour},
+            "legendgroup": forecaster_name,
+        },
+    ]
     if (
         show_probabilistic
         and "p10_watts" in forecaster_df.columns
         and "p90_watts" in forecaster_df.columns
     ):
-        fig.add_trace(
-            go.Scatter(
-                x=forecaster_df["target_timestamp_utc"],
-                y=forecaster_df["p10_watts"] / scale_factor,
-                mode="lines",
-                line={"color": colours[i % len(colours)], "width": 0},
-                legendgroup=forecaster_name,
-                showlegend=False,
-            ),
+        traces.append(
+            {
+                "x": x,
+                "y": scaled_array(forecaster_df["p10_watts"], scale_factor),
+                "mode": "lines",
+                "line": {"color": colour, "width": 0},
+                "legendgroup": forecaster_name,
+                "showlegend": False,
+            },
         )
-
-        fig.add_trace(
-            go.Scatter(
-                x=forecaster_df["target_timestamp_utc"],
-                y=forecaster_df["p90_watts"] / scale_factor,
-                mode="lines",
-                line={"color": colours[i % len(colours)], "width": 0},
-                legendgroup=forecaster_name,
-                showlegend=False,
-                fill="tonexty",
-            ),
+        traces.append(
+            {
+                "x": x,
+                "y": scaled_array(forecaster_df["p90_watts"], scale_factor),
+                "mode": "lines",
+                "line": {"color": colour, "width": 0},
+                "legendgroup": forecaster_name,
+                "showlegend": False,
+                "fill": "tonexty",
+            },
         )
 
-    return fig
+    return traces
 
 
 def plot_forecast_time_series(
@@ -73,44 +98,45 @@ def plot_forecast_time_series(
     selected_t0s: list[datetime],
     show_probabilistic: bool = True,
     strict_horizon_filtering: bool = False,
+    max_points_per_trace: int | None = None,
+    x_range: tuple[pd.Timestamp, pd.Timestamp] | None = None,
+    forecast_index: ForecastIndex | None = None,
+    as_of: datetime | None = None,
 ) -> go.Figure:
     """Plot forecast time series.
 
     This make a plot of the raw forecasts and observations, for mulitple forecast.
+    Each trace is downsampled to max_points_per_trace, after filtering to x_range.
+    Pass the ForecastIndex of all_forecast_data_df to reuse its memoized selections.
+    The As of forecast type plots the latest forecasts created by as_of.
     """
+    if forecast_index is None:
+        forecast_index = ForecastIndex(all_forecast_data_df)
+
     if selected_forecast_type == "Current":
         # Choose current forecast
         # this is done by selecting the unique target_timestamp_utc with the the lowest horizonMins
         # it should also be unique for each forecasterFullName
-        current_forecast_df = all_forecast_data_df.loc[
-            all_forecast_data_df.groupby(["target_timestamp_utc", "forecaster_name"])[
-                "horizon_mins"
-            ].idxmin()
-        ]
+        current_forecast_df = forecast_index.current()
     elif selected_forecast_type == "Horizon":
         # Choose horizon forecast
-        if strict_horizon_filtering:
-            current_forecast_df = all_forecast_data_df[
-                all_forecast_data_df["horizon_mins"] == selected_forecast_horizon
-            ]
-        else:
-            current_forecast_df = all_forecast_data_df[
-                all_forecast_data_df["horizon_mins"] >= selected_forecast_horizon
-            ]
-        current_forecast_df = current_forecast_df.loc[
-            current_forecast_df.groupby(["target_timestamp_utc", "forecaster_name"])[
-                "horizon_mins"
-            ].idxmin()
-        ]
+        current_forecast_df = forecast_index.horizon(
+            selected_forecast_horizon, strict=strict_horizon_filtering,
+        )
     elif selected_forecast_type == "t0":
-        current_forecast_df = all_forecast_data_df[
-            all_forecast_data_df["initialization_timestamp_utc"].isin(selected_t0s)
-        ]
+        current_forecast_df = forecast_index.t0s(selected_t0s)
+    elif selected_forecast_type == "As of":
+        current_forecast_df = forecast_index.as_of(as_of)
+
+    current_forecast_df = filter_x_range(current_forecast_df, "target_timestamp_utc", x_range)
+    all_observations_df = filter_x_range(all_observations_df, "target_timestamp_utc", x_range)
 
     # plot the results
-    fig = go.Figure()
+    traces = []
+    observer_groups = dict(list(all_observations_df.groupby("observer_name", observed=True)))
     for observer_name in observer_names:
-        obs_df = all_observations_df[all_observations_df["observer_name"] == observer_name]
+        obs_df = observer_groups.get(observer_name, all_observations_df.iloc[:0])
+        obs_df = downsample(obs_df, "target_timestamp_utc", "value_watts", max_points_per_trace)
 
         if observer_name == "pvlive_in_day":
             # dashed white line
@@ -120,52 +146,74 @@ def plot_forecast_time_series(
         else:
             line = {}
 
-        fig.add_trace(
-            go.Scatter(
-                x=obs_df["target_timestamp_utc"],
-                y=obs_df["value_watts"] / scale_factor,
-                mode="lines",
-                name=observer_name,
-                line=line,
-            ),
+        traces.append(
+            {
+                "x": utc_datetime_array(obs_df["target_timestamp_utc"]),
+                "y": scaled_array(obs_df["value_watts"], scale_factor),
+                "mode": "lines",
+                "name": observer_name,
+                "line": line,
+            },
         )
 
-    for i, forecaster_name in enumerate(forecaster_names):
-        forecaster_df = current_forecast_df[
-            current_forecast_df["forecaster_name"] == forecaster_name
-        ]
-        if selected_forecast_type in ["Current", "Horizon"]:
-            fig = make_time_series_trace(
-                fig,
-                forecaster_df,
+    # split the forecasts into forecasters, and t0s, in one pass
+    empty_df = current_forecast_df.iloc[:0]
+    if selected_forecast_type in ["Current", "Horizon", "As of"]:
+        forecaster_groups = dict(
+            list(current_forecast_df.groupby("forecaster_name", observed=True)),
+        )
+        for i, forecaster_name in enumerate(forecaster_names):
+            traces += make_time_series_traces(
+                forecaster_groups.get(forecaster_name, empty_df),
                 forecaster_name,
                 scale_factor,
                 i,
                 show_probabilistic,
+                max_points_per_trace,
             )
-        elif selected_forecast_type == "t0":
-            for _, t0 in enumerate(selected_t0s):
-                forecaster_with_t0_df = forecaster_df[forecaster_df["initialization_timestamp_utc"] == t0]
-                forecaster_name_wth_t0 = f"{forecaster_name} | t0: {t0}"
-                fig = make_time_series_trace(
-                    fig,
-                    forecaster_with_t0_df,
-                    forecaster_name_wth_t0,
+    elif selected_forecast_type == "t0":
+        forecaster_t0_groups = dict(
+            list(
+                current_forecast_df.groupby(
+                    ["forecaster_name", "initialization_timestamp_utc"], observed=True,
+                ),
+            ),
+        )
+        for i, forecaster_name in enumerate(forecaster_names):
+            for t0 in selected_t0s:
+                traces += make_time_series_traces(
+                    forecaster_t0_groups.get((forecaster_name, pd.Timestamp(t0)), empty_df),
+                    f"{forecaster_name} | t0: {t0}",
                     scale_factor,
                     i,
                     show_probabilistic,
+                    max_points_per_trace,
                 )
 
+    # WebGL draws large figures much faster than SVG
+    n_points = sum(len(trace["x"]) for trace in traces)
+    trace_type = go.Scattergl if n_points > webgl_min_points else go.Scatter
+    fig = go.Figure(data=[trace_type(**trace) for trace in traces])
+
     fig.update_layout(
         title="Current Forecast",
         xaxis_title="Time",
         yaxis_title=f"Generation [{units}]",
         legend_title="Forecaster",
     )
+    if selected_forecast_type == "As of":
+        fig.update_layout(title=f"Forecast as of {as_of:%Y-%m-%d %H:%M} UTC")
+        fig.add_vline(x=as_of, line={"color": "grey", "dash": "dot"})
 
     return fig
 
 
+def figure_payload_stats(fig: go.Figure) -> tuple[int, int]:
+    """Number of points in a figure, and the size in bytes of its JSON."""
+    n_points = sum(len(trace.x) for trace in fig.data if trace.x is not None)
+    return n_points, len(fig.to_json())
+
+
 def plot_forecast_metric_vs_horizon_minutes(
     summary_df: pd.DataFrame,
     forecaster_names: list[str],
@@ -228,24 +276,14 @@ def plot_forecast_metric_vs_horizon_minutes(
 
 
 def plot_forecast_metric_per_day(
-    merged_df: pd.DataFrame,
+    cube: MetricAccumulator,
     forecaster_names: list,
     selected_metric: str,
     scale_factor: float,
     units: str,
 ) -> go.Figure:
-    """Plot forecast metric per day."""
-    daily_plots_df = merged_df
-    daily_plots_df["date_utc"] = daily_plots_df["target_timestamp_utc"].dt.date
-
-    # group by forecaster name and date
-    daily_metrics_df = (
-        daily_plots_df.groupby(["date_utc", "forecaster_name"])
-        .agg({"absolute_error": "mean", "error": "mean"})
-        .reset_index()
-    )
-
-    daily_metrics_df = daily_metrics_df.rename(columns={"absolute_error": "MAE", "error": "ME"})
+    """Plot forecast metric per day, from the accuracy cube."""
+    daily_metrics_df = cube.daily_df()
 
     fig3 = go.Figure()
     for i, forecaster_name in enumerate(forecaster_names):
@@ -273,36 +311,15 @@ def plot_forecast_metric_per_day(
     return fig3
 
 def make_summary_data(
-    merged_df: pd.DataFrame,
+    cube: MetricAccumulator,
     min_horizon: int,
     max_horizon: int,
     scale_factor: float,
     units: str,
 ) -> pd.DataFrame:
-    """Make summary data table for given min and max horizon mins."""
-    # Reduce by horizon mins
-    summary_table_df = merged_df[
-        (merged_df["horizon_mins"] >= min_horizon)
-        & (merged_df["horizon_mins"] <= max_horizon)
-    ]
-
-    capacity_watts_col = "effective_capacity_watts_observation"
-
-    value_columns = [
-        "error",
-        "absolute_error",
-        "value_watts",
-        capacity_watts_col,
-    ]
-    plevels = [10, 25, 50, 75, 90]
-    plevel_metrics = []
-    for plevel in plevels:
-        if f"p{plevel}_below" in summary_table_df.columns:
-            plevel_metrics.append(f"p{plevel}_below")
-            value_columns.append(f"p{plevel}_below")
-    summary_table_df = summary_table_df[["forecaster_name", *value_columns]]
-
-    summary_table_df = summary_table_df.groupby("forecaster_name").mean()
+    """Make summary data table for given min and max horizon mins, from the accuracy cube."""
+    summary_table_df = cube.forecaster_means_df(min_horizon, max_horizon)
+    plevel_metrics = [f"p{plevel}_below" for plevel in cube.plevels]
 
     # Scale by units
     non_plevel_columns = [
@@ -329,91 +346,30 @@ def make_summary_data(
         axis=1,
     )
 
-    # Pivot table, so forecaster_name is columns
-    summary_table_df = summary_table_df.pivot_table(
-        columns=summary_table_df.index,
-        values=summary_table_df.columns.tolist(),
-    )
-
-    # Rename
-    summary_table_df = summary_table_df.rename(
-        columns={
-            "error": "ME",
-            "absolute_error": "MAE",
-            capacity_watts_col: "Mean Capacity",
-            "value_watts": "Mean Observed Generation",
-        },
-    )
+    # Transpose, so forecaster_name is columns
+    summary_table_df = summary_table_df.T
+    summary_table_df.columns.name = "forecaster_name"
 
     return summary_table_df
 
 
 def make_summary_data_metric_vs_horizon_minutes(
-    merged_df: pd.DataFrame,
+    cube: MetricAccumulator,
 ) -> pd.DataFrame:
-    """Make summary data for forecast metric vs horizon minutes."""
-    # Get the mean observed generation
-    mean_observed_generation = merged_df["value_watts"].mean()
-
-    summary_df = (
-        merged_df.groupby(["horizon_mins", "forecaster_name"])
-        .agg(
-            {
-                "absolute_error": ["mean", "std", "count"],
-                "error": "mean",
-            },
-        )
-        .reset_index()
-    )
-
-    summary_df.columns = ["_".join(col).strip() for col in summary_df.columns.values]
-    summary_df.columns = [
-        col[:-1] if col.endswith("_") else col for col in summary_df.columns
-    ]
-
-    # Calculate sem of MAE
-    summary_df["sem"] = summary_df["absolute_error_std"] / (
-        summary_df["absolute_error_count"] ** 0.5
-    )
-
-    summary_df["effective_capacity_watts_observation"] = (
-        merged_df.groupby(["horizon_mins", "forecaster_name"])
-        .agg({"effective_capacity_watts_observation": "mean"})
-        .reset_index()["effective_capacity_watts_observation"]
-    )
-
-    summary_df = summary_df.rename(
-        columns={"absolute_error_mean": "MAE", "error_mean": "ME"}
-    )
-    summary_df["NMAE (by capacity)"] = (
-        summary_df["MAE"] / summary_df["effective_capacity_watts_observation"]
-    )
-    summary_df["NMAE (by mean observed generation)"] = (
-        summary_df["MAE"] / mean_observed_generation
-    )
-
-    return summary_df
+    """Make summary data for forecast metric vs horizon minutes, from the accuracy cube."""
+    return cube.summary_df()
 
 def plot_quantile_plot(
-        merged_df: pd.DataFrame,
+        cube: MetricAccumulator,
         forecaster_names: list):
+    """Plot how often the observed value is at or below each plevel, from the accuracy cube.
 
-    quantiles_probs = {}
-    for forecaster_name in forecaster_names:
-
-        forecaster_df = merged_df[merged_df["forecaster_name"] == forecaster_name]
-        # get rid of night time zeros
-        forecaster_df = forecaster_df[forecaster_df["value_watts"] != 0]
-        quantiles_probs[forecaster_name] = {}
-
-        values = []
-        for plevel in [10,50,90]:
-            if f'p{plevel}_watts' in forecaster_df.columns:
-                v = (forecaster_df[f'p{plevel}_watts'] >= forecaster_df['value_watts']).mean()
-                values.append({'plevel': plevel/100, 'value': v})
-
-        quantiles_probs[forecaster_name] = pd.DataFrame(data=values)
-
+    Night time zeros are left out.
+    """
+    quantiles_probs = {
+        forecaster_name: cube.quantile_df(forecaster_name, plevels=[10, 50, 90])
+        for forecaster_name in forecaster_names
+    }
 
     fig = go.Figure()
     for i, forecaster_name in enumerate(forecaster_names):
@@ -449,5 +405,31 @@ def plot_quantile_plot(
 
     return fig
 
-    
 
+def plot_revision_heatmap(
+    heatmap_df: pd.DataFrame,
+    forecaster_name: str,
+    scale_factor: float,
+    units: str,
+) -> go.Figure:
+    """Plot the mean p50 revision of a forecaster by target time and lead time.
+
+    heatmap_df has a row per lead time and a column per target time bin, as made by
+    make_revision_heatmap. Upward revisions are red and downward ones blue.
+    """
+    fig = go.Figure(
+        go.Heatmap(
+            x=heatmap_df.columns,
+            y=heatmap_df.index,
+            z=heatmap_df.to_numpy() / scale_factor,
+            colorscale="RdBu_r",
+            zmid=0,
+            colorbar={"title": f"p50 change [{units}]"},
+        ),
+    )
+    fig.update_layout(
+        title=f"p50 revisions of {forecaster_name}",
+        xaxis_title="Target Time",
+        yaxis_title="Lead Time (minutes)",
+    )
+    return fig
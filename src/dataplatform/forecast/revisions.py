@@ -0,0 +1,103 @@
+"""Revisions of the forecast for a target time across successive init times.
+
+Each target time is forecast many times, from successive init times at shorter and
+shorter horizons. Sorting the forecasts of every horizon by forecaster, target time and
+init time once makes each (forecaster, target time) group a contiguous run, so the
+revision from each forecast to the next is one groupby diff over the whole frame.
+Revisions are then rolled up into a heatmap of target time against lead time, and
+revision statistics per forecaster, rather than plotted as one line per target time.
+"""
+
+import numpy as np
+import pandas as pd
+
+revision_keys = ["forecaster_name", "target_timestamp_utc"]
+
+# the revision heatmap has one row per this many minutes of target time
+revision_target_bin_minutes = 60
+
+
+def make_revisions(forecast_df: pd.DataFrame) -> pd.DataFrame:
+    """The change in p50 from each forecast of a target time to the next one.
+
+    revision_watts is the p50 of a forecast minus the p50 of the forecast from the
+    previous init time, and is missing for the first forecast of each target time.
+    horizon_mins is the lead time of the forecast making the revision.
+    """
+    columns = [*revision_keys, "initialization_timestamp_utc", "horizon_mins", "p50_watts"]
+    if forecast_df.empty:
+        return pd.DataFrame(columns=[*columns, "revision_watts"])
+    revisions_df = (
+        forecast_df[columns]
+        .sort_values([*revision_keys, "initialization_timestamp_utc"], kind="stable")
+        .reset_index(drop=True)
+    )
+    revisions_df["revision_watts"] = revisions_df.groupby(
+        revision_keys, observed=True, sort=False,
+    )["p50_watts"].diff()
+    return revisions_df
+
+
+def make_revision_heatmap(
+    revisions_df: pd.DataFrame,
+    forecaster_name: str,
+    target_bin_minutes: int = revision_target_bin_minutes,
+) -> pd.DataFrame:
+    """Mean p50 revision of a forecaster, with a row per lead time and a column per target bin."""
+    df = revisions_df[
+        (revisions_df["forecaster_name"] == forecaster_name)
+        & revisions_df["revision_watts"].notna()
+    ]
+    target_bins = df["target_timestamp_utc"].dt.floor(f"{target_bin_minutes}min")
+    return (
+        df.groupby(["horizon_mins", target_bins])["revision_watts"]
+        .mean()
+        .unstack("target_timestamp_utc")
+        .sort_index()
+    )
+
+
+def make_revision_stats(revisions_df: pd.DataFrame, scale_factor: float = 1.0) -> pd.DataFrame:
+    """Revision magnitudes per forecaster, scaled by scale_factor.
+
+    The total revision is the p50 of the last forecast of a target time minus the first.
+    """
+    columns = [
+        "forecaster_name",
+        "target_times",
+        "revisions",
+        "mean_abs_revision",
+        "median_abs_revision",
+        "p95_abs_revision",
+        "max_abs_revision",
+        "mean_revision",
+        "mean_abs_total_revision",
+    ]
+    df = revisions_df[revisions_df["revision_watts"].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    abs_revision = (df["revision_watts"].abs() / scale_factor).rename("abs_revision")
+    revision = (df["revision_watts"] / scale_factor).rename("revision")
+    by_forecaster = pd.concat([df["forecaster_name"], abs_revision, revision], axis=1).groupby(
+        "forecaster_name", observed=True,
+    )
+    # the revisions of a target time sum to its total revision
+    total_revision = (
+        df.groupby(revision_keys, observed=True)["revision_watts"].sum() / scale_factor
+    )
+    stats_df = pd.DataFrame(
+        {
+            "target_times": total_revision.groupby("forecaster_name", observed=True).size(),
+            "revisions": by_forecaster.size(),
+            "mean_abs_revision": by_forecaster["abs_revision"].mean(),
+            "median_abs_revision": by_forecaster["abs_revision"].median(),
+            "p95_abs_revision": by_forecaster["abs_revision"].quantile(0.95),
+            "max_abs_revision": by_forecaster["abs_revision"].max(),
+            "mean_revision": by_forecaster["revision"].mean(),
+            "mean_abs_total_revision": np.abs(total_revision)
+            .groupby("forecaster_name", observed=True)
+            .mean(),
+        },
+    )
+    return stats_df.rename_axis("forecaster_name").reset_index()[columns]
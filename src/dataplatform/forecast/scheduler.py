@@ -0,0 +1,326 @@
+"""Scheduling of Data Platform RPCs.
+
+All calls on a DataPlatformDataServiceStub can be sent through one RpcScheduler, which
+- limits the number of RPCs in flight,
+- gives each unary RPC a deadline, and each stream a limit on the wait for a message,
+- retries transient gRPC errors with exponential backoff,
+- optionally hedges slow unary requests by sending a second copy,
+- records the timing of every call, and a tracing span with its response bytes.
+"""
+
+import asyncio
+import contextvars
+import dataclasses
+import random
+import time
+from collections.abc import AsyncIterator, Callable
+
+import grpc
+import pandas as pd
+from ocf.dp.dp_data import service_pb2_grpc
+
+from dataplatform.channels import streaming_methods
+from dataplatform.forecast.constant import (
+    max_concurrent_rpcs,
+    rpc_backoff_seconds,
+    rpc_hedge_after_seconds,
+    rpc_max_retries,
+    rpc_timeout_seconds,
+    stream_idle_timeout_seconds,
+)
+from dataplatform.forecast.tracing import message_bytes, record_span
+
+transient_status_codes = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+}
+
+# Only read requests are retried or hedged, so we never create something twice
+idempotent_method_prefixes = ("Get", "List", "Stream")
+
+# Seconds spent in scheduled RPCs by the current task, not counting time queued for
+# the semaphore, so callers can time their own requests without the wait for others
+rpc_busy_seconds: contextvars.ContextVar[float] = contextvars.ContextVar(
+    "rpc_busy_seconds", default=0.0,
+)
+
+
+@dataclasses.dataclass
+class RpcTotals:
+    """Running totals of the scheduled RPCs sent for one piece of work."""
+
+    calls: int = 0
+    busy_seconds: float = 0.0
+    queued_seconds: float = 0.0
+
+
+# Unlike rpc_busy_seconds, the totals object is shared with any tasks started by the
+# current one, so it also counts RPCs sent from tasks that were gathered
+rpc_totals: contextvars.ContextVar[RpcTotals | None] = contextvars.ContextVar(
+    "rpc_totals", default=None,
+)
+
+
+def record_rpc(seconds: float, queued_seconds: float) -> None:
+    """Add a finished RPC to the context's busy seconds and totals."""
+    rpc_busy_seconds.set(rpc_busy_seconds.get() + seconds - queued_seconds)
+    totals = rpc_totals.get()
+    if totals is not None:
+        totals.calls += 1
+        totals.busy_seconds += seconds - queued_seconds
+        totals.queued_seconds += queued_seconds
+
+
+@dataclasses.dataclass
+class RpcTiming:
+    """Timing of one scheduled RPC, including any retries and hedges."""
+
+    method: str
+    status: str
+    attempts: int
+    hedged: bool
+    queued_seconds: float
+    seconds: float
+
+
+class RpcScheduler:
+    """Run RPCs with bounded concurrency, deadlines, retries and hedging."""
+
+    def __init__(
+        self,
+        max_concurrency: int = max_concurrent_rpcs,
+        timeout_seconds: float = rpc_timeout_seconds,
+        max_retries: int = rpc_max_retries,
+        backoff_seconds: float = rpc_backoff_seconds,
+        hedge_after_seconds: float | None = rpc_hedge_after_seconds,
+        stream_idle_timeout_seconds: float = stream_idle_timeout_seconds,
+    ) -> None:
+        """Make a scheduler, hedge_after_seconds=None turns hedging off."""
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.hedge_after_seconds = hedge_after_seconds
+        self.stream_idle_timeout_seconds = stream_idle_timeout_seconds
+        self.timings: list[RpcTiming] = []
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore limiting the RPCs in flight, made lazily inside the running loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt, with some jitter."""
+        return self.backoff_seconds * 2**attempt + random.uniform(0, self.backoff_seconds)
+
+    async def unary(self, method: str, rpc: Callable, request: object) -> object:
+        """Call a unary RPC, retrying transient errors and hedging if configured."""
+        retry = method.startswith(idempotent_method_prefixes)
+        max_attempts = self.max_retries + 1 if retry else 1
+
+        start = time.perf_counter()
+        queued_seconds = 0.0
+        hedged = False
+        status = grpc.StatusCode.UNKNOWN
+        attempt = 0
+        response = None
+        try:
+            while True:
+                attempt += 1
+                queue_start = time.perf_counter()
+                async with self.semaphore:
+                    queued_seconds += time.perf_counter() - queue_start
+                    try:
+                        if retry and self.hedge_after_seconds is not None:
+                            response, hedged = await self._hedged_call(rpc, request)
+                        else:
+                            response = await rpc(request, timeout=self.timeout_seconds)
+                        status = grpc.StatusCode.OK
+                        return response
+                    except grpc.aio.AioRpcError as e:
+                        status = e.code()
+                        if status not in transient_status_codes or attempt >= max_attempts:
+                            raise
+                await asyncio.sleep(self.backoff(attempt - 1))
+        finally:
+            self.timings.append(
+                RpcTiming(
+                    method=method,
+                    status=status.name,
+                    attempts=attempt,
+                    hedged=hedged,
+                    queued_seconds=queued_seconds,
+                    seconds=time.perf_counter() - start,
+                ),
+            )
+            record_rpc(self.timings[-1].seconds, queued_seconds)
+            record_span(
+                "rpc",
+                method,
+                start,
+                n_bytes=message_bytes(response),
+                status=status.name,
+                attempts=attempt,
+                hedged=hedged,
+                queued_seconds=queued_seconds,
+            )
+
+    async def _hedged_call(self, rpc: Callable, request: object) -> tuple[object, bool]:
+        """Send the request, and a second copy if the first is slow.
+
+        The hedge is only sent if there is spare concurrency, and the first successful
+        response wins. Returns the response and whether a hedge was sent.
+        """
+        first = asyncio.ensure_future(rpc(request, timeout=self.timeout_seconds))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_after_seconds)
+            if done or self.semaphore.locked():
+                return await first, False
+
+            async with self.semaphore:
+                second = asyncio.ensure_future(rpc(request, timeout=self.timeout_seconds))
+                tasks.append(second)
+                pending = {first, second}
+                error = None
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result(), True
+                        error = task.exception()
+                raise error
+        finally:
+            # the losing copy, or both if the caller was cancelled, mustn't keep running
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def stream(self, method: str, rpc: Callable, request: object) -> AsyncIterator:
+        """Call a server streaming RPC, yielding its messages.
+
+        A concurrency slot is only held while waiting for each message, and released
+        while the caller handles it, so a slow consumer doesn't hold up other RPCs.
+        A stream has no overall deadline, as a long one can take minutes, but waiting
+        longer than stream_idle_timeout_seconds for a message fails it with
+        DEADLINE_EXCEEDED. Transient errors are only retried before the first message
+        has arrived, so no messages are repeated. If the caller stops early, the call
+        is cancelled.
+        """
+        max_attempts = self.max_retries + 1
+
+        start = time.perf_counter()
+        queued_seconds = 0.0
+        status = grpc.StatusCode.UNKNOWN
+        attempt = 0
+        n_messages = 0
+        n_bytes = 0
+        try:
+            while True:
+                attempt += 1
+                call = rpc(request)
+                messages = aiter(call)
+                try:
+                    while True:
+                        queue_start = time.perf_counter()
+                        async with self.semaphore:
+                            queued_seconds += time.perf_counter() - queue_start
+                            try:
+                                message = await self._next_message(messages)
+                            except StopAsyncIteration:
+                                break
+                        n_messages += 1
+                        n_bytes += message_bytes(message) or 0
+                        yield message
+                    status = grpc.StatusCode.OK
+                    return
+                except grpc.aio.AioRpcError as e:
+                    status = e.code()
+                    if (
+                        n_messages > 0
+                        or status not in transient_status_codes
+                        or attempt >= max_attempts
+                    ):
+                        raise
+                finally:
+                    await close_stream(call, messages)
+                await asyncio.sleep(self.backoff(attempt - 1))
+        finally:
+            self.timings.append(
+                RpcTiming(
+                    method=method,
+                    status=status.name,
+                    attempts=attempt,
+                    hedged=False,
+                    queued_seconds=queued_seconds,
+                    seconds=time.perf_counter() - start,
+                ),
+            )
+            record_rpc(self.timings[-1].seconds, queued_seconds)
+            record_span(
+                "rpc",
+                method,
+                start,
+                n_bytes=n_bytes,
+                status=status.name,
+                attempts=attempt,
+                messages=n_messages,
+                queued_seconds=queued_seconds,
+            )
+
+    async def _next_message(self, messages: AsyncIterator) -> object:
+        """The next message of a stream, failing if it takes too long to arrive."""
+        try:
+            return await asyncio.wait_for(anext(messages), self.stream_idle_timeout_seconds)
+        except TimeoutError:
+            raise grpc.aio.AioRpcError(
+                grpc.StatusCode.DEADLINE_EXCEEDED,
+                grpc.aio.Metadata(),
+                grpc.aio.Metadata(),
+                details=f"No message for {self.stream_idle_timeout_seconds} seconds",
+            ) from None
+
+    def timings_df(self) -> pd.DataFrame:
+        """Timings of all the scheduled RPCs as a DataFrame."""
+        return pd.DataFrame(
+            [dataclasses.asdict(t) for t in self.timings],
+            columns=[f.name for f in dataclasses.fields(RpcTiming)],
+        )
+
+
+async def close_stream(call: object, messages: AsyncIterator) -> None:
+    """Cancel a stream's call, or close its iterator, so it stops if not finished."""
+    if hasattr(call, "cancel"):
+        call.cancel()
+    elif hasattr(messages, "aclose"):
+        await messages.aclose()
+
+
+class ScheduledDataPlatformClient:
+    """DataPlatformDataServiceStub wrapper that sends every call through an RpcScheduler.
+
+    It has the same methods as the stub, so it can be used wherever the stub is.
+    """
+
+    def __init__(
+        self,
+        stub: service_pb2_grpc.DataPlatformDataServiceStub,
+        scheduler: RpcScheduler,
+    ) -> None:
+        """Wrap a stub with a scheduler."""
+        self.stub = stub
+        self.scheduler = scheduler
+
+    def __getattr__(self, method: str) -> Callable:
+        """Get the scheduled version of a stub method."""
+        rpc = getattr(self.stub, method)
+        if method in streaming_methods:
+            return lambda request: self.scheduler.stream(method, rpc, request)
+        return lambda request: self.scheduler.unary(method, rpc, request)
@@ -0,0 +1,111 @@
+"""Compact dtypes for the Data Platform DataFrames kept in session state.
+
+Every logged in user keeps their own copy of the fetched forecasts and observations,
+so these are shrunk once they have been decoded and combined. Names repeated on every
+row become categoricals, watt values become float32, horizons become int16, and columns
+that are the same on every row of a page, or can be worked out from the others, are
+dropped.
+"""
+
+import dataclasses
+
+import numpy as np
+import pandas as pd
+
+
+@dataclasses.dataclass
+class FrameSchema:
+    """Compact dtypes for one kind of DataFrame.
+
+    Columns ending in _watts, which includes every p-level present, become float32.
+    Columns that are missing are skipped.
+    """
+
+    categorical: list[str]
+    int16: list[str]
+    drop: list[str]
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """A copy of a DataFrame with the compact dtypes, and without the dropped columns."""
+        df = df.drop(columns=[col for col in self.drop if col in df.columns])
+        dtypes = {col: "category" for col in self.categorical if col in df.columns}
+        dtypes.update({col: np.float32 for col in df.columns if col.endswith("_watts")})
+        dtypes.update({col: np.int16 for col in self.int16 if fits_int16(df, col)})
+        return df.astype(dtypes)
+
+
+def fits_int16(df: pd.DataFrame, col: str) -> bool:
+    """Whether a column is there, has no missing values, and fits in an int16."""
+    if col not in df.columns or df[col].isna().any():
+        return False
+    info = np.iinfo(np.int16)
+    return df.empty or (info.min <= df[col].min() and df[col].max() <= info.max)
+
+
+# the page is for one location, and the forecaster name is kept without its version
+forecast_schema = FrameSchema(
+    categorical=["forecaster_name"],
+    int16=["horizon_mins"],
+    drop=["location_uuid", "forecaster_fullname"],
+)
+
+# value_fraction is value_watts over effective_capacity_watts
+observation_schema = FrameSchema(
+    categorical=["observer_name"],
+    int16=[],
+    drop=["location_uuid", "value_fraction"],
+)
+
+
+@dataclasses.dataclass
+class CompactionReport:
+    """Memory of a DataFrame before and after compacting it."""
+
+    frame: str
+    rows: int
+    bytes_before: int
+    bytes_after: int
+    dropped_columns: list[str]
+
+    @property
+    def saved_bytes(self) -> int:
+        """Bytes saved by compacting."""
+        return self.bytes_before - self.bytes_after
+
+
+def memory_bytes(df: pd.DataFrame) -> int:
+    """Memory of a DataFrame, counting the strings in object columns."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def compact(
+    df: pd.DataFrame, schema: FrameSchema, frame: str,
+) -> tuple[pd.DataFrame, CompactionReport]:
+    """Compact a DataFrame with a schema, and report the memory saved."""
+    compact_df = schema.apply(df)
+    report = CompactionReport(
+        frame=frame,
+        rows=len(df),
+        bytes_before=memory_bytes(df),
+        bytes_after=memory_bytes(compact_df),
+        dropped_columns=[col for col in df.columns if col not in compact_df.columns],
+    )
+    return compact_df, report
+
+
+def compaction_df(reports: list[CompactionReport]) -> pd.DataFrame:
+    """The memory saved for each frame, in MB."""
+    return pd.DataFrame(
+        [
+            {
+                "frame": r.frame,
+                "rows": r.rows,
+                "mb_before": r.bytes_before / 1e6,
+                "mb_after": r.bytes_after / 1e6,
+                "mb_saved": r.saved_bytes / 1e6,
+                "dropped_columns": ", ".join(r.dropped_columns),
+            }
+            for r in reports
+        ],
+        columns=["frame", "rows", "mb_before", "mb_after", "mb_saved", "dropped_columns"],
+    )
@@ -0,0 +1,235 @@
+"""Time-range segment cache for forecast and observation fetches.
+
+Data is cached in UTC day segments, keyed by location, forecaster or observer and day.
+A request for a time window only fetches the days that are missing, and the cached
+days are stitched together. Days before the latest pvlive_day_after update of a location
+won't change any more, so they are kept for much longer than recent days, and are also
+written to the on-disk cache. Segments are read from memory first, then disk, then
+fetched. Memory is capped by bytes, dropping the least recently used segments, so
+settled days that fall out of memory are read back from disk.
+
+The expiry times are checked on read, rather than with aiocache's ttl, because aiocache
+expires keys with callbacks on the event loop, and each Streamlit rerun has a new loop.
+The cache is shared by the script threads of every session and the job runner thread,
+so its state is only changed while holding a lock.
+"""
+
+import dataclasses
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+
+import pandas as pd
+
+from dataplatform.forecast.constant import (
+    cache_seconds,
+    immutable_cache_seconds,
+    memory_cache_max_bytes,
+)
+from dataplatform.forecast.disk_cache import DiskCache
+
+
+def utc_days(start_date: datetime, end_date: datetime) -> list[datetime]:
+    """Midnight UTC of every day that overlaps the time window."""
+    day = start_date.astimezone(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = []
+    while day <= end_date:
+        days.append(day)
+        day = day + timedelta(days=1)
+    return days
+
+
+def contiguous_runs(days: list[datetime]) -> list[list[datetime]]:
+    """Group sorted days into runs of consecutive days."""
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][-1] == timedelta(days=1):
+            runs[-1].append(day)
+        else:
+            runs.append([day])
+    return runs
+
+
+@dataclasses.dataclass
+class Segment:
+    """One cached day of data for a location."""
+
+    expiry: float
+    location_uuid: str
+    day: datetime
+    df: pd.DataFrame
+    n_bytes: int
+
+
+class SegmentCache:
+    """Cache of DataFrames split into UTC day segments.
+
+    The days settled by pvlive_day_after are tracked per location, and apply to all of
+    its forecasters and observers. That is safe because the forecasts of past init
+    times aren't rewritten, so it is the observations that settle last.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = cache_seconds,
+        immutable_ttl_seconds: float = immutable_cache_seconds,
+        disk_cache: DiskCache | None = None,
+        max_bytes: int = memory_cache_max_bytes,
+    ) -> None:
+        """Make an empty cache, disk_cache=None keeps everything in memory."""
+        self.ttl_seconds = ttl_seconds
+        self.immutable_ttl_seconds = immutable_ttl_seconds
+        self.disk_cache = disk_cache
+        self.max_bytes = max_bytes
+        # key -> segment, from least to most recently used
+        self.segments: OrderedDict[str, Segment] = OrderedDict()
+        self.n_bytes = 0
+        # location uuid -> the day before which its days are treated as immutable
+        self.immutable_before: dict[str, datetime] = {}
+        self.lock = threading.Lock()
+
+    def mark_immutable_before(
+        self, location_uuid: str, latest_day_after_timestamp: datetime,
+    ) -> None:
+        """Treat a location's days before its latest pvlive_day_after update as immutable.
+
+        Segments of the location already in memory for the newly immutable days are kept
+        for longer too, and written to disk.
+        """
+        day = utc_days(latest_day_after_timestamp, latest_day_after_timestamp)[0]
+        settled = []
+        with self.lock:
+            previous = self.immutable_before.get(location_uuid)
+            if previous is not None and day <= previous:
+                return
+            self.immutable_before[location_uuid] = day
+
+            now = time.monotonic()
+            for key, segment in self.segments.items():
+                if (
+                    segment.location_uuid == location_uuid
+                    and segment.expiry >= now
+                    and self.is_immutable(location_uuid, segment.day)
+                ):
+                    segment.expiry = now + self.immutable_ttl_seconds
+                    settled.append((key, segment.df))
+
+        if self.disk_cache is not None:
+            for key, df in settled:
+                self.disk_cache.set(key, df)
+
+    def ttl(self, location_uuid: str, day: datetime) -> float:
+        """Seconds to keep a day of a location for."""
+        if self.is_immutable(location_uuid, day):
+            return self.immutable_ttl_seconds
+        return self.ttl_seconds
+
+    def is_immutable(self, location_uuid: str, day: datetime) -> bool:
+        """Whether a day of a location won't change any more."""
+        immutable_before = self.immutable_before.get(location_uuid)
+        return immutable_before is not None and day < immutable_before
+
+    def get_segment(self, key: str, location_uuid: str, day: datetime) -> pd.DataFrame | None:
+        """Get a day segment, or None if it is missing or has expired."""
+        with self.lock:
+            segment = self.segments.get(key)
+            if segment is not None and segment.expiry >= time.monotonic():
+                self.segments.move_to_end(key)
+                return segment.df
+
+        # only immutable days are written to disk, so anything found there is still valid
+        if self.disk_cache is not None:
+            df = self.disk_cache.get(key)
+            if df is not None:
+                with self.lock:
+                    self._put(key, location_uuid, day, df, self.immutable_ttl_seconds)
+                return df
+
+        return None
+
+    def set_segment(self, key: str, location_uuid: str, day: datetime, df: pd.DataFrame) -> None:
+        """Store a day segment."""
+        with self.lock:
+            immutable = self.is_immutable(location_uuid, day)
+            self._put(key, location_uuid, day, df, self.ttl(location_uuid, day))
+
+        if self.disk_cache is not None and immutable:
+            self.disk_cache.set(key, df)
+
+    def _put(
+        self, key: str, location_uuid: str, day: datetime, df: pd.DataFrame, ttl: float,
+    ) -> None:
+        """Store a segment in memory, then drop expired and least recently used ones.
+
+        Must be called holding the lock.
+        """
+        now = time.monotonic()
+        self._drop(key)
+        n_bytes = int(df.memory_usage(deep=True).sum())
+        self.segments[key] = Segment(now + ttl, location_uuid, day, df, n_bytes)
+        self.n_bytes += n_bytes
+
+        for expired_key in [k for k, segment in self.segments.items() if segment.expiry < now]:
+            self._drop(expired_key)
+        # the segment just stored is kept, even if it alone is over the cap
+        while self.n_bytes > self.max_bytes and len(self.segments) > 1:
+            self._drop(next(iter(self.segments)))
+
+    def _drop(self, key: str) -> None:
+        """Remove a segment from memory, if it is there. Must be called holding the lock."""
+        segment = self.segments.pop(key, None)
+        if segment is not None:
+            self.n_bytes -= segment.n_bytes
+
+    async def get(
+        self,
+        key_prefix: str,
+        location_uuid: str,
+        start_date: datetime,
+        end_date: datetime,
+        fetch: Callable[[datetime, datetime], Awaitable[pd.DataFrame]],
+        time_column: str,
+    ) -> pd.DataFrame:
+        """Get the data for a time window, only fetching the days that are not cached.
+
+        Args:
+            key_prefix: identifies the location and forecaster or observer
+            location_uuid: the location, whose settled days are kept for longer
+            start_date: start of the time window
+            end_date: end of the time window, inclusive
+            fetch: async function that fetches the data between two datetimes
+            time_column: the tz-aware UTC column used to split the data into days
+        """
+        days = utc_days(start_date, end_date)
+        day_dfs = {
+            day: self.get_segment(f"{key_prefix}:{day.date()}", location_uuid, day)
+            for day in days
+        }
+        missing_days = [day for day, df in day_dfs.items() if df is None]
+
+        # fetch each run of missing days in one go, and store every day, even empty ones
+        for run in contiguous_runs(missing_days):
+            run_df = await fetch(run[0], run[-1] + timedelta(days=1))
+            if time_column in run_df.columns and not run_df.empty:
+                run_days = run_df[time_column].dt.floor("D")
+                groups = dict(list(run_df.groupby(run_days)))
+            else:
+                groups = {}
+            for day in run:
+                day_df = groups.get(day, run_df.iloc[:0])
+                self.set_segment(f"{key_prefix}:{day.date()}", location_uuid, day, day_df)
+                day_dfs[day] = day_df
+
+        non_empty_dfs = [df for df in day_dfs.values() if not df.empty]
+        if len(non_empty_dfs) == 0:
+            return next(iter(day_dfs.values()), pd.DataFrame())
+
+        df = pd.concat(non_empty_dfs, ignore_index=True)
+        in_window = (df[time_column] >= start_date) & (df[time_column] <= end_date)
+        return df[in_window].reset_index(drop=True)
+
+
+# one cache shared by all sessions in this process, backed by the disk cache
+segment_cache = SegmentCache(disk_cache=DiskCache())
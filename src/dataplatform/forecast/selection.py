@@ -0,0 +1,132 @@
+"""Selection of the Current, Horizon and t0 forecasts to plot.
+
+The fetched forecasts are sorted once by forecaster, target time and horizon, so each
+(forecaster, target time) group is a contiguous run of rows with the lowest horizon
+first. Picking the current forecast, or the first forecast at or above a horizon, is
+then one pass over numpy arrays instead of a groupby. The row positions of selections
+are memoized, rather than copies of the rows, so reruns from unrelated widgets don't
+rescan the data, and each session only keeps small integer arrays.
+
+The forecast as of a wall-clock time T is the one created last, at or before T, for each
+(forecaster, target time). For this the groups are also sorted by created time, once,
+and each T is then a searchsorted per group, so moving T doesn't re-sort the data.
+"""
+
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.forecast.join import time_index_ns
+
+# row positions of selections kept per fetch, the oldest is dropped after this
+max_memoized_selections = 16
+
+
+class ForecastIndex:
+    """Forecasts sorted by forecaster, target time and horizon, with memoized selections."""
+
+    sort_columns = ["forecaster_name", "target_timestamp_utc", "horizon_mins"]
+
+    def __init__(self, forecast_df: pd.DataFrame) -> None:
+        """Sort the forecasts and find the start of each (forecaster, target time) group."""
+        # stable, so ties keep their fetched order, like idxmin
+        self.df = forecast_df.sort_values(self.sort_columns, kind="stable").reset_index(drop=True)
+
+        forecaster_codes = pd.factorize(self.df["forecaster_name"])[0]
+        target_ns = time_index_ns(self.df["target_timestamp_utc"])
+        self.horizon_mins = self.df["horizon_mins"].to_numpy()
+
+        is_group_start = np.ones(len(self.df), dtype=bool)
+        is_group_start[1:] = (forecaster_codes[1:] != forecaster_codes[:-1]) | (
+            target_ns[1:] != target_ns[:-1]
+        )
+        self.group_starts = np.flatnonzero(is_group_start)
+        self.group_ids = np.cumsum(is_group_start) - 1
+
+        self.selections: dict[tuple, np.ndarray] = {}
+        self.created_order: np.ndarray | None = None
+
+    def memoize(self, key: tuple, select_rows: Callable[[], np.ndarray]) -> pd.DataFrame:
+        """Get a selection, finding its row positions the first time."""
+        if key not in self.selections:
+            if len(self.selections) >= max_memoized_selections:
+                self.selections.pop(next(iter(self.selections)))
+            self.selections[key] = select_rows()
+        return self.df.iloc[self.selections[key]]
+
+    def first_per_group(self, mask: np.ndarray) -> np.ndarray:
+        """Positions of the first row of each group where the mask is True."""
+        rows = np.flatnonzero(mask)
+        group_ids = self.group_ids[rows]
+        is_first = np.ones(len(rows), dtype=bool)
+        is_first[1:] = group_ids[1:] != group_ids[:-1]
+        return rows[is_first]
+
+    def current(self) -> pd.DataFrame:
+        """The lowest horizon forecast for each forecaster and target time."""
+        return self.memoize(("current",), lambda: self.group_starts)
+
+    def horizon(self, horizon_mins: int, strict: bool = False) -> pd.DataFrame:
+        """The lowest horizon forecast at or above horizon_mins, or exactly at it if strict."""
+        if strict:
+            return self.memoize(
+                ("horizon", horizon_mins, True),
+                lambda: self.first_per_group(self.horizon_mins == horizon_mins),
+            )
+        return self.memoize(
+            ("horizon", horizon_mins, False),
+            lambda: self.first_per_group(self.horizon_mins >= horizon_mins),
+        )
+
+    def horizon_range(self, min_horizon: int, max_horizon: int) -> pd.DataFrame:
+        """All the forecasts with horizons from min_horizon to max_horizon."""
+        return self.memoize(
+            ("horizon_range", min_horizon, max_horizon),
+            lambda: np.flatnonzero(
+                (self.horizon_mins >= min_horizon) & (self.horizon_mins <= max_horizon),
+            ),
+        )
+
+    def t0s(self, t0s: list) -> pd.DataFrame:
+        """All the forecasts made at the selected init times."""
+        return self.memoize(
+            ("t0", *t0s),
+            lambda: np.flatnonzero(self.df["initialization_timestamp_utc"].isin(t0s)),
+        )
+
+    def sort_by_created(self) -> None:
+        """Sort each group by created time, then init time, for as_of."""
+        created_ns = time_index_ns(self.df["created_timestamp_utc"])
+        init_ns = time_index_ns(self.df["initialization_timestamp_utc"])
+        self.created_order = np.lexsort((init_ns, created_ns, self.group_ids))
+        # the created times as ranks, so (group, created time) is one sortable int64 key
+        self.created_times, created_ranks = np.unique(created_ns, return_inverse=True)
+        self.group_stride = len(self.created_times) + 1
+        self.created_keys = (
+            self.group_ids[self.created_order] * self.group_stride
+            + created_ranks[self.created_order]
+        )
+
+    def as_of(self, as_of: pd.Timestamp) -> pd.DataFrame:
+        """The forecast created last at or before as_of, for each forecaster and target time.
+
+        Target times with no forecast created by then are left out, and there are none
+        if the forecasts have no created times.
+        """
+        if "created_timestamp_utc" not in self.df.columns:
+            return self.df.iloc[:0]
+
+        def select_rows() -> np.ndarray:
+            if self.created_order is None:
+                self.sort_by_created()
+            n_created = np.searchsorted(
+                self.created_times, pd.Timestamp(as_of).as_unit("ns").value, side="right",
+            )
+            group_keys = np.arange(len(self.group_starts)) * self.group_stride
+            # the last row of each group with one of the first n_created created times
+            last = np.searchsorted(self.created_keys, group_keys + n_created, side="left") - 1
+            first = np.searchsorted(self.created_keys, group_keys, side="left")
+            return np.sort(self.created_order[last[last >= first]])
+
+        return self.memoize(("as_of", pd.Timestamp(as_of)), select_rows)
@@ -60,6 +60,12 @@ class PageConfig:
     t0s: list[dt.datetime] | None
     units: str
     strict_horizon_filtering: bool
+    # every horizon is fetched, so the horizon is picked in memory rather than by the server,
+    # always set for the As of forecast type
+    all_horizons: bool = False
+    # each version is fetched and plotted as its own series, rather than only the versions
+    # with data, merged into one series per forecaster
+    compare_versions: bool = False
 
 
 async def setup_page(client: service_pb2_grpc.DataPlatformDataServiceStub) -> PageConfig:
@@ -90,6 +96,15 @@ async def setup_page(client: service_pb2_grpc.DataPlatformDataServiceStub) -> Pa
         for forecaster in forecasters
         if forecaster.forecaster_name in selected_forecaster_name
     ]
+    compare_versions = False
+    if len(selected_forecasters) > len(selected_forecaster_name):
+        compare_versions = st.sidebar.checkbox(
+            "Compare forecaster versions",
+            value=False,
+            help="Fetch and plot every version of the selected forecasters separately. "
+            "If not, only the versions with data in the time window are fetched, "
+            "and merged into one series per forecaster",
+        )
 
     now = dt.datetime.now(tz=dt.UTC).replace(hour=0, minute=0, second=0, microsecond=0)
     window = st.sidebar.date_input(
@@ -108,12 +123,13 @@ async def setup_page(client: service_pb2_grpc.DataPlatformDataServiceStub) -> Pa
 
     selected_forecast_type = st.sidebar.selectbox(
         "Forecast Type",
-        ["Current", "Horizon", "t0"],
+        ["Current", "Horizon", "t0", "As of"],
         index=0,
     )
 
     selected_forecast_horizon = 0
     strict_horizon_filtering = False
+    all_horizons = False
     selected_t0s = None
 
     if selected_forecast_type == "Horizon":
@@ -128,6 +144,21 @@ async def setup_page(client: service_pb2_grpc.DataPlatformDataServiceStub) -> Pa
             help="Only show forecasts that exactly match the selected horizon, "
             "if not, we use any forecast horizon greater or equal than",
         )
+        all_horizons = st.sidebar.checkbox(
+            "Fetch all horizons once",
+            value=False,
+            help="Fetch every horizon for the time window, so changing the horizon "
+            "doesn't need another fetch, and the metrics reuse the same data",
+        )
+
+    if selected_forecast_type == "As of":
+        # every init time is needed to rebuild what was available at a time,
+        # which is then picked with a slider without another fetch
+        all_horizons = True
+        st.sidebar.caption(
+            "Fetches every forecast for the time window, then shows the latest forecast "
+            "created by the time picked above the plot.",
+        )
 
     if selected_forecast_type == "t0":
         # Make datetimes every 30 minutes from start_date to end_date
@@ -166,4 +197,6 @@ async def setup_page(client: service_pb2_grpc.DataPlatformDataServiceStub) -> Pa
         t0s=selected_t0s,
         units=units,
         strict_horizon_filtering=strict_horizon_filtering,
+        all_horizons=all_horizons,
+        compare_versions=compare_versions,
     )
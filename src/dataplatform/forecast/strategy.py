@@ -0,0 +1,212 @@
+"""Cost-based choice between timeseries calls and forecast streams.
+
+Forecasts for some t0s, or for a band of horizons, can be fetched with a
+GetForecastAsTimeseries call per t0 or horizon (and per forecaster and time window), or
+with a StreamForecastData over the init times, filtered on the client. Each request has
+a fixed cost, and a stream returns every horizon of every init time in its window. The
+requests and rows of each option are estimated from the time window and the current
+request chunking, and the cheapest option is used. For t0s, a hybrid streams the runs
+of consecutive t0s where that is cheaper, and makes timeseries calls for the rest.
+"""
+
+import dataclasses
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from dataplatform.forecast.chunking import timeseries_chunker
+from dataplatform.forecast.constant import (
+    forecast_interval_minutes,
+    forecast_max_horizon_minutes,
+    stream_rpc_cost_rows,
+    timeseries_rpc_cost_rows,
+)
+
+forecast_interval = timedelta(minutes=forecast_interval_minutes)
+horizons_per_init = forecast_max_horizon_minutes // forecast_interval_minutes + 1
+
+
+@dataclasses.dataclass
+class StrategyCost:
+    """Estimated requests and rows of one way of fetching."""
+
+    strategy: str
+    timeseries_rpcs: int = 0
+    stream_rpcs: int = 0
+    rows: int = 0
+
+    @property
+    def rpcs(self) -> int:
+        """Number of requests of either kind."""
+        return self.timeseries_rpcs + self.stream_rpcs
+
+    @property
+    def cost(self) -> float:
+        """Rows, plus the fixed cost of each request counted in rows."""
+        return (
+            self.rows
+            + self.timeseries_rpcs * timeseries_rpc_cost_rows
+            + self.stream_rpcs * stream_rpc_cost_rows
+        )
+
+    def __add__(self, other: "StrategyCost") -> "StrategyCost":
+        """Total of two costs, keeping the strategy name of this one."""
+        return StrategyCost(
+            self.strategy,
+            self.timeseries_rpcs + other.timeseries_rpcs,
+            self.stream_rpcs + other.stream_rpcs,
+            self.rows + other.rows,
+        )
+
+
+@dataclasses.dataclass
+class FetchStrategy:
+    """The cheapest way to fetch, and the estimated cost of each option.
+
+    stream_windows are the init time windows to stream, with exclusive ends, and
+    timeseries_keys are the t0s or horizons to make timeseries calls for.
+    """
+
+    chosen: StrategyCost
+    options: list[StrategyCost]
+    stream_windows: list[tuple[datetime, datetime]]
+    timeseries_keys: list
+
+    @property
+    def strategy(self) -> str:
+        """Name of the chosen option, timeseries, stream or hybrid."""
+        return self.chosen.strategy
+
+    def options_df(self) -> pd.DataFrame:
+        """The estimated requests, rows and cost of every option."""
+        return pd.DataFrame(
+            [
+                {**dataclasses.asdict(option), "rpcs": option.rpcs, "cost": option.cost}
+                for option in self.options
+            ],
+            columns=["strategy", "timeseries_rpcs", "stream_rpcs", "rpcs", "rows", "cost"],
+        )
+
+    def describe(self) -> str:
+        """One line on the chosen option."""
+        return (
+            f"Fetch plan: {self.strategy}, about `{self.chosen.timeseries_rpcs}` timeseries "
+            f"calls and `{self.chosen.stream_rpcs}` streams for `{self.chosen.rows}` rows, "
+            f"the cheapest of {', '.join(option.strategy for option in self.options)}."
+        )
+
+
+def n_intervals(start_date: datetime, end_date: datetime) -> int:
+    """Number of forecast init or target times from start_date to end_date, inclusive."""
+    if end_date < start_date:
+        return 0
+    return int((end_date - start_date) / forecast_interval) + 1
+
+
+def consecutive_runs(t0s: list[datetime]) -> list[list[datetime]]:
+    """Group sorted t0s into runs that are one forecast interval apart."""
+    runs = []
+    for t0 in t0s:
+        if runs and t0 - runs[-1][-1] <= forecast_interval:
+            runs[-1].append(t0)
+        else:
+            runs.append([t0])
+    return runs
+
+
+def stream_window(t0s: list[datetime]) -> tuple[datetime, datetime]:
+    """Init time window covering sorted t0s, with an exclusive end."""
+    return t0s[0], t0s[-1] + timedelta(minutes=1)
+
+
+def n_timeseries_windows(location_type: int, start_date: datetime, end_date: datetime) -> int:
+    """Number of time windows a timeseries request is split into."""
+    return max(len(timeseries_chunker.plan(str(location_type), start_date, end_date)), 1)
+
+
+def choose_t0_strategy(
+    location_type: int,
+    start_date: datetime,
+    end_date: datetime,
+    t0s: list[datetime],
+    n_forecasters: int,
+) -> FetchStrategy:
+    """Choose between a timeseries call per t0, one stream over all the t0s, or a hybrid."""
+    t0s = sorted(t0s)
+    n_windows = n_timeseries_windows(location_type, start_date, end_date)
+
+    def timeseries_cost(run: list[datetime]) -> StrategyCost:
+        # each t0 has one value per target time, up to the longest horizon
+        rows = sum(
+            min(horizons_per_init, n_intervals(max(t0, start_date), end_date)) for t0 in run
+        )
+        return StrategyCost(
+            "timeseries",
+            timeseries_rpcs=len(run) * n_forecasters * n_windows,
+            rows=rows * n_forecasters,
+        )
+
+    def stream_cost(run: list[datetime]) -> StrategyCost:
+        # every init time in the window, with all its horizons
+        rows = n_intervals(run[0], run[-1]) * horizons_per_init * n_forecasters
+        return StrategyCost("stream", stream_rpcs=1, rows=rows)
+
+    options = [timeseries_cost(t0s), stream_cost(t0s)]
+
+    # the cheaper of the two for each run of consecutive t0s
+    runs = consecutive_runs(t0s)
+    stream_runs, timeseries_t0s = [], []
+    hybrid = StrategyCost("hybrid")
+    for run in runs:
+        run_cost = min(timeseries_cost(run), stream_cost(run), key=lambda c: c.cost)
+        if run_cost.strategy == "stream":
+            stream_runs.append(run)
+        else:
+            timeseries_t0s.extend(run)
+        hybrid = hybrid + run_cost
+    # with one run, the hybrid is the same as one of the others
+    if len(runs) > 1:
+        options.append(hybrid)
+
+    # on a tie, the first option is used
+    chosen = min(options, key=lambda c: c.cost)
+    if chosen.strategy == "timeseries":
+        return FetchStrategy(chosen, options, [], t0s)
+    if chosen.strategy == "stream":
+        return FetchStrategy(chosen, options, [stream_window(t0s)], [])
+    return FetchStrategy(
+        chosen, options, [stream_window(run) for run in stream_runs], timeseries_t0s,
+    )
+
+
+def horizon_band(min_horizon: int, max_horizon: int) -> list[int]:
+    """Horizons in minutes from min_horizon to max_horizon, one forecast interval apart."""
+    return list(range(min_horizon, max_horizon + 1, forecast_interval_minutes))
+
+
+def choose_horizon_strategy(
+    location_type: int,
+    start_date: datetime,
+    end_date: datetime,
+    horizons: list[int],
+    n_forecasters: int,
+) -> FetchStrategy:
+    """Choose between a timeseries call per horizon, or one stream of all horizons."""
+    n_windows = n_timeseries_windows(location_type, start_date, end_date)
+    n_times = n_intervals(start_date, end_date)
+
+    options = [
+        # one value per target time for each horizon
+        StrategyCost(
+            "timeseries",
+            timeseries_rpcs=len(horizons) * n_forecasters * n_windows,
+            rows=len(horizons) * n_times * n_forecasters,
+        ),
+        # every horizon of every init time
+        StrategyCost("stream", stream_rpcs=1, rows=n_times * horizons_per_init * n_forecasters),
+    ]
+
+    chosen = min(options, key=lambda c: c.cost)
+    if chosen.strategy == "timeseries":
+        return FetchStrategy(chosen, options, [], horizons)
+    return FetchStrategy(chosen, options, [(start_date, end_date)], [])
@@ -0,0 +1,157 @@
+"""Tracing of the stages of the Data Platform forecast page.
+
+A Tracer collects spans for each RPC, decode, merge, aggregation, figure build and
+serialization, with the rows and bytes each one handled. The tracer of the current page
+run is held in a ContextVar, so spans can be recorded from anywhere without passing it
+around, including from tasks that were gathered. Every finished span is also logged as
+one JSON line, tagged with the trace id and the tracer's attributes, such as the location
+and time window.
+"""
+
+import contextlib
+import contextvars
+import dataclasses
+import json
+import logging
+import time
+import uuid
+from collections.abc import Iterator
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class Span:
+    """One timed stage, stage is rpc, decode, merge, aggregate, figure or serialize.
+
+    start_seconds is from the start of the trace. rows and bytes are None where they
+    don't apply, bytes are the serialized size of messages and figures, and the memory
+    of DataFrames.
+    """
+
+    stage: str
+    name: str
+    start_seconds: float
+    seconds: float = 0.0
+    rows: int | None = None
+    bytes: int | None = None
+    status: str = "OK"
+    attributes: dict = dataclasses.field(default_factory=dict)
+
+
+class Tracer:
+    """Collects the spans of one page run, and logs each as a JSON line."""
+
+    def __init__(self, attributes: dict | None = None) -> None:
+        """Start a trace, the attributes are added to every log line."""
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes or {}
+        self.spans: list[Span] = []
+        self.start = time.perf_counter()
+
+    def record(self, span: Span) -> None:
+        """Keep a finished span and log it."""
+        self.spans.append(span)
+        logger.info(
+            json.dumps(
+                {"trace_id": self.trace_id, **self.attributes, **dataclasses.asdict(span)},
+                default=str,
+            ),
+        )
+
+    def drain(self) -> list[Span]:
+        """Take the spans recorded so far, so the next ones are kept separately."""
+        spans, self.spans = self.spans, []
+        return spans
+
+
+current_tracer: contextvars.ContextVar[Tracer | None] = contextvars.ContextVar(
+    "current_tracer", default=None,
+)
+
+
+@contextlib.contextmanager
+def span(stage: str, name: str, **attributes: object) -> Iterator[Span]:
+    """Time a block as a span of the current tracer, the block can set rows and bytes.
+
+    Without a tracer the span is still timed, but not kept.
+    """
+    tracer = current_tracer.get()
+    start = time.perf_counter()
+    current = Span(stage, name, start - tracer.start if tracer else 0.0, attributes=attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = type(e).__name__
+        raise
+    finally:
+        current.seconds = time.perf_counter() - start
+        if tracer is not None:
+            tracer.record(current)
+
+
+def record_span(
+    stage: str,
+    name: str,
+    start: float,
+    rows: int | None = None,
+    n_bytes: int | None = None,
+    status: str = "OK",
+    **attributes: object,
+) -> None:
+    """Record a stage timed elsewhere, from its time.perf_counter() start until now."""
+    tracer = current_tracer.get()
+    if tracer is None:
+        return
+    tracer.record(
+        Span(
+            stage,
+            name,
+            start - tracer.start,
+            time.perf_counter() - start,
+            rows,
+            n_bytes,
+            status,
+            attributes,
+        ),
+    )
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Memory of a DataFrame's columns and index, without looking inside objects."""
+    return int(df.memory_usage(index=True).sum())
+
+
+def message_bytes(message: object) -> int | None:
+    """Serialized size of a protobuf message, or None for anything else."""
+    byte_size = getattr(message, "ByteSize", None)
+    return byte_size() if callable(byte_size) else None
+
+
+def spans_df(spans: list[Span]) -> pd.DataFrame:
+    """Spans as a DataFrame, in the order they finished."""
+    return pd.DataFrame(
+        [dataclasses.asdict(s) for s in spans],
+        columns=[f.name for f in dataclasses.fields(Span)],
+    )
+
+
+def stage_summary_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Total spans, seconds, rows and bytes of each stage, the slowest first.
+
+    Spans that ran concurrently, like RPCs, are summed, so a stage can take longer than
+    the page did.
+    """
+    return (
+        df.groupby("stage")
+        .agg(
+            spans=("name", "size"),
+            seconds=("seconds", "sum"),
+            rows=("rows", "sum"),
+            bytes=("bytes", "sum"),
+        )
+        .sort_values("seconds", ascending=False)
+        .reset_index()
+    )
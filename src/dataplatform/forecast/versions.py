@@ -0,0 +1,185 @@
+"""Forecaster version consolidation for request planning.
+
+A forecaster can have many registered versions, and selecting it by name selects all of
+them, though usually only one or two have data in a given window. Rather than sending
+every request once per version, the versions of each forecaster are resolved first with
+small streams spread through the window, and only the versions seen there are fetched.
+The versions of a forecaster are then merged into one series, keeping the latest row
+for each init and target time. Versions can instead be compared explicitly,
+when each is fetched and plotted as its own series, labelled name:version.
+"""
+
+import asyncio
+import dataclasses
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from ocf.dp.dp_data import messages_pb2, service_pb2_grpc
+
+from dataplatform.forecast.backend import stream_all_forecasts
+from dataplatform.forecast.constant import forecast_interval_minutes
+
+probe_window = timedelta(minutes=forecast_interval_minutes)
+# a probe about every this long through the window, and at most probe_max_rpcs probes,
+# spread evenly through longer windows
+probe_spacing = timedelta(hours=12)
+probe_max_rpcs = 16
+
+# a forecast is unique by these, once the versions of a forecaster are merged
+dedupe_keys = ["forecaster_name", "initialization_timestamp_utc", "target_timestamp_utc"]
+
+
+def version_label(forecaster: messages_pb2.Forecaster) -> str:
+    """The forecaster's name and version, like the forecaster_fullname of the stream."""
+    return f"{forecaster.forecaster_name}:{forecaster.forecaster_version}"
+
+
+def forecaster_labels(
+    forecasters: list[messages_pb2.Forecaster], compare_versions: bool = False,
+) -> list[str]:
+    """The names of the series to plot, one per forecaster or per version if comparing."""
+    if compare_versions:
+        return [version_label(f) for f in forecasters]
+    return list(dict.fromkeys(f.forecaster_name for f in forecasters))
+
+
+@dataclasses.dataclass
+class VersionResolution:
+    """The forecaster versions to fetch, and what resolving them saved.
+
+    rpcs_saved is filled in by the planner, and duplicate_rows once the forecasts of
+    several versions have been merged.
+    """
+
+    forecasters: list[messages_pb2.Forecaster]
+    dropped: list[str]
+    probe_rpcs: int
+    rpcs_saved: int = 0
+    duplicate_rows: int = 0
+
+    def describe(self) -> str:
+        """One line on the versions used and the requests saved."""
+        versions = ", ".join(version_label(f) for f in self.forecasters) or "none"
+        return (
+            f"Forecaster versions: {versions}. Skipped `{len(self.dropped)}` versions with no "
+            f"data, saving `{self.rpcs_saved}` RPCs after `{self.probe_rpcs}` probes, "
+            f"and merged `{self.duplicate_rows}` duplicate rows."
+        )
+
+
+async def resolve_versions(
+    client: service_pb2_grpc.DataPlatformDataServiceStub,
+    location_uuid: str,
+    start_date: datetime,
+    end_date: datetime,
+    forecasters: list[messages_pb2.Forecaster],
+) -> VersionResolution:
+    """Keep the versions of each forecaster that have data at the probe times.
+
+    Probes are spread evenly from the start of the window up to the end or now,
+    whichever is earlier, about every probe_spacing but at most probe_max_rpcs of them.
+    Forecasters with one version are kept without a probe. If none of a forecaster's
+    versions have data at the probe times, or the window is all in the future, they are
+    all kept.
+    """
+    by_name = defaultdict(list)
+    for forecaster in forecasters:
+        by_name[forecaster.forecaster_name].append(forecaster)
+    to_probe = [f for versions in by_name.values() if len(versions) > 1 for f in versions]
+    if len(to_probe) == 0:
+        return VersionResolution(list(forecasters), [], 0)
+
+    async def probe(window_start: datetime) -> set[str]:
+        labels = set()
+        async for batch_df in stream_all_forecasts(
+            client,
+            location_uuid,
+            window_start,
+            window_start + probe_window,
+            to_probe,
+            keep_versions=True,
+        ):
+            labels.update(batch_df["forecaster_name"].unique())
+        return labels
+
+    probe_end = min(end_date, datetime.now(UTC))
+    last_start = max(start_date, probe_end - probe_window)
+    if probe_end <= start_date:
+        return VersionResolution(list(forecasters), [], 0)
+    n_probes = min(probe_max_rpcs, (last_start - start_date) // probe_spacing + 2)
+    spread = pd.date_range(start_date, last_start, periods=n_probes)
+    probe_starts = list(dict.fromkeys(spread.to_pydatetime()))
+    seen = set().union(*await asyncio.gather(*[probe(start) for start in probe_starts]))
+
+    kept, dropped = [], []
+    for versions in by_name.values():
+        with_data = [f for f in versions if version_label(f) in seen]
+        if len(versions) == 1 or len(with_data) == 0:
+            kept.extend(versions)
+        else:
+            kept.extend(with_data)
+            dropped.extend(version_label(f) for f in versions if f not in with_data)
+    return VersionResolution(kept, dropped, len(probe_starts))
+
+
+def dedupe_forecasts(df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+    """Keep the latest row for each forecaster, init time and target time.
+
+    Returns the DataFrame and the number of duplicate rows dropped.
+    """
+    if df.empty or not set(dedupe_keys).issubset(df.columns):
+        return df, 0
+    order = (
+        [*dedupe_keys, "created_timestamp_utc"]
+        if "created_timestamp_utc" in df.columns
+        else dedupe_keys
+    )
+    deduped_df = (
+        df.sort_values(order, kind="stable")
+        .drop_duplicates(dedupe_keys, keep="last")
+        .reset_index(drop=True)
+    )
+    return deduped_df, len(df) - len(deduped_df)
+
+
+class StreamDeduper:
+    """Drops duplicate forecasts across the batches of a stream.
+
+    The versions of a forecaster can send the same init and target time in different
+    batches. Within a batch the latest row is kept, as in dedupe_forecasts, and a row
+    whose keys were in an earlier batch is dropped, as that one has already been used.
+    Only a hash of the keys of each row is kept, in sorted arrays that are merged as
+    they grow, so checking a batch takes a few binary searches.
+    """
+
+    def __init__(self) -> None:
+        """Start with no keys seen."""
+        self.seen_hashes: list[np.ndarray] = []
+
+    def dedupe(self, df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+        """Dedupe a batch, returning it and the number of duplicate rows dropped."""
+        df, n_dropped = dedupe_forecasts(df)
+        if df.empty or not set(dedupe_keys).issubset(df.columns):
+            return df, n_dropped
+
+        hashes = pd.util.hash_pandas_object(
+            df[dedupe_keys].astype({"forecaster_name": str}), index=False,
+        ).to_numpy()
+        is_seen = np.zeros(len(hashes), dtype=bool)
+        for seen in self.seen_hashes:
+            positions = np.searchsorted(seen, hashes).clip(max=len(seen) - 1)
+            is_seen |= seen[positions] == hashes
+
+        self.seen_hashes.append(np.sort(hashes[~is_seen]))
+        # merge the newest arrays while they are the same size or bigger, so there are
+        # only a logarithmic number of them
+        while (
+            len(self.seen_hashes) > 1
+            and len(self.seen_hashes[-1]) >= len(self.seen_hashes[-2])
+        ):
+            newest = self.seen_hashes.pop()
+            self.seen_hashes[-1] = np.sort(np.concatenate([self.seen_hashes[-1], newest]))
+
+        return df[~is_seen].reset_index(drop=True), n_dropped + int(is_seen.sum())
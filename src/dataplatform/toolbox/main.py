@@ -1,12 +1,13 @@
 """Data Platform Toolbox Streamlit Page Main Code."""
 
 import asyncio
-import grpc.aio
+import os
+
 import streamlit as st
+
+from dataplatform.channels import get_channel_manager
+from dataplatform.forecast.scheduler import RpcScheduler, ScheduledDataPlatformClient
 from dataplatform.toolbox.location import locations_section
-from ocf.dp.dp import common_pb2
-from ocf.dp.dp_data import messages_pb2, service_pb2_grpc
-import os
 
 # Color scheme (matching existing toolbox)
 # teal:  #63BCAF (Get operations)
@@ -25,26 +26,24 @@ async def async_dataplatform_toolbox_page():
     """Async Main function for the Data Platform Toolbox Streamlit page."""
     host = os.environ.get("DATA_PLATFORM_HOST", "localhost")
     port = os.environ.get("DATA_PLATFORM_PORT", "50051")
-    channel = grpc.aio.insecure_channel(f"{host}:{int(port)}")
-    try:
-        data_client = service_pb2_grpc.DataPlatformDataServiceStub(channel)
-
-        st.markdown(
-            '<h1 style="color:#63BCAF;font-size:48px;">Data Platform Toolbox</h1>',
-            unsafe_allow_html=True,
-        )
-
-        # Create tabs for different sections
-        tab1, = st.tabs(
-            [
-                "Locations",
-            ]
-        )
-
-        with tab1:
-            await locations_section(data_client)
-    finally:
-        await channel.close()
+    data_client = ScheduledDataPlatformClient(
+        get_channel_manager().client(host, int(port)), RpcScheduler(),
+    )
+
+    st.markdown(
+        '<h1 style="color:#63BCAF;font-size:48px;">Data Platform Toolbox</h1>',
+        unsafe_allow_html=True,
+    )
+
+    # Create tabs for different sections
+    tab1, = st.tabs(
+        [
+            "Locations",
+        ]
+    )
+
+    with tab1:
+        await locations_section(data_client)
 
 
 # Required for the tests to run this as a script
@@ -0,0 +1,120 @@
+"""Lazy file exports for download buttons.
+
+Serializing a large DataFrame on every rerun, just in case someone clicks a download
+button, is slow. lazy_download_button only writes the file when the button is clicked,
+in chunks, to a temporary file named by a fingerprint of the data. The same data is
+then downloaded again from that file without being written twice.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+export_dir = Path(tempfile.gettempdir()) / "analysis-dashboard-exports"
+export_chunk_rows = 100_000
+max_cached_exports = 8
+
+# file format -> (file extension, mime type)
+export_formats = {
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def data_fingerprint(df: pd.DataFrame, index: bool = True) -> str:
+    """Hash of the columns, dtypes and values of a DataFrame."""
+    hasher = hashlib.sha256()
+    hasher.update(repr(list(zip(df.columns, df.dtypes.astype(str)))).encode())
+    hasher.update(pd.util.hash_pandas_object(df, index=index).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+def write_csv_gzip(df: pd.DataFrame, path: Path, index: bool) -> None:
+    """Write a gzipped CSV, a chunk of rows at a time."""
+    with gzip.open(path, "wt", newline="") as f:
+        df.iloc[:0].to_csv(f, index=index)
+        for start in range(0, len(df), export_chunk_rows):
+            df.iloc[start : start + export_chunk_rows].to_csv(f, header=False, index=index)
+
+
+def write_parquet(df: pd.DataFrame, path: Path, index: bool) -> None:
+    """Write a Parquet file, a row group at a time."""
+    schema = pa.Schema.from_pandas(df, preserve_index=index)
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, max(len(df), 1), export_chunk_rows):
+            chunk = df.iloc[start : start + export_chunk_rows]
+            writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=index),
+            )
+
+
+def evict_exports() -> None:
+    """Delete the oldest export files, keeping max_cached_exports."""
+    paths = sorted(
+        (path for path in export_dir.iterdir() if not path.name.endswith(".tmp")),
+        key=lambda path: path.stat().st_mtime,
+    )
+    for path in paths[:-max_cached_exports]:
+        path.unlink(missing_ok=True)
+
+
+def export_file(df: pd.DataFrame, file_format: str, index: bool = True) -> Path:
+    """Write a DataFrame in one of the export_formats, or reuse the file, and get its path."""
+    extension, _ = export_formats[file_format]
+    export_dir.mkdir(parents=True, exist_ok=True)
+    path = export_dir / f"{data_fingerprint(df, index)}.{extension}"
+
+    if not path.exists():
+        # write to a temporary file and rename, so a partial file is never served
+        temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            if file_format == "Parquet":
+                write_parquet(df, temp_path, index)
+            else:
+                write_csv_gzip(df, temp_path, index)
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        evict_exports()
+    else:
+        os.utime(path)
+
+    return path
+
+
+def lazy_download_button(
+    label: str,
+    df: pd.DataFrame,
+    file_name: str,
+    key: str,
+    index: bool = True,
+) -> None:
+    """Download button for a DataFrame, with a choice of format.
+
+    The file is only written when the button is clicked, and clicking it doesn't rerun
+    the page. file_name is without an extension, which comes from the format.
+    """
+    file_format = st.radio(
+        f"{label} format",
+        list(export_formats),
+        horizontal=True,
+        key=f"{key}_format",
+        label_visibility="collapsed",
+    )
+    extension, mime = export_formats[file_format]
+    st.download_button(
+        label=label,
+        data=lambda: export_file(df, file_format, index).read_bytes(),
+        file_name=f"{file_name}.{extension}",
+        mime=mime,
+        key=key,
+        on_click="ignore",
+    )
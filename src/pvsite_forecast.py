@@ -16,6 +16,8 @@ from pvsite_datamodel.read import (
 
 import plotly.graph_objects as go
 
+from export import lazy_download_button
+
 # Penalty Calculator
 def calculate_penalty(df, region, asset_type, capacity_kw):
     """
@@ -379,18 +381,11 @@ def pvsite_forecast_page():
 
     st.plotly_chart(fig, theme="streamlit")
 
-    # download data,
-    @st.cache_data
-    def convert_df(df: pd.DataFrame):
-        # IMPORTANT: Cache the conversion to prevent computation on every rerun
-        return df.to_csv().encode("utf-8")
-
-    # join data together
+    # join data together, for the download
     if resample is not None:
         df = df_all
     else:
         df = pd.concat([df_forecast, df_generation], axis=1)
-    csv = convert_df(df)
     now = datetime.now().isoformat()
 
     if resample is None:
@@ -461,12 +456,12 @@ def pvsite_forecast_page():
         st.caption(f"NMAE_live_gen is calculated by current generation (kw)")
         st.caption(f"NMAE_capacity is calculated by generation capacity (mw)")
 
-    # CSV download button
-    st.download_button(
-        label="Download data as CSV",
-        data=csv,
-        file_name=f"site_forecast_{site_selection_uuid}_{now}.csv",
-        mime="text/csv",
+    # download button, the file is only written when it is clicked
+    lazy_download_button(
+        label="Download data",
+        df=df,
+        file_name=f"site_forecast_{site_selection_uuid}_{now}",
+        key="download_site_forecast",
     )
 
     # Add error metrics visualization - daily averages for selected time frame
@@ -686,13 +681,11 @@ def pvsite_forecast_page():
                         daily_metrics_combined = daily_metrics_combined.join(model_daily, how='outer')
             
             if not daily_metrics_combined.empty:
-                daily_csv = convert_df(daily_metrics_combined.reset_index())
-                
-                st.download_button(
-                    label="Download daily error metrics as CSV",
-                    data=daily_csv,
-                    file_name=f"daily_error_metrics_{site_selection_uuid}_{now}.csv",
-                    mime="text/csv",
+                lazy_download_button(
+                    label="Download daily error metrics",
+                    df=daily_metrics_combined.reset_index(),
+                    file_name=f"daily_error_metrics_{site_selection_uuid}_{now}",
+                    key="download_daily_error_metrics",
                 )
         else:
             st.info("No valid data available for error metrics visualization. Please check if your selected time range contains both forecast and generation data.")
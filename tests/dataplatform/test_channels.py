@@ -0,0 +1,75 @@
+"""Tests for dataplatform/channels.py"""
+
+import asyncio
+
+import pytest
+
+from dataplatform.channels import ChannelManager
+
+
+class FakeStreamCall:
+    """Fake server streaming call, which can be iterated and cancelled."""
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.cancelled = False
+
+    async def __aiter__(self):
+        for message in self.messages:
+            yield message
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeStub:
+    async def ListLocations(self, request, timeout=None):
+        await asyncio.sleep(0)
+        return request
+
+    async def GetLocation(self, request, timeout=None):
+        raise ValueError("not found")
+
+    def StreamForecastData(self, request, timeout=None):
+        return FakeStreamCall([0, 1, 2])
+
+
+@pytest.fixture
+def manager():
+    manager = ChannelManager()
+    manager._stub = lambda target: FakeStub()
+    yield manager
+    manager.loop.call_soon_threadsafe(manager.loop.stop)
+
+
+def test_client_reused_across_event_loops(manager):
+    client = manager.client("localhost", 50051)
+
+    # each Streamlit rerun runs in a new event loop
+    assert asyncio.run(client.ListLocations("first")) == "first"
+    assert asyncio.run(client.ListLocations("second")) == "second"
+
+    health_df = manager.health()
+    assert health_df["method"].tolist() == ["ListLocations"]
+    assert health_df["started"].tolist() == [2]
+    assert health_df["succeeded"].tolist() == [2]
+    assert health_df["in_flight"].tolist() == [0]
+
+
+def test_client_counts_failures(manager):
+    client = manager.client("localhost", 50051)
+
+    with pytest.raises(ValueError):
+        asyncio.run(client.GetLocation("request"))
+
+    assert manager.health()["failed"].tolist() == [1]
+
+
+def test_client_stream(manager):
+    client = manager.client("localhost", 50051)
+
+    async def read_stream():
+        return [message async for message in client.StreamForecastData("request")]
+
+    assert asyncio.run(read_stream()) == [0, 1, 2]
+    assert manager.health()["succeeded"].tolist() == [1]
@@ -0,0 +1,105 @@
+"""Tests for dataplatform/fake_service.py"""
+
+import datetime as dt
+
+import grpc
+import pytest
+from ocf.dp.dp import common_pb2
+from ocf.dp.dp_data import messages_pb2, service_pb2_grpc
+
+from dataplatform.fake_service import FakeDataConfig, FakeDataPlatform
+from dataplatform.forecast.decode import decode_forecast_timeseries, decode_stream_forecast_values
+
+end = dt.datetime(2025, 6, 3, tzinfo=dt.UTC)
+start = end - dt.timedelta(days=2)
+time_window = messages_pb2.TimeWindow(start_timestamp_utc=start, end_timestamp_utc=end)
+
+
+async def first_gsp(stub) -> messages_pb2.ListLocationsResponse.LocationSummary:
+    response = await stub.ListLocations(messages_pb2.ListLocationsRequest())
+    return next(
+        loc for loc in response.locations
+        if loc.location_type == common_pb2.LocationType.LOCATION_TYPE_GSP
+    )
+
+
+@pytest.mark.asyncio
+async def test_fake_service_lists():
+    config = FakeDataConfig(n_gsps=2, n_sites=3)
+    async with FakeDataPlatform(config) as fake, grpc.aio.insecure_channel(fake.target) as channel:
+        stub = service_pb2_grpc.DataPlatformDataServiceStub(channel)
+
+        locations = (await stub.ListLocations(messages_pb2.ListLocationsRequest())).locations
+        forecasters = (await stub.ListForecasters(messages_pb2.ListForecastersRequest())).forecasters
+        observers = (await stub.ListObservers(messages_pb2.ListObserversRequest())).observers
+
+    assert len(locations) == 1 + 2 + 3
+    assert locations[1].metadata.fields["gsp_id"].number_value == 1
+    assert len(forecasters) == len(config.forecasters)
+    assert [o.observer_name for o in observers] == config.observers
+
+
+@pytest.mark.asyncio
+async def test_fake_service_forecasts_and_observations():
+    async with FakeDataPlatform() as fake, grpc.aio.insecure_channel(fake.target) as channel:
+        stub = service_pb2_grpc.DataPlatformDataServiceStub(channel)
+        location = await first_gsp(stub)
+        forecaster = messages_pb2.Forecaster(forecaster_name="pvnet_v2", forecaster_version="1.0.0")
+
+        timeseries = await stub.GetForecastAsTimeseries(
+            messages_pb2.GetForecastAsTimeseriesRequest(
+                location_uuid=location.location_uuid,
+                energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+                horizon_mins=60,
+                time_window=time_window,
+                forecaster=forecaster,
+            ),
+        )
+        observations = await stub.GetObservationsAsTimeseries(
+            messages_pb2.GetObservationsAsTimeseriesRequest(
+                location_uuid=location.location_uuid,
+                observer_name="pvlive_in_day",
+                energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+                time_window=time_window,
+            ),
+        )
+        chunks = [
+            chunk
+            async for chunk in stub.StreamForecastData(
+                messages_pb2.StreamForecastDataRequest(
+                    location_uuids=[location.location_uuid],
+                    energy_source=common_pb2.EnergySource.ENERGY_SOURCE_SOLAR,
+                    time_window=messages_pb2.TimeWindow(
+                        start_timestamp_utc=start,
+                        end_timestamp_utc=start + dt.timedelta(hours=1),
+                    ),
+                    forecasters=[forecaster],
+                ),
+            )
+        ]
+
+    timeseries_df = decode_forecast_timeseries(timeseries, "pvnet_v2")
+    # one value per half hour target time in the window
+    assert len(timeseries_df) == 2 * 48 + 1
+    assert (timeseries_df["horizon_mins"] == 60).all()
+    assert {"p10_watts", "p90_watts"} <= set(timeseries_df.columns)
+
+    assert len(observations.values) == 2 * 48 + 1
+
+    stream_df = decode_stream_forecast_values([v for chunk in chunks for v in chunk.values])
+    # three init times, each with horizons 0 to 36 hours
+    assert len(stream_df) == 3 * (36 * 2 + 1)
+    assert (stream_df["forecaster_name"] == "pvnet_v2").all()
+
+
+@pytest.mark.asyncio
+async def test_fake_service_errors():
+    config = FakeDataConfig(error_rate=1.0, error_code=grpc.StatusCode.UNAVAILABLE)
+    async with FakeDataPlatform(config) as fake, grpc.aio.insecure_channel(fake.target) as channel:
+        stub = service_pb2_grpc.DataPlatformDataServiceStub(channel)
+
+        with pytest.raises(grpc.aio.AioRpcError) as e:
+            await stub.ListLocations(messages_pb2.ListLocationsRequest())
+
+    assert e.value.code() == grpc.StatusCode.UNAVAILABLE
+    assert fake.service.calls["ListLocations"] == 1
@@ -0,0 +1,103 @@
+"""Tests for dataplatform/forecast/chunking.py"""
+
+import threading
+from datetime import UTC, datetime, timedelta
+
+import grpc
+import pytest
+
+from dataplatform.forecast.chunking import AdaptiveChunker
+
+start_date = datetime(2025, 6, 1, tzinfo=UTC)
+
+
+def rpc_error(code: grpc.StatusCode) -> grpc.aio.AioRpcError:
+    return grpc.aio.AioRpcError(code, grpc.aio.Metadata(), grpc.aio.Metadata())
+
+
+def test_plan_covers_window():
+    chunker = AdaptiveChunker(initial_days=7)
+    windows = chunker.plan("site", start_date, start_date + timedelta(days=17))
+
+    assert windows[0][0] == start_date
+    assert windows[-1][1] == start_date + timedelta(days=17)
+    assert [end - start for start, end in windows] == [
+        timedelta(days=7), timedelta(days=7), timedelta(days=3),
+    ]
+
+
+def test_additive_increase_multiplicative_decrease():
+    chunker = AdaptiveChunker(initial_days=7, target_seconds=10)
+
+    chunker.record_success("site", timedelta(days=7), n_rows=100, seconds=1)
+    assert chunker.tuning("site").window_days == 8
+
+    chunker.record_success("site", timedelta(days=8), n_rows=100, seconds=20)
+    assert chunker.tuning("site").window_days == 4
+
+    chunker.record_failure("site")
+    assert chunker.tuning("site").window_days == 2
+
+    # the tuning is kept per key
+    assert chunker.tuning("nation").window_days == 7
+
+
+def test_window_capped_by_rows_per_day():
+    chunker = AdaptiveChunker(initial_days=7, target_rows=10_000)
+
+    # 5 minute data for 48 horizons is about 14,000 rows a day
+    chunker.record_success("nation", timedelta(days=7), n_rows=7 * 14_000, seconds=1)
+
+    tuning = chunker.tuning("nation")
+    assert tuning.rows_per_day == 14_000
+    assert tuning.window_days == pytest.approx(10_000 / 14_000)
+
+
+
+def test_concurrent_updates_are_not_lost():
+    chunker = AdaptiveChunker(initial_days=0, min_days=0, max_days=10**9, increase_days=1)
+
+    def record() -> None:
+        for _ in range(2000):
+            chunker.record_success("site", timedelta(0), n_rows=0, seconds=0)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert chunker.tuning("site").window_days == 8 * 2000
+
+
+@pytest.mark.asyncio
+async def test_fetch_splits_windows_that_time_out():
+    chunker = AdaptiveChunker(initial_days=4, min_days=1)
+    windows = []
+
+    async def fetch_window(window_start: datetime, window_end: datetime) -> list:
+        if window_end - window_start > timedelta(days=2):
+            raise rpc_error(grpc.StatusCode.DEADLINE_EXCEEDED)
+        windows.append((window_start, window_end))
+        return [window_start]
+
+    results = await chunker.fetch("site", start_date, start_date + timedelta(days=4), fetch_window)
+
+    assert results == [[start_date], [start_date + timedelta(days=2)]]
+    assert windows == [
+        (start_date, start_date + timedelta(days=2)),
+        (start_date + timedelta(days=2), start_date + timedelta(days=4)),
+    ]
+    # halved by the timeout, then grown by the two successful windows
+    assert chunker.tuning("site").window_days == 2 + 2 * chunker.increase_days
+
+
+@pytest.mark.asyncio
+async def test_fetch_raises_other_errors():
+    chunker = AdaptiveChunker(initial_days=4)
+
+    async def fetch_window(window_start: datetime, window_end: datetime) -> list:
+        raise rpc_error(grpc.StatusCode.INVALID_ARGUMENT)
+
+    with pytest.raises(grpc.aio.AioRpcError):
+        await chunker.fetch("site", start_date, start_date + timedelta(days=4), fetch_window)
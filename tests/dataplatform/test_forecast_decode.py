@@ -0,0 +1,186 @@
+"""Tests for dataplatform/forecast/decode.py"""
+
+import datetime
+
+import pandas as pd
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.timestamp_pb2 import Timestamp
+from ocf.dp.dp_data import messages_pb2
+
+from dataplatform.forecast.decode import (
+    decode_forecast_timeseries,
+    decode_stream_forecast_values,
+    stream_forecast_fractions_to_watts,
+)
+
+init_time = datetime.datetime(2025, 6, 1, 12, 0, tzinfo=datetime.UTC)
+
+
+def make_value(horizon_mins: int, other_statistics_fractions: dict) -> dict:
+    target_time = init_time + datetime.timedelta(minutes=horizon_mins)
+    return {
+        "target_timestamp_utc": Timestamp(seconds=int(target_time.timestamp())),
+        "initialization_timestamp_utc": Timestamp(seconds=int(init_time.timestamp())),
+        "created_timestamp_utc": Timestamp(seconds=int(init_time.timestamp()) + 60),
+        "effective_capacity_watts": 1000,
+        "p50_value_fraction": 0.5,
+        "other_statistics_fractions": other_statistics_fractions,
+    }
+
+
+def test_decode_forecast_timeseries():
+    response = messages_pb2.GetForecastAsTimeseriesResponse(
+        location_uuid="test_location",
+        values=[
+            make_value(0, {"p10": 0.25, "p90": 0.75}),
+            make_value(30, {"p10": 0.25, "p90": 0.75}),
+        ],
+    )
+
+    df = decode_forecast_timeseries(response, "pvnet_v2")
+
+    assert len(df) == 2
+    assert df["target_timestamp_utc"].tolist() == [
+        init_time,
+        init_time + datetime.timedelta(minutes=30),
+    ]
+    assert (df["initialization_timestamp_utc"] == init_time).all()
+    assert df["horizon_mins"].tolist() == [0, 30]
+    assert df["p50_watts"].tolist() == [500, 500]
+    assert df["p10_watts"].tolist() == [250, 250]
+    assert df["p90_watts"].tolist() == [750, 750]
+    assert "p25_watts" not in df.columns
+    assert (df["forecaster_name"] == "pvnet_v2").all()
+    assert (df["location_uuid"] == "test_location").all()
+
+
+def test_decode_forecast_timeseries_missing_plevels():
+    response = messages_pb2.GetForecastAsTimeseriesResponse(
+        location_uuid="test_location",
+        values=[make_value(0, {}), make_value(30, {"p10": 0.25})],
+    )
+
+    df = decode_forecast_timeseries(response, "pvnet_v2")
+
+    assert df["p10_watts"].isna().tolist() == [True, False]
+    assert "p90_watts" not in df.columns
+
+
+def test_decode_forecast_timeseries_empty():
+    response = messages_pb2.GetForecastAsTimeseriesResponse(location_uuid="test_location")
+
+    assert decode_forecast_timeseries(response, "pvnet_v2").empty
+
+
+def make_stream_values() -> list:
+    values = []
+    for forecaster_fullname in ["pvnet_v2:1.0.0", "blend:2.1"]:
+        for horizon_mins in [0, 30, 60]:
+            values.append(
+                {
+                    "location_uuid": "test_location",
+                    "forecaster_fullname": forecaster_fullname,
+                    "effective_capacity_watts": 2000,
+                    "p50_fraction": 0.5,
+                    "init_timestamp": Timestamp(seconds=int(init_time.timestamp())),
+                    "horizon_mins": horizon_mins,
+                    "created_timestamp_utc": Timestamp(seconds=int(init_time.timestamp()) + 60),
+                    "other_statistics_fractions": {"p10": 0.25, "p90": 0.75},
+                },
+            )
+    return messages_pb2.StreamForecastDataResponse(values=values).values
+
+
+def legacy_stream_values_to_df(forecast_values: list) -> pd.DataFrame:
+    """The MessageToDict and json_normalize path previously used in fetch_all_forecasts."""
+    plevels = forecast_values[0].other_statistics_fractions.keys()
+    return (
+        pd.DataFrame.from_dict(
+            [
+                MessageToDict(
+                    f,
+                    always_print_fields_with_no_presence=True,
+                    preserving_proto_field_name=True,
+                )
+                for f in forecast_values
+            ]
+        )
+        .pipe(lambda df: df.join(
+            pd.json_normalize(df["other_statistics_fractions"].tolist()).set_index(df.index)
+        ))
+        .drop("other_statistics_fractions", axis=1)
+        .assign(
+            **{
+                f"{k}_watts": lambda df, k=k: (
+                    pd.to_numeric(df[k], errors="coerce")
+                    * pd.to_numeric(df["effective_capacity_watts"], errors="coerce")
+                )
+                .round()
+                .astype("Int64")
+                for k in plevels
+            },
+        )
+        .drop(columns=list(plevels))
+        .assign(
+            p50_watts=lambda df: (
+                pd.to_numeric(df["p50_fraction"], errors="coerce")
+                * pd.to_numeric(df["effective_capacity_watts"], errors="coerce")
+            )
+            .round()
+            .astype("Int64"),
+            target_timestamp_utc=lambda df: (
+                pd.to_datetime(df["init_timestamp"], utc=True, errors="coerce")
+                + pd.to_timedelta(pd.to_numeric(df["horizon_mins"], errors="coerce"), unit="m")
+            ),
+            initialization_timestamp_utc=lambda df: pd.to_datetime(
+                df["init_timestamp"], utc=True, errors="coerce",
+            ),
+            created_timestamp_utc=lambda df: pd.to_datetime(
+                df["created_timestamp_utc"], utc=True, errors="coerce",
+            ),
+            forecaster_name=lambda df: df["forecaster_fullname"].apply(
+                lambda x: x.split(":")[0] if isinstance(x, str) and ":" in x else x
+            ),
+        )
+        .drop(columns=["p50_fraction", "init_timestamp", "forecaster_fullname"])
+    )
+
+
+def test_stream_forecast_decode_matches_legacy():
+    values = make_stream_values()
+
+    legacy_df = legacy_stream_values_to_df(values)
+    df = stream_forecast_fractions_to_watts(decode_stream_forecast_values(values))
+
+    # columns used by the plot functions
+    plot_columns = {
+        "location_uuid",
+        "forecaster_name",
+        "effective_capacity_watts",
+        "initialization_timestamp_utc",
+        "target_timestamp_utc",
+        "created_timestamp_utc",
+        "horizon_mins",
+        "p10_watts",
+        "p50_watts",
+        "p90_watts",
+    }
+    assert plot_columns.issubset(df.columns)
+    assert set(df.columns).issubset(legacy_df.columns)
+
+    # MessageToDict turns int64 into strings
+    legacy_df["effective_capacity_watts"] = legacy_df["effective_capacity_watts"].astype("int64")
+
+    pd.testing.assert_frame_equal(
+        df,
+        legacy_df[df.columns],
+        check_dtype=False,
+    )
+
+
+def test_stream_forecast_decode_empty():
+    df = stream_forecast_fractions_to_watts(decode_stream_forecast_values([]))
+
+    assert df.empty
+    assert "p50_watts" in df.columns
+    assert "initialization_timestamp_utc" in df.columns
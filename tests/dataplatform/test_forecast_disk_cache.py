@@ -0,0 +1,118 @@
+"""Tests for dataplatform/forecast/disk_cache.py"""
+
+import os
+import types
+from datetime import UTC, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from dataplatform.forecast import backend
+from dataplatform.forecast.disk_cache import DiskCache
+from dataplatform.forecast.planner import plan_page_requests, run_plan
+from dataplatform.forecast.segment_cache import SegmentCache
+
+
+def make_df(n: int = 10) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "target_timestamp_utc": pd.date_range("2025-01-01", periods=n, freq="30min", tz="UTC"),
+            "value_watts": range(n),
+        },
+    )
+
+
+def test_disk_cache_round_trip(tmp_path):
+    disk_cache = DiskCache(directory=tmp_path / "cache")
+    df = make_df()
+
+    assert disk_cache.get("key") is None
+    disk_cache.set("key", df)
+
+    pd.testing.assert_frame_equal(disk_cache.get("key"), df)
+    assert list((tmp_path / "cache").glob("*.tmp")) == []
+
+
+def test_disk_cache_empty_frame(tmp_path):
+    disk_cache = DiskCache(directory=tmp_path)
+    disk_cache.set("key", make_df().iloc[:0])
+
+    cached_df = disk_cache.get("key")
+    assert cached_df.empty
+    assert list(cached_df.columns) == ["target_timestamp_utc", "value_watts"]
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    disk_cache = DiskCache(directory=tmp_path)
+    for i, key in enumerate(["a", "b", "c"]):
+        disk_cache.set(key, make_df())
+        os.utime(disk_cache.path(key), (i, i))
+
+    # reading "a" makes "b" the least recently used
+    disk_cache.get("a")
+    disk_cache.max_bytes = 2 * disk_cache.path("a").stat().st_size
+    disk_cache.evict()
+
+    assert disk_cache.get("b") is None
+    assert disk_cache.get("a") is not None
+    assert disk_cache.get("c") is not None
+
+
+def test_segment_cache_only_writes_immutable_days(tmp_path):
+    disk_cache = DiskCache(directory=tmp_path)
+    cache = SegmentCache(disk_cache=disk_cache)
+    cache.mark_immutable_before("uuid", datetime(2025, 1, 2, 12, tzinfo=UTC))
+
+    cache.set_segment("old", "uuid", datetime(2025, 1, 1, tzinfo=UTC), make_df())
+    cache.set_segment("recent", "uuid", datetime(2025, 1, 2, tzinfo=UTC), make_df())
+
+    assert disk_cache.get("old") is not None
+    assert disk_cache.get("recent") is None
+
+    # a new process reads the immutable day from disk
+    new_cache = SegmentCache(disk_cache=disk_cache)
+    old_df = new_cache.get_segment("old", "uuid", datetime(2025, 1, 1, tzinfo=UTC))
+    pd.testing.assert_frame_equal(old_df, make_df())
+    assert new_cache.get_segment("recent", "uuid", datetime(2025, 1, 2, tzinfo=UTC)) is None
+
+
+class FakeObservationsStub:
+    """Fake stub returning half hourly observations for two days."""
+
+    async def GetObservationsAsTimeseries(self, request, timeout=None):
+        timestamps = pd.date_range("2025-01-01", "2025-01-02 12:00", freq="30min", tz="UTC")
+        values = [
+            types.SimpleNamespace(
+                timestamp_utc=types.SimpleNamespace(ToDatetime=lambda tzinfo, t=t: t),
+                value_fraction=0.5,
+                effective_capacity_watts=1000,
+            )
+            for t in timestamps.to_pydatetime()
+        ]
+        return types.SimpleNamespace(values=values, location_uuid="uuid")
+
+
+@pytest.mark.asyncio
+async def test_page_fetch_writes_settled_days_to_disk(tmp_path, monkeypatch):
+    disk_cache = DiskCache(directory=tmp_path)
+    monkeypatch.setattr(backend, "segment_cache", SegmentCache(disk_cache=disk_cache))
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    cfg = types.SimpleNamespace(
+        location=types.SimpleNamespace(location_uuid="uuid", location_type=1),
+        forecasters=[],
+        start_date=start,
+        end_date=start + timedelta(days=2) - timedelta(seconds=1),
+        forecast_horizon=0,
+        t0s=None,
+        all_horizons=False,
+        compare_versions=False,
+    )
+
+    result = await run_plan(
+        plan_page_requests(FakeObservationsStub(), cfg, observers=["pvlive_day_after"]),
+    )
+
+    assert result.error_messages == []
+    # the first day is settled by the pvlive_day_after observations, the second isn't
+    [path] = tmp_path.glob("*.parquet")
+    assert len(pd.read_parquet(path)) == 48
@@ -0,0 +1,82 @@
+"""Tests for dataplatform/forecast/downsample.py"""
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.forecast.downsample import (
+    chart_width_px,
+    chart_widths_px,
+    downsample,
+    filter_x_range,
+    lttb_indices,
+    max_points_for_width,
+)
+
+
+def make_forecast_df(n: int = 10_000) -> pd.DataFrame:
+    p50_watts = np.sin(np.linspace(0, 20 * np.pi, n)) * 1000
+    p50_watts[n // 3] = 5000  # a spike, which has to be kept
+    return pd.DataFrame(
+        {
+            "target_timestamp_utc": pd.date_range("2025-06-01", periods=n, freq="5min", tz="UTC"),
+            "p50_watts": p50_watts,
+            "p10_watts": p50_watts - 100,
+        },
+    )
+
+
+def test_lttb_indices():
+    x = np.arange(1000)
+    y = np.zeros(1000)
+    y[500] = 1
+
+    indices = lttb_indices(x, y, 50)
+
+    assert len(indices) == 50
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert 500 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_indices_keeps_short_series():
+    assert list(lttb_indices(np.arange(5), np.arange(5), 10)) == [0, 1, 2, 3, 4]
+
+
+def test_downsample_keeps_bands_aligned():
+    forecast_df = make_forecast_df()
+
+    downsampled_df = downsample(forecast_df, "target_timestamp_utc", "p50_watts", 500)
+
+    assert len(downsampled_df) == 500
+    assert downsampled_df["p50_watts"].max() == 5000
+    np.testing.assert_allclose(downsampled_df["p50_watts"] - downsampled_df["p10_watts"], 100)
+    assert downsampled_df["target_timestamp_utc"].is_monotonic_increasing
+
+
+def test_downsample_no_limit():
+    forecast_df = make_forecast_df(100)
+    assert downsample(forecast_df, "target_timestamp_utc", "p50_watts", None) is forecast_df
+    assert downsample(forecast_df, "target_timestamp_utc", "p50_watts", 500) is forecast_df
+
+
+def test_filter_x_range():
+    forecast_df = make_forecast_df(100)
+    x_range = (
+        pd.Timestamp("2025-06-01 01:00", tz="UTC"),
+        pd.Timestamp("2025-06-01 02:00", tz="UTC"),
+    )
+
+    filtered_df = filter_x_range(forecast_df, "target_timestamp_utc", x_range)
+
+    assert len(filtered_df) == 13
+    assert filter_x_range(forecast_df, "target_timestamp_utc", None) is forecast_df
+
+
+def test_max_points_follow_chart_width():
+    assert chart_width_px in chart_widths_px
+    assert max_points_for_width(700) < max_points_for_width() < max_points_for_width(2800)
+
+    df = make_forecast_df()
+    narrow_df = downsample(df, "target_timestamp_utc", "p50_watts", max_points_for_width(700))
+    assert len(narrow_df) == max_points_for_width(700)
@@ -0,0 +1,94 @@
+"""Tests for dataplatform/forecast/jobs.py"""
+
+import asyncio
+import time
+
+import pytest
+
+from dataplatform.forecast.jobs import JobRunner
+from dataplatform.forecast.tracing import span
+
+
+@pytest.fixture
+def runner():
+    runner = JobRunner()
+    yield runner
+    runner.loop.call_soon_threadsafe(runner.loop.stop)
+
+
+def wait_for(job, seconds: float = 2.0):
+    deadline = time.monotonic() + seconds
+    while job.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_job_reports_progress_and_result(runner):
+    async def pipeline(job):
+        job.update(0.5, "halfway", partial=[1])
+        with span("aggregate", "sum"):
+            await asyncio.sleep(0.05)
+        return 3
+
+    job = runner.submit("key", pipeline, "session-a")
+    wait_for(job)
+
+    assert job.state == "done"
+    assert job.result == 3
+    assert job.snapshot() == (0.5, "halfway", [1])
+    assert [s.name for s in job.tracer.spans] == ["sum"]
+
+
+def test_sessions_share_one_job(runner):
+    calls = []
+
+    async def pipeline(job):
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    first = runner.submit("key", pipeline, "session-a")
+    second = runner.submit("key", pipeline, "session-b")
+    wait_for(first)
+
+    assert first is second
+    assert first.sessions == {"session-a", "session-b"}
+    assert calls == [1]
+    # a rerun picks up the finished job, rather than starting again
+    assert runner.submit("key", pipeline, "session-a").result == 1
+
+
+def test_cancel_only_when_no_session_is_left(runner):
+    async def pipeline(job):
+        await asyncio.sleep(10)
+
+    job = runner.submit("key", pipeline, "session-a")
+    runner.submit("key", pipeline, "session-b")
+
+    runner.cancel("key", "session-a")
+    time.sleep(0.05)
+    assert job.running
+
+    runner.cancel("key", "session-b")
+    assert job.state == "cancelled"
+    time.sleep(0.05)
+    assert job.future.cancelled() or job.future.done()
+
+
+def test_failed_job_is_started_again(runner):
+    attempts = []
+
+    async def pipeline(job):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("no data")
+        return "ok"
+
+    job = runner.submit("key", pipeline, "session-a")
+    wait_for(job)
+    assert job.state == "failed"
+    assert str(job.error) == "no data"
+
+    retry = runner.submit("key", pipeline, "session-a")
+    wait_for(retry)
+    assert retry is not job
+    assert retry.result == "ok"
@@ -0,0 +1,79 @@
+"""Tests for dataplatform/forecast/join.py"""
+
+import pandas as pd
+
+from dataplatform.forecast.join import join_observations, select_observations
+
+timestamps = pd.date_range("2025-06-01", periods=4, freq="30min", tz="UTC")
+
+
+def make_observations_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "target_timestamp_utc": [*timestamps, *timestamps[:2], timestamps[3]],
+            "observer_name": ["pvlive_in_day"] * 4 + ["pvlive_day_after"] * 2 + ["other"],
+            "value_watts": [10, 11, 12, 13, 20, 21, 30],
+            "effective_capacity_watts": 100,
+        },
+    )
+
+
+def test_select_observations_by_priority():
+    selected_df = select_observations(make_observations_df(), "target_timestamp_utc")
+
+    assert list(selected_df["target_timestamp_utc"]) == list(timestamps)
+    assert list(selected_df["observer_name"]) == [
+        "pvlive_day_after",
+        "pvlive_day_after",
+        "pvlive_in_day",
+        "pvlive_in_day",
+    ]
+    assert list(selected_df["value_watts"]) == [20, 21, 12, 13]
+
+
+def test_join_observations_one_row_per_forecast():
+    forecast_df = pd.DataFrame(
+        {
+            "target_timestamp_utc": [timestamps[3], timestamps[0], timestamps[0]],
+            "forecaster_name": ["a", "a", "b"],
+            "p50_watts": [1, 2, 3],
+            "effective_capacity_watts": 200,
+        },
+    )
+    # a forecast with no observation is dropped, like an inner merge
+    forecast_df.loc[3] = [timestamps[3] + pd.Timedelta("1h"), "a", 4, 200]
+
+    merged_df = join_observations(forecast_df, make_observations_df())
+
+    assert len(merged_df) == 3
+    assert list(merged_df["p50_watts"]) == [1, 2, 3]
+    assert list(merged_df["value_watts"]) == [13, 20, 20]
+    assert list(merged_df["effective_capacity_watts"]) == [200, 200, 200]
+    assert list(merged_df["effective_capacity_watts_observation"]) == [100, 100, 100]
+    assert "target_timestamp_utc_observation" not in merged_df.columns
+
+
+def test_join_observations_matches_merge_for_one_observer():
+    observations_df = make_observations_df()
+    observations_df = observations_df[observations_df["observer_name"] == "pvlive_in_day"]
+    forecast_df = pd.DataFrame(
+        {"target_timestamp_utc": timestamps.repeat(3), "p50_watts": range(12)},
+    )
+
+    expected_df = pd.merge(forecast_df, observations_df, on="target_timestamp_utc")
+    merged_df = join_observations(forecast_df, observations_df)
+
+    pd.testing.assert_frame_equal(merged_df, expected_df[merged_df.columns])
+
+
+def test_join_observations_no_observations():
+    forecast_df = pd.DataFrame({"target_timestamp_utc": timestamps, "p50_watts": range(4)})
+
+    merged_df = join_observations(
+        forecast_df,
+        pd.DataFrame(),
+        observation_columns=["value_watts"],
+    )
+
+    assert merged_df.empty
+    assert list(merged_df.columns) == ["target_timestamp_utc", "p50_watts", "value_watts"]
@@ -0,0 +1,174 @@
+"""Tests for dataplatform/forecast/metrics.py"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataplatform.forecast.metrics import (
+    MetricAccumulator,
+    MetricCubeBuilder,
+    make_metric_cube,
+)
+from dataplatform.forecast.plot import make_summary_data
+
+
+def make_merged_df(n: int = 200, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    merged_df = pd.DataFrame(
+        {
+            "forecaster_name": rng.choice(["pvnet_v2", "blend"], n),
+            "horizon_mins": rng.choice([0, 30, 60, 90], n),
+            "p50_watts": rng.integers(0, 1000, n),
+            "value_watts": rng.integers(0, 1000, n),
+            "effective_capacity_watts_observation": rng.choice([1000, 1200], n),
+            "target_timestamp_utc": pd.Timestamp("2025-06-01", tz="UTC")
+            + pd.to_timedelta(rng.integers(0, 3 * 24 * 60, n), unit="min"),
+        },
+    )
+    merged_df["p10_watts"] = merged_df["p50_watts"] - 100
+    merged_df["p90_watts"] = merged_df["p50_watts"] + 100
+    merged_df.loc[merged_df.index[:10], "value_watts"] = 0
+    merged_df["error"] = merged_df["p50_watts"] - merged_df["value_watts"]
+    merged_df["absolute_error"] = merged_df["error"].abs()
+    return merged_df
+
+
+def expected_summary_df(merged_df: pd.DataFrame) -> pd.DataFrame:
+    """Summary per horizon and forecaster, computed straight from the merged rows."""
+    grouped = merged_df.groupby(["horizon_mins", "forecaster_name"])
+    summary_df = grouped["absolute_error"].agg(["mean", "std", "count"])
+    summary_df.columns = ["MAE", "absolute_error_std", "absolute_error_count"]
+    summary_df["ME"] = grouped["error"].mean()
+    summary_df["effective_capacity_watts_observation"] = grouped[
+        "effective_capacity_watts_observation"
+    ].mean()
+    return summary_df.reset_index()
+
+
+def test_metric_accumulator_matches_summary():
+    merged_df = make_merged_df()
+
+    accumulator = MetricAccumulator()
+    for start in range(0, len(merged_df), 70):
+        accumulator.add(merged_df.iloc[start : start + 70])
+
+    expected_df = expected_summary_df(merged_df)
+    summary_df = accumulator.summary_df()
+
+    assert accumulator.n_rows == len(merged_df)
+    pd.testing.assert_frame_equal(
+        summary_df[expected_df.columns],
+        expected_df,
+        check_dtype=False,
+    )
+
+
+def test_metric_accumulator_empty():
+    accumulator = MetricAccumulator()
+    accumulator.add(make_merged_df().iloc[:0])
+
+    assert accumulator.n_rows == 0
+    assert accumulator.summary_df().empty
+
+
+def test_metric_accumulator_skips_missing_p50():
+    merged_df = make_merged_df()
+    merged_df["p50_watts"] = merged_df["p50_watts"].astype("Float64")
+    merged_df.loc[merged_df.index[::7], "p50_watts"] = pd.NA
+    merged_df["error"] = merged_df["p50_watts"] - merged_df["value_watts"]
+    merged_df["absolute_error"] = merged_df["error"].abs()
+
+    accumulator = MetricAccumulator()
+    accumulator.add(merged_df)
+
+    # the rows without a p50 are skipped, like mean() skips them
+    expected_df = expected_summary_df(merged_df.dropna(subset=["error"]))
+    summary_df = accumulator.summary_df()
+
+    assert accumulator.n_rows == merged_df["error"].notna().sum()
+    pd.testing.assert_frame_equal(
+        summary_df[["horizon_mins", "forecaster_name", "MAE", "ME"]],
+        expected_df[["horizon_mins", "forecaster_name", "MAE", "ME"]],
+        check_dtype=False,
+    )
+
+
+def test_metric_cube_rollups():
+    merged_df = make_merged_df()
+    cube = make_metric_cube(merged_df)
+
+    assert cube.n_rows == len(merged_df)
+    assert cube.plevels == [10, 50, 90]
+
+    expected_df = expected_summary_df(merged_df)
+    pd.testing.assert_frame_equal(
+        cube.summary_df()[expected_df.columns],
+        expected_df,
+        check_dtype=False,
+    )
+
+    daily_df = cube.daily_df()
+    dates = merged_df["target_timestamp_utc"].dt.floor("D")
+    expected_daily = merged_df.groupby([dates, "forecaster_name"])["absolute_error"].mean()
+    np.testing.assert_allclose(daily_df["MAE"], expected_daily.to_numpy())
+
+    blend_df = merged_df[(merged_df["forecaster_name"] == "blend") & (merged_df["value_watts"] != 0)]
+    quantile_df = cube.quantile_df("blend", plevels=[10, 50, 90])
+    assert list(quantile_df["plevel"]) == [0.1, 0.5, 0.9]
+    assert quantile_df["value"].iloc[2] == (blend_df["p90_watts"] >= blend_df["value_watts"]).mean()
+
+
+def test_make_summary_data_from_cube():
+    merged_df = make_merged_df()
+    summary_table_df = make_summary_data(
+        make_metric_cube(merged_df), min_horizon=30, max_horizon=60, scale_factor=1000, units="kW",
+    )
+
+    in_range_df = merged_df[merged_df["horizon_mins"].between(30, 60)]
+    blend_df = in_range_df[in_range_df["forecaster_name"] == "blend"]
+    assert summary_table_df.loc["MAE [kW]", "blend"] == blend_df["absolute_error"].mean() / 1000
+    assert summary_table_df.loc["p90_below [%]", "blend"] == (
+        (blend_df["p90_watts"] > blend_df["value_watts"]).mean() * 100
+    )
+
+
+def aligned_df(merged_df: pd.DataFrame) -> pd.DataFrame:
+    """The rows of the init times that every forecaster has, from the whole frame."""
+    counts = merged_df.groupby("initialization_timestamp_utc")["forecaster_name"].nunique()
+    common_t0s = counts[counts == merged_df["forecaster_name"].nunique()].index
+    return merged_df[merged_df["initialization_timestamp_utc"].isin(common_t0s)]
+
+
+@pytest.mark.parametrize("align_t0s", [False, True])
+def test_metric_cube_builder_matches_whole_frame(align_t0s: bool):
+    merged_df = make_merged_df(n=400)
+    merged_df["initialization_timestamp_utc"] = merged_df["target_timestamp_utc"].dt.floor("6h")
+    # one init time only has one forecaster, so it is dropped when aligning
+    merged_df = merged_df[
+        (merged_df["initialization_timestamp_utc"] != pd.Timestamp("2025-06-02", tz="UTC"))
+        | (merged_df["forecaster_name"] == "blend")
+    ]
+
+    builder = MetricCubeBuilder(["pvnet_v2", "blend"], align_t0s)
+    for start in range(0, len(merged_df), 50):
+        builder.add(merged_df.iloc[start : start + 50])
+    cube = builder.finish()
+
+    expected_df = aligned_df(merged_df) if align_t0s else merged_df
+    expected = make_metric_cube(expected_df).rollup(["forecaster_name", "horizon_mins"])
+    pd.testing.assert_frame_equal(
+        cube.rollup(["forecaster_name", "horizon_mins"]), expected, check_dtype=False,
+    )
+    if align_t0s:
+        assert cube.n_rows < len(merged_df)
+
+
+def test_metric_cube_builder_aligns_on_forecasters_with_data():
+    merged_df = make_merged_df()
+    merged_df["initialization_timestamp_utc"] = merged_df["target_timestamp_utc"].dt.floor("D")
+
+    # a forecaster with no data at all doesn't stop the others being aligned
+    builder = MetricCubeBuilder(["pvnet_v2", "blend", "empty"], align_t0s=True)
+    builder.add(merged_df)
+
+    assert builder.finish().n_rows == len(merged_df)
@@ -0,0 +1,165 @@
+"""Tests for dataplatform/forecast/planner.py"""
+
+import asyncio
+import datetime as dt
+import types
+
+import pandas as pd
+import pytest
+
+from dataplatform.forecast.planner import FetchRequest, plan_page_requests, run_plan
+from dataplatform.forecast.scheduler import RpcScheduler, ScheduledDataPlatformClient
+
+
+class FakeStub:
+    """Fake stub whose calls sleep for a given time and return the request."""
+
+    async def GetForecastAsTimeseries(self, request, timeout=None):
+        await asyncio.sleep(request)
+        return request
+
+
+def sleep_request(kind: str, label: str, seconds: float, rows: int = 1) -> FetchRequest:
+    async def fetch():
+        await asyncio.sleep(seconds)
+        return pd.DataFrame({"value": range(rows)})
+
+    return FetchRequest(kind=kind, label=label, fetch=fetch)
+
+
+@pytest.mark.asyncio
+async def test_run_plan_runs_requests_concurrently():
+    requests = [
+        sleep_request("forecast", "a", 0.1, rows=2),
+        sleep_request("forecast", "b", 0.2, rows=3),
+        sleep_request("observation", "c", 0.1, rows=4),
+    ]
+
+    result = await run_plan(requests)
+
+    assert result.wall_seconds < 0.35
+    assert result.sequential_seconds >= 0.4
+    assert [len(df) for df in result.frames("forecast")] == [2, 3]
+    assert [len(df) for df in result.frames("observation")] == [4]
+    assert result.critical_path.label == "b"
+    assert result.kind_seconds("forecast") >= 0.2
+    assert list(result.timings_df()["rows"]) == [2, 3, 4]
+    assert "Critical path: forecast `b`" in result.summary()
+
+
+@pytest.mark.asyncio
+async def test_run_plan_records_errors():
+    async def fail():
+        raise ValueError("no data")
+
+    requests = [
+        sleep_request("forecast", "a", 0.01),
+        FetchRequest(kind="forecast", label="b", fetch=fail),
+    ]
+
+    result = await run_plan(requests)
+
+    assert len(result.frames("forecast")) == 1
+    assert result.error_messages == ["Failed to fetch b: no data"]
+    assert list(result.timings_df()["status"]) == ["OK", "ValueError"]
+    with pytest.raises(ValueError):
+        result.raise_first_error()
+
+
+@pytest.mark.asyncio
+async def test_run_plan_counts_rpcs_from_gathered_tasks():
+    client = ScheduledDataPlatformClient(FakeStub(), RpcScheduler(max_concurrency=1))
+
+    async def fetch_two_windows():
+        # like the chunkers, which gather a task per time window
+        await asyncio.gather(
+            client.GetForecastAsTimeseries(0.05), client.GetForecastAsTimeseries(0.05),
+        )
+        return pd.DataFrame()
+
+    requests = [
+        FetchRequest(kind="forecast", label="a", fetch=fetch_two_windows),
+        FetchRequest(kind="observation", label="b", fetch=fetch_two_windows),
+    ]
+
+    result = await run_plan(requests)
+
+    timings = result.timings_df()
+    assert list(timings["rpc_calls"]) == [2, 2]
+    assert (timings["rpc_seconds"] >= 0.09).all()
+    # with a budget of one RPC, the requests queue for each other
+    assert timings["queued_seconds"].sum() > 0.1
+
+
+def test_plan_page_requests():
+    forecasters = [
+        types.SimpleNamespace(forecaster_name="pvnet_v2"),
+        types.SimpleNamespace(forecaster_name="blend"),
+    ]
+    t0s = [dt.datetime(2025, 1, 1, tzinfo=dt.UTC), dt.datetime(2025, 1, 1, 1, tzinfo=dt.UTC)]
+    cfg = types.SimpleNamespace(
+        location=types.SimpleNamespace(location_uuid="uuid", location_type=1),
+        forecasters=forecasters,
+        start_date=t0s[0],
+        end_date=t0s[1],
+        forecast_horizon=0,
+        t0s=t0s,
+        all_horizons=False,
+        compare_versions=False,
+    )
+
+    requests = plan_page_requests(None, cfg, observers=["pvlive_in_day", "pvlive_day_after"])
+
+    assert [r.kind for r in requests] == ["forecast"] * 4 + ["observation"] * 2
+    assert requests[0].label == "pvnet_v2 at 2025-01-01T00:00:00+00:00"
+    assert requests[-1].label == "observations for pvlive_day_after"
+
+    cfg.t0s = None
+    labels = [r.label for r in plan_page_requests(None, cfg, observers=[])]
+    assert labels == ["pvnet_v2 at Latest", "blend at Latest"]
+
+
+def test_plan_page_requests_with_strategy():
+    t0s = [dt.datetime(2025, 1, 1, tzinfo=dt.UTC), dt.datetime(2025, 1, 3, tzinfo=dt.UTC)]
+    cfg = types.SimpleNamespace(
+        location=types.SimpleNamespace(location_uuid="uuid", location_type=1),
+        forecasters=[types.SimpleNamespace(forecaster_name="pvnet_v2")],
+        start_date=t0s[0],
+        end_date=t0s[1],
+        forecast_horizon=0,
+        t0s=t0s,
+        all_horizons=False,
+        compare_versions=False,
+    )
+    strategy = types.SimpleNamespace(
+        timeseries_keys=[t0s[1]], stream_windows=[(t0s[0], t0s[0] + dt.timedelta(minutes=1))],
+    )
+
+    requests = plan_page_requests(None, cfg, observers=[], strategy=strategy)
+
+    assert [r.label for r in requests] == [
+        "pvnet_v2 at 2025-01-03T00:00:00+00:00",
+        "stream of t0s from 2025-01-01T00:00:00+00:00",
+    ]
+
+
+def test_plan_page_requests_all_horizons():
+    cfg = types.SimpleNamespace(
+        location=types.SimpleNamespace(location_uuid="uuid", location_type=1),
+        forecasters=[
+            types.SimpleNamespace(forecaster_name="pvnet_v2"),
+            types.SimpleNamespace(forecaster_name="blend"),
+        ],
+        start_date=dt.datetime(2025, 1, 1, tzinfo=dt.UTC),
+        end_date=dt.datetime(2025, 1, 2, tzinfo=dt.UTC),
+        forecast_horizon=60,
+        t0s=None,
+        all_horizons=True,
+        compare_versions=False,
+    )
+
+    requests = plan_page_requests(None, cfg, observers=["pvlive_in_day"])
+
+    assert [r.label for r in requests] == [
+        "stream of all horizons", "observations for pvlive_in_day",
+    ]
@@ -0,0 +1,88 @@
+"""Tests for dataplatform/forecast/plot.py"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from dataplatform.forecast.plot import make_time_series_traces, plot_forecast_time_series
+
+init_times = pd.date_range("2025-06-01", periods=4, freq="1h", tz="UTC")
+
+
+def make_forecast_df(n_horizons: int = 8) -> pd.DataFrame:
+    rows = [
+        {
+            "forecaster_name": forecaster_name,
+            "initialization_timestamp_utc": init_time,
+            "horizon_mins": horizon_mins,
+            "target_timestamp_utc": init_time + pd.Timedelta(minutes=horizon_mins),
+            "p50_watts": 500 + horizon_mins,
+            "p10_watts": 400 + horizon_mins,
+            "p90_watts": 600 + horizon_mins,
+        }
+        for forecaster_name in ["pvnet_v2", "blend"]
+        for init_time in init_times
+        for horizon_mins in range(0, 30 * n_horizons, 30)
+    ]
+    return pd.DataFrame(rows)
+
+
+def make_observations_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "target_timestamp_utc": pd.date_range("2025-06-01", periods=12, freq="30min", tz="UTC"),
+            "observer_name": "pvlive_in_day",
+            "value_watts": 450.0,
+        },
+    )
+
+
+def plot(forecast_df: pd.DataFrame, forecast_type: str, **kwargs) -> go.Figure:
+    return plot_forecast_time_series(
+        all_forecast_data_df=forecast_df,
+        all_observations_df=make_observations_df(),
+        forecaster_names=["pvnet_v2", "blend"],
+        observer_names=["pvlive_in_day", "pvlive_day_after"],
+        scale_factor=1000,
+        units="kW",
+        selected_forecast_type=forecast_type,
+        selected_forecast_horizon=60,
+        selected_t0s=list(init_times[:2]),
+        **kwargs,
+    )
+
+
+def test_time_series_traces_share_x():
+    traces = make_time_series_traces(make_forecast_df(), "pvnet_v2", 1000, 0)
+
+    assert len(traces) == 3
+    assert traces[0]["x"] is traces[1]["x"] is traces[2]["x"]
+    assert traces[0]["x"].dtype == np.dtype("datetime64[ns]")
+    assert traces[2]["fill"] == "tonexty"
+
+
+def test_plot_forecast_time_series_current():
+    fig = plot(make_forecast_df(), "Current")
+
+    # two observers, then p50, p10 and p90 for each forecaster
+    assert len(fig.data) == 2 + 2 * 3
+    assert isinstance(fig.data[0], go.Scatter)
+    p50_trace = fig.data[2]
+    assert p50_trace.name == "pvnet_v2"
+    # init times are hourly, so the current forecast alternates horizons 0 and 30
+    np.testing.assert_allclose(p50_trace.y[:4], [0.5, 0.53, 0.5, 0.53])
+
+
+def test_plot_forecast_time_series_t0():
+    fig = plot(make_forecast_df(), "t0", show_probabilistic=False)
+
+    assert [trace.name for trace in fig.data[2:]] == [
+        f"{name} | t0: {t0}" for name in ["pvnet_v2", "blend"] for t0 in init_times[:2]
+    ]
+    assert all(len(trace.x) == 8 for trace in fig.data[2:])
+
+
+def test_plot_forecast_time_series_uses_webgl_for_large_figures():
+    fig = plot(make_forecast_df(n_horizons=5000), "t0")
+
+    assert all(isinstance(trace, go.Scattergl) for trace in fig.data)
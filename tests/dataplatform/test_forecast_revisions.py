@@ -0,0 +1,66 @@
+"""Tests for dataplatform/forecast/revisions.py"""
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.forecast.plot import plot_revision_heatmap
+from dataplatform.forecast.revisions import (
+    make_revision_heatmap,
+    make_revision_stats,
+    make_revisions,
+)
+from dataplatform.forecast.schema import compact, forecast_schema
+
+target = pd.Timestamp("2025-06-01 12:00", tz="UTC")
+
+
+def make_forecast_df() -> pd.DataFrame:
+    """Three forecasts of one target time per forecaster, shuffled."""
+    horizons = np.array([120, 60, 0])
+    df = pd.DataFrame(
+        {
+            "forecaster_name": ["pvnet_v2"] * 3 + ["blend"] * 3,
+            "target_timestamp_utc": target,
+            "horizon_mins": np.tile(horizons, 2),
+            "initialization_timestamp_utc": target - pd.to_timedelta(np.tile(horizons, 2), "min"),
+            "p50_watts": [100.0, 150.0, 120.0, 200.0, 200.0, 260.0],
+        },
+    )
+    return df.sample(frac=1, random_state=0)
+
+
+def test_make_revisions():
+    revisions_df = make_revisions(make_forecast_df())
+
+    pvnet_df = revisions_df[revisions_df["forecaster_name"] == "pvnet_v2"]
+    assert list(pvnet_df["horizon_mins"]) == [120, 60, 0]
+    np.testing.assert_array_equal(pvnet_df["revision_watts"], [np.nan, 50.0, -30.0])
+    assert make_revisions(pd.DataFrame()).empty
+
+
+def test_make_revision_stats():
+    forecast_df, _ = compact(make_forecast_df(), forecast_schema, "forecast_df")
+
+    stats_df = make_revision_stats(make_revisions(forecast_df), scale_factor=10).set_index(
+        "forecaster_name",
+    )
+
+    assert stats_df.loc["pvnet_v2", "revisions"] == 2
+    assert stats_df.loc["pvnet_v2", "target_times"] == 1
+    assert stats_df.loc["pvnet_v2", "mean_abs_revision"] == 4.0
+    assert stats_df.loc["pvnet_v2", "max_abs_revision"] == 5.0
+    assert stats_df.loc["pvnet_v2", "mean_abs_total_revision"] == 2.0
+    assert stats_df.loc["blend", "mean_revision"] == 3.0
+
+
+def test_revision_heatmap():
+    revisions_df = make_revisions(make_forecast_df())
+
+    heatmap_df = make_revision_heatmap(revisions_df, "blend")
+
+    assert list(heatmap_df.index) == [0, 60]
+    assert list(heatmap_df.columns) == [target]
+    assert heatmap_df.loc[0, target] == 60.0
+
+    fig = plot_revision_heatmap(heatmap_df, "blend", scale_factor=1, units="W")
+    assert fig.data[0].z.shape == (2, 1)
@@ -0,0 +1,210 @@
+"""Tests for dataplatform/forecast/scheduler.py"""
+
+import asyncio
+
+import grpc
+import pytest
+
+from dataplatform.forecast.scheduler import RpcScheduler, ScheduledDataPlatformClient
+
+
+def rpc_error(code: grpc.StatusCode) -> grpc.aio.AioRpcError:
+    return grpc.aio.AioRpcError(code, grpc.aio.Metadata(), grpc.aio.Metadata())
+
+
+class FakeStub:
+    """Fake stub that counts calls and the maximum number in flight."""
+
+    def __init__(self, errors: list | None = None, seconds: list | None = None):
+        self.errors = errors or []
+        self.seconds = seconds or []
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def GetForecastAsTimeseries(self, request, timeout=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            seconds = self.seconds.pop(0) if self.seconds else 0.01
+            await asyncio.sleep(seconds)
+            if self.errors:
+                raise self.errors.pop(0)
+            return request
+        finally:
+            self.in_flight -= 1
+
+    async def CreateLocation(self, request, timeout=None):
+        self.calls += 1
+        raise rpc_error(grpc.StatusCode.UNAVAILABLE)
+
+    async def StreamForecastData(self, request, timeout=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        for i in range(3):
+            yield i
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_concurrency():
+    stub = FakeStub()
+    client = ScheduledDataPlatformClient(stub, RpcScheduler(max_concurrency=2))
+
+    results = await asyncio.gather(*[client.GetForecastAsTimeseries(i) for i in range(10)])
+
+    assert results == list(range(10))
+    assert stub.max_in_flight == 2
+    assert len(client.scheduler.timings) == 10
+
+
+@pytest.mark.asyncio
+async def test_scheduler_retries_transient_errors():
+    stub = FakeStub(errors=[rpc_error(grpc.StatusCode.UNAVAILABLE)])
+    scheduler = RpcScheduler(backoff_seconds=0)
+    client = ScheduledDataPlatformClient(stub, scheduler)
+
+    assert await client.GetForecastAsTimeseries("request") == "request"
+    assert stub.calls == 2
+    assert scheduler.timings[0].attempts == 2
+    assert scheduler.timings[0].status == "OK"
+
+
+@pytest.mark.asyncio
+async def test_scheduler_does_not_retry_other_errors():
+    stub = FakeStub(errors=[rpc_error(grpc.StatusCode.NOT_FOUND)])
+    scheduler = RpcScheduler(backoff_seconds=0)
+    client = ScheduledDataPlatformClient(stub, scheduler)
+
+    with pytest.raises(grpc.aio.AioRpcError):
+        await client.GetForecastAsTimeseries("request")
+    assert stub.calls == 1
+    assert scheduler.timings_df()["status"].tolist() == ["NOT_FOUND"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_does_not_retry_writes():
+    stub = FakeStub()
+    client = ScheduledDataPlatformClient(stub, RpcScheduler(backoff_seconds=0))
+
+    with pytest.raises(grpc.aio.AioRpcError):
+        await client.CreateLocation("request")
+    assert stub.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_hedges_slow_requests():
+    # the first call is slow, so the hedge should come back first
+    stub = FakeStub(seconds=[5, 0.01])
+    scheduler = RpcScheduler(hedge_after_seconds=0.05)
+    client = ScheduledDataPlatformClient(stub, scheduler)
+
+    assert await asyncio.wait_for(client.GetForecastAsTimeseries("request"), 1) == "request"
+    assert stub.calls == 2
+    assert scheduler.timings[0].hedged
+
+
+@pytest.mark.asyncio
+async def test_scheduler_stream_retries_before_first_message():
+    stub = FakeStub(errors=[rpc_error(grpc.StatusCode.UNAVAILABLE)])
+    client = ScheduledDataPlatformClient(stub, RpcScheduler(backoff_seconds=0))
+
+    messages = [message async for message in client.StreamForecastData("request")]
+
+    assert messages == [0, 1, 2]
+    assert stub.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancels_hedged_requests_with_the_caller():
+    stub = FakeStub(seconds=[1.0, 1.0])
+    client = ScheduledDataPlatformClient(stub, RpcScheduler(hedge_after_seconds=0.01))
+
+    task = asyncio.ensure_future(client.GetForecastAsTimeseries("request"))
+    await asyncio.sleep(0.05)
+    assert stub.in_flight == 2
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0)
+
+    assert stub.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_stream_releases_slot_between_messages():
+    stub = FakeStub()
+    client = ScheduledDataPlatformClient(stub, RpcScheduler(max_concurrency=1))
+
+    async def slow_consumer():
+        async for _ in client.StreamForecastData("request"):
+            await asyncio.sleep(0.1)
+
+    consumer = asyncio.ensure_future(slow_consumer())
+    await asyncio.sleep(0.05)
+    # the stream is open, but its slot is free while the consumer handles a message
+    assert await asyncio.wait_for(client.GetForecastAsTimeseries("request"), 0.05) == "request"
+    await consumer
+
+
+class FakeStreamCall:
+    """Fake stream call that sends a message every `seconds`, and records the timeout."""
+
+    def __init__(self, seconds: float, timeout: float | None):
+        self.seconds = seconds
+        self.timeout = timeout
+        self.cancelled = False
+        self.sent = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(self.seconds)
+        self.sent += 1
+        return self.sent
+
+    def cancel(self) -> bool:
+        self.cancelled = True
+        return True
+
+
+@pytest.mark.asyncio
+async def test_scheduler_stream_has_no_deadline_but_cancels_when_stopped():
+    calls = []
+
+    def stream_rpc(request, timeout=None):
+        calls.append(FakeStreamCall(0.01, timeout))
+        return calls[-1]
+
+    scheduler = RpcScheduler(timeout_seconds=0.02)
+    messages = scheduler.stream("StreamForecastData", stream_rpc, "request")
+
+    # more messages than fit in the unary deadline still arrive
+    received = [await anext(messages) for _ in range(5)]
+    await messages.aclose()
+
+    assert received == [1, 2, 3, 4, 5]
+    assert calls[0].timeout is None
+    assert calls[0].cancelled
+    assert scheduler.semaphore._value == scheduler.max_concurrency
+
+
+@pytest.mark.asyncio
+async def test_scheduler_stream_idle_timeout():
+    calls = []
+
+    def stream_rpc(request, timeout=None):
+        calls.append(FakeStreamCall(1.0, timeout))
+        return calls[-1]
+
+    scheduler = RpcScheduler(stream_idle_timeout_seconds=0.01, max_retries=1, backoff_seconds=0)
+
+    with pytest.raises(grpc.aio.AioRpcError) as error:
+        [message async for message in scheduler.stream("StreamForecastData", stream_rpc, "r")]
+
+    assert error.value.code() == grpc.StatusCode.DEADLINE_EXCEEDED
+    # no message had arrived, so the stream was retried once
+    assert len(calls) == 2
+    assert all(call.cancelled for call in calls)
@@ -0,0 +1,106 @@
+"""Tests for dataplatform/forecast/schema.py"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.forecast.join import join_observations
+from dataplatform.forecast.plot import plot_forecast_time_series
+from dataplatform.forecast.schema import (
+    compact,
+    compaction_df,
+    forecast_schema,
+    observation_schema,
+)
+from dataplatform.forecast.selection import ForecastIndex
+
+targets = pd.date_range("2025-06-01", periods=48, freq="30min", tz="UTC")
+
+
+def make_forecast_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "target_timestamp_utc": np.tile(targets, 2),
+            "initialization_timestamp_utc": np.tile(targets, 2),
+            "effective_capacity_watts": 1_000_000,
+            "forecaster_name": ["pvnet_v2"] * 48 + ["blend"] * 48,
+            "location_uuid": "uuid",
+            "horizon_mins": np.zeros(96, dtype=np.int64),
+            "p50_watts": np.arange(96, dtype=np.int64) * 1000,
+            "p10_watts": np.arange(96, dtype=np.float64) * 900,
+        },
+    )
+
+
+def make_observations_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "target_timestamp_utc": targets,
+            "value_fraction": 0.5,
+            "effective_capacity_watts": 1_000_000,
+            "observer_name": "pvlive_in_day",
+            "location_uuid": "uuid",
+            "value_watts": 500_000,
+        },
+    )
+
+
+def test_compact_forecasts():
+    df, report = compact(make_forecast_df(), forecast_schema, "forecast_df")
+
+    assert isinstance(df["forecaster_name"].dtype, pd.CategoricalDtype)
+    assert df["horizon_mins"].dtype == np.int16
+    assert df["p50_watts"].dtype == np.float32
+    assert df["p10_watts"].dtype == np.float32
+    assert df["effective_capacity_watts"].dtype == np.float32
+    assert "location_uuid" not in df.columns
+    assert report.dropped_columns == ["location_uuid"]
+    assert report.rows == 96
+    assert report.saved_bytes > 0
+    assert report.bytes_after < report.bytes_before / 2
+
+
+def test_compact_keeps_horizons_that_do_not_fit_int16():
+    forecast_df = make_forecast_df()
+    forecast_df["horizon_mins"] = forecast_df["horizon_mins"].astype(float)
+    forecast_df.loc[0, "horizon_mins"] = np.nan
+
+    df, _ = compact(forecast_df, forecast_schema, "forecast_df")
+
+    assert df["horizon_mins"].dtype == np.float64
+
+
+def test_compact_empty_frames():
+    df, report = compact(pd.DataFrame(), forecast_schema, "forecast_df")
+
+    assert df.empty
+    assert report.rows == 0
+    assert list(compaction_df([report])["frame"]) == ["forecast_df"]
+
+
+def test_compacted_frames_join_select_and_plot():
+    forecast_df, _ = compact(make_forecast_df(), forecast_schema, "forecast_df")
+    observations_df, _ = compact(make_observations_df(), observation_schema, "observations_df")
+
+    merged_df = join_observations(forecast_df, observations_df)
+    assert len(merged_df) == 96
+    assert (merged_df["value_watts"] == 500_000).all()
+
+    index = ForecastIndex(forecast_df)
+    assert len(index.current()) == 96
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        fig = plot_forecast_time_series(
+            all_forecast_data_df=forecast_df,
+            all_observations_df=observations_df,
+            forecaster_names=["pvnet_v2", "blend"],
+            observer_names=["pvlive_in_day", "pvlive_day_after"],
+            scale_factor=1000,
+            units="kW",
+            selected_forecast_type="Current",
+            selected_forecast_horizon=0,
+            selected_t0s=None,
+        )
+    assert len(fig.data[0].x) == 48
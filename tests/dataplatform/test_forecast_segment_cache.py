@@ -0,0 +1,154 @@
+"""Tests for dataplatform/forecast/segment_cache.py"""
+
+import asyncio
+import threading
+import types
+from datetime import UTC, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from dataplatform.forecast import backend
+from dataplatform.forecast.segment_cache import SegmentCache, contiguous_runs, utc_days
+
+day_0 = datetime(2025, 6, 1, tzinfo=UTC)
+
+
+class FakeFetch:
+    """Fake fetch function, returning hourly data and recording the windows asked for."""
+
+    def __init__(self):
+        self.windows = []
+
+    async def __call__(self, start: datetime, end: datetime) -> pd.DataFrame:
+        self.windows.append((start, end))
+        timestamps = pd.date_range(start, end, freq="1h", inclusive="left")
+        return pd.DataFrame({"timestamp_utc": timestamps, "value": range(len(timestamps))})
+
+
+def test_utc_days():
+    days = utc_days(day_0 + timedelta(hours=12), day_0 + timedelta(days=2, hours=1))
+    assert days == [day_0, day_0 + timedelta(days=1), day_0 + timedelta(days=2)]
+
+
+def test_contiguous_runs():
+    days = [day_0, day_0 + timedelta(days=1), day_0 + timedelta(days=3)]
+    assert contiguous_runs(days) == [days[:2], days[2:]]
+
+
+@pytest.mark.asyncio
+async def test_segment_cache_only_fetches_missing_days():
+    cache = SegmentCache()
+    fetch = FakeFetch()
+
+    df = await cache.get("key", "uuid", day_0, day_0 + timedelta(days=1, hours=23), fetch, "timestamp_utc")
+    assert len(df) == 48
+    assert fetch.windows == [(day_0, day_0 + timedelta(days=2))]
+
+    # widen the window by one day, only the new day is fetched
+    df = await cache.get("key", "uuid", day_0, day_0 + timedelta(days=2, hours=23), fetch, "timestamp_utc")
+    assert len(df) == 72
+    assert df["timestamp_utc"].is_monotonic_increasing
+    assert fetch.windows[1] == (day_0 + timedelta(days=2), day_0 + timedelta(days=3))
+
+    # a window inside the cached days doesn't fetch anything, and is trimmed
+    df = await cache.get("key", "uuid", day_0 + timedelta(hours=6), day_0 + timedelta(hours=11), fetch, "timestamp_utc")
+    assert len(df) == 6
+    assert len(fetch.windows) == 2
+
+
+def test_segment_cache_ttl():
+    cache = SegmentCache(ttl_seconds=10, immutable_ttl_seconds=1000)
+    assert cache.ttl("uuid", day_0) == 10
+
+    cache.mark_immutable_before("uuid", day_0 + timedelta(days=1, hours=5))
+    assert cache.ttl("uuid", day_0) == 1000
+    assert cache.ttl("uuid", day_0 + timedelta(days=1)) == 10
+    # other locations haven't settled
+    assert cache.ttl("other", day_0) == 10
+
+
+def test_segment_cache_drops_least_recently_used():
+    df = pd.DataFrame({"value": range(100)})
+    n_bytes = int(df.memory_usage(deep=True).sum())
+    cache = SegmentCache(max_bytes=2 * n_bytes)
+
+    cache.set_segment("a", "uuid", day_0, df)
+    cache.set_segment("b", "uuid", day_0, df)
+    # reading "a" makes "b" the least recently used
+    cache.get_segment("a", "uuid", day_0)
+    cache.set_segment("c", "uuid", day_0, df)
+
+    assert list(cache.segments) == ["a", "c"]
+    assert cache.n_bytes == 2 * n_bytes
+
+
+def test_segment_cache_concurrent_writes():
+    cache = SegmentCache(ttl_seconds=-1)
+    df = pd.DataFrame({"value": range(10)})
+
+    def write(thread: int) -> None:
+        for i in range(500):
+            cache.set_segment(f"{thread}:{i}", "uuid", day_0, df)
+            # looks through every segment, while other threads store them
+            cache.mark_immutable_before("other", day_0 + timedelta(days=i))
+
+    threads = [threading.Thread(target=write, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # every segment had expired when the next was stored
+    assert len(cache.segments) <= 4
+    assert cache.n_bytes == sum(segment.n_bytes for segment in cache.segments.values())
+
+
+class FakeObservationsStub:
+    """Fake stub returning hourly observations up to a time, and counting its calls."""
+
+    def __init__(self, until: datetime):
+        self.until = until
+        self.calls = 0
+
+    async def GetObservationsAsTimeseries(self, request, timeout=None):
+        self.calls += 1
+        timestamps = pd.date_range(day_0, self.until, freq="1h").to_pydatetime()
+        values = [
+            types.SimpleNamespace(
+                timestamp_utc=types.SimpleNamespace(ToDatetime=lambda tzinfo, t=t: t),
+                value_fraction=0.5,
+                effective_capacity_watts=1000,
+            )
+            for t in timestamps
+        ]
+        return types.SimpleNamespace(values=values, location_uuid="uuid")
+
+
+@pytest.mark.asyncio
+async def test_day_after_observations_settle_days(monkeypatch):
+    cache = SegmentCache(ttl_seconds=0.05, immutable_ttl_seconds=1000)
+    monkeypatch.setattr(backend, "segment_cache", cache)
+    stub = FakeObservationsStub(until=day_0 + timedelta(days=1, hours=12))
+
+    df = await backend.fetch_observations_one(
+        stub, "uuid", day_0, day_0 + timedelta(days=2), "pvlive_day_after",
+    )
+    assert len(df) == 37
+    assert cache.immutable_before == {"uuid": day_0 + timedelta(days=1)}
+    n_calls = stub.calls
+    await asyncio.sleep(0.1)
+
+    # the settled day is served from the cache, past the live ttl
+    df = await backend.fetch_observations_one(
+        stub, "uuid", day_0, day_0 + timedelta(hours=23), "pvlive_day_after",
+    )
+    assert len(df) == 24
+    assert stub.calls == n_calls
+
+    # the live day is fetched again
+    await backend.fetch_observations_one(
+        stub, "uuid", day_0 + timedelta(days=1), day_0 + timedelta(days=1, hours=23),
+        "pvlive_day_after",
+    )
+    assert stub.calls > n_calls
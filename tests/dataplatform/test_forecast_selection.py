@@ -0,0 +1,119 @@
+"""Tests for dataplatform/forecast/selection.py"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataplatform.forecast.selection import ForecastIndex
+
+
+def make_forecast_df(n: int = 2000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    init_times = pd.Timestamp("2025-06-01", tz="UTC") + pd.to_timedelta(
+        rng.integers(0, 48, n) * 30, unit="min",
+    )
+    horizon_mins = rng.integers(0, 16, n) * 30
+    return pd.DataFrame(
+        {
+            "forecaster_name": rng.choice(["pvnet_v2", "blend"], n),
+            "initialization_timestamp_utc": init_times,
+            "horizon_mins": horizon_mins,
+            "target_timestamp_utc": init_times + pd.to_timedelta(horizon_mins, unit="min"),
+            "p50_watts": rng.integers(0, 1000, n),
+        },
+    )
+
+
+def groupby_idxmin(forecast_df: pd.DataFrame) -> pd.DataFrame:
+    """The previous selection, a groupby over the whole frame."""
+    return forecast_df.loc[
+        forecast_df.groupby(["target_timestamp_utc", "forecaster_name"])["horizon_mins"].idxmin()
+    ]
+
+
+def assert_same_rows(df: pd.DataFrame, expected_df: pd.DataFrame) -> None:
+    columns = ["forecaster_name", "target_timestamp_utc", "horizon_mins", "p50_watts"]
+    pd.testing.assert_frame_equal(
+        df[columns].sort_values(columns).reset_index(drop=True),
+        expected_df[columns].sort_values(columns).reset_index(drop=True),
+    )
+
+
+def test_current_matches_groupby():
+    forecast_df = make_forecast_df()
+    assert_same_rows(ForecastIndex(forecast_df).current(), groupby_idxmin(forecast_df))
+
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_horizon_matches_groupby(strict: bool):
+    forecast_df = make_forecast_df()
+    if strict:
+        expected_df = groupby_idxmin(forecast_df[forecast_df["horizon_mins"] == 120])
+    else:
+        expected_df = groupby_idxmin(forecast_df[forecast_df["horizon_mins"] >= 120])
+
+    assert_same_rows(ForecastIndex(forecast_df).horizon(120, strict=strict), expected_df)
+
+
+def test_selections_are_memoized():
+    forecast_index = ForecastIndex(make_forecast_df())
+
+    forecast_index.current()
+    forecast_index.horizon(60)
+    forecast_index.horizon(60)
+    forecast_index.horizon(60, strict=True)
+
+    # only the row positions are kept, not copies of the rows
+    assert list(forecast_index.selections) == [
+        ("current",), ("horizon", 60, False), ("horizon", 60, True),
+    ]
+    assert all(isinstance(rows, np.ndarray) for rows in forecast_index.selections.values())
+    assert_same_rows(forecast_index.current(), forecast_index.current())
+
+
+def test_t0s():
+    forecast_df = make_forecast_df()
+    t0 = forecast_df["initialization_timestamp_utc"].iloc[0]
+
+    t0_df = ForecastIndex(forecast_df).t0s([t0])
+
+    assert len(t0_df) == (forecast_df["initialization_timestamp_utc"] == t0).sum()
+
+
+def test_horizon_range():
+    forecast_df = make_forecast_df()
+    index = ForecastIndex(forecast_df)
+
+    band_df = index.horizon_range(60, 180)
+
+    expected_df = forecast_df[forecast_df["horizon_mins"].between(60, 180)]
+    assert_same_rows(band_df, expected_df)
+    assert ("horizon_range", 60, 180) in index.selections
+
+
+def groupby_as_of(forecast_df: pd.DataFrame, as_of: pd.Timestamp) -> pd.DataFrame:
+    """The latest created forecast by as_of, with a sort and groupby."""
+    created_df = forecast_df[forecast_df["created_timestamp_utc"] <= as_of]
+    return (
+        created_df.sort_values(["created_timestamp_utc", "initialization_timestamp_utc"])
+        .groupby(["forecaster_name", "target_timestamp_utc"])
+        .tail(1)
+    )
+
+
+@pytest.mark.parametrize("hours", [0, 5, 12, 30])
+def test_as_of_matches_groupby(hours: int):
+    forecast_df = make_forecast_df()
+    forecast_df["created_timestamp_utc"] = forecast_df["initialization_timestamp_utc"] + (
+        pd.Timedelta(minutes=10)
+    )
+    as_of = pd.Timestamp("2025-06-01", tz="UTC") + pd.Timedelta(hours=hours)
+
+    as_of_df = ForecastIndex(forecast_df).as_of(as_of)
+
+    assert_same_rows(as_of_df, groupby_as_of(forecast_df, as_of))
+    assert (as_of_df["created_timestamp_utc"] <= as_of).all()
+
+
+def test_as_of_without_created_times():
+    assert ForecastIndex(make_forecast_df()).as_of(pd.Timestamp("2025-06-02", tz="UTC")).empty
@@ -0,0 +1,79 @@
+"""Tests for dataplatform/forecast/strategy.py"""
+
+import datetime as dt
+
+from dataplatform.forecast.strategy import (
+    choose_horizon_strategy,
+    choose_t0_strategy,
+    consecutive_runs,
+    horizon_band,
+    n_intervals,
+)
+
+start = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+
+
+def t0s_from(first: dt.datetime, n: int) -> list[dt.datetime]:
+    return [first + dt.timedelta(minutes=30 * i) for i in range(n)]
+
+
+def test_n_intervals():
+    assert n_intervals(start, start) == 1
+    assert n_intervals(start, start + dt.timedelta(hours=1)) == 3
+    assert n_intervals(start, start - dt.timedelta(hours=1)) == 0
+
+
+def test_consecutive_runs():
+    t0s = t0s_from(start, 3) + t0s_from(start + dt.timedelta(days=1), 2)
+    assert [len(run) for run in consecutive_runs(t0s)] == [3, 2]
+
+
+def test_consecutive_t0s_are_streamed():
+    t0s = t0s_from(start, 10)
+
+    strategy = choose_t0_strategy(0, start, start + dt.timedelta(days=3), t0s, 1)
+
+    assert strategy.strategy == "stream"
+    assert strategy.stream_windows == [(t0s[0], t0s[-1] + dt.timedelta(minutes=1))]
+    assert strategy.timeseries_keys == []
+    assert strategy.chosen.stream_rpcs == 1
+    assert strategy.chosen.timeseries_rpcs == 0
+
+
+def test_few_t0s_far_apart_use_timeseries_calls():
+    t0s = [start, start + dt.timedelta(days=6)]
+
+    strategy = choose_t0_strategy(0, start, start + dt.timedelta(days=7), t0s, 1)
+
+    assert strategy.strategy == "timeseries"
+    assert strategy.timeseries_keys == t0s
+    assert strategy.stream_windows == []
+
+
+def test_clusters_of_t0s_use_hybrid():
+    cluster = t0s_from(start, 10)
+    later_cluster = t0s_from(start + dt.timedelta(days=13), 10)
+    isolated = start + dt.timedelta(days=7)
+
+    strategy = choose_t0_strategy(
+        0, start, start + dt.timedelta(days=14), [*cluster, isolated, *later_cluster], 1,
+    )
+
+    assert strategy.strategy == "hybrid"
+    assert [window[0] for window in strategy.stream_windows] == [cluster[0], later_cluster[0]]
+    assert strategy.timeseries_keys == [isolated]
+    assert set(strategy.options_df()["strategy"]) == {"timeseries", "stream", "hybrid"}
+    assert strategy.chosen.cost == strategy.options_df()["cost"].min()
+
+
+def test_narrow_horizon_band_uses_timeseries_calls():
+    end = start + dt.timedelta(days=7)
+
+    narrow = choose_horizon_strategy(0, start, end, horizon_band(0, 60), 1)
+    full = choose_horizon_strategy(0, start, end, horizon_band(0, 36 * 60), 1)
+
+    assert narrow.strategy == "timeseries"
+    assert narrow.timeseries_keys == [0, 30, 60]
+    assert full.strategy == "stream"
+    assert full.stream_windows == [(start, end)]
+    assert "Fetch plan: stream" in full.describe()
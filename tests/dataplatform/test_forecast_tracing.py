@@ -0,0 +1,104 @@
+"""Tests for dataplatform/forecast/tracing.py"""
+
+import asyncio
+import json
+import logging
+
+import pandas as pd
+import pytest
+
+from dataplatform.forecast.scheduler import RpcScheduler, ScheduledDataPlatformClient
+from dataplatform.forecast.tracing import (
+    Tracer,
+    current_tracer,
+    frame_bytes,
+    span,
+    spans_df,
+    stage_summary_df,
+)
+
+
+class FakeMessage:
+    """Fake protobuf message with a serialized size."""
+
+    def ByteSize(self):
+        return 100
+
+
+class FakeStub:
+    """Fake stub returning fake messages."""
+
+    async def GetForecastAsTimeseries(self, request, timeout=None):
+        await asyncio.sleep(0.01)
+        return FakeMessage()
+
+    async def StreamForecastData(self, request, timeout=None):
+        for _ in range(3):
+            yield FakeMessage()
+
+
+def test_span_records_rows_bytes_and_logs_json(caplog):
+    tracer = Tracer({"location_uuid": "uuid"})
+    token = current_tracer.set(tracer)
+    df = pd.DataFrame({"a": range(10)})
+    try:
+        with caplog.at_level(logging.INFO, logger="dataplatform.forecast.tracing"):
+            with span("merge", "join_observations", observer="pvlive") as merge_span:
+                merge_span.rows, merge_span.bytes = len(df), frame_bytes(df)
+    finally:
+        current_tracer.reset(token)
+
+    [merged] = tracer.spans
+    assert merged.stage == "merge"
+    assert merged.rows == 10
+    assert merged.bytes == frame_bytes(df)
+    assert merged.attributes == {"observer": "pvlive"}
+
+    line = json.loads(caplog.records[0].getMessage())
+    assert line["trace_id"] == tracer.trace_id
+    assert line["location_uuid"] == "uuid"
+    assert line["stage"] == "merge"
+    assert line["rows"] == 10
+
+
+def test_span_records_errors():
+    tracer = Tracer()
+    token = current_tracer.set(tracer)
+    try:
+        with pytest.raises(ValueError), span("decode", "GetForecastAsTimeseries"):
+            raise ValueError("bad data")
+    finally:
+        current_tracer.reset(token)
+
+    assert tracer.spans[0].status == "ValueError"
+
+
+def test_span_without_tracer():
+    with span("figure", "plot_quantile_plot") as figure_span:
+        figure_span.rows = 1
+
+    assert figure_span.seconds >= 0
+
+
+@pytest.mark.asyncio
+async def test_scheduled_rpcs_are_traced_from_gathered_tasks():
+    tracer = Tracer()
+    current_tracer.set(tracer)
+    client = ScheduledDataPlatformClient(FakeStub(), RpcScheduler())
+
+    await asyncio.gather(client.GetForecastAsTimeseries(1), client.GetForecastAsTimeseries(2))
+    messages = [message async for message in client.StreamForecastData(3)]
+
+    assert len(messages) == 3
+    df = spans_df(tracer.drain())
+    assert list(df["name"]) == [
+        "GetForecastAsTimeseries", "GetForecastAsTimeseries", "StreamForecastData",
+    ]
+    assert list(df["bytes"]) == [100, 100, 300]
+    assert df.iloc[2]["attributes"]["messages"] == 3
+    assert tracer.spans == []
+
+    summary = stage_summary_df(df)
+    assert summary.iloc[0]["stage"] == "rpc"
+    assert summary.iloc[0]["spans"] == 3
+    assert summary.iloc[0]["bytes"] == 500
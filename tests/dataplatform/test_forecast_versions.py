@@ -0,0 +1,191 @@
+"""Tests for dataplatform/forecast/versions.py"""
+
+import asyncio
+import datetime as dt
+import types
+
+import pandas as pd
+
+from dataplatform.forecast import versions
+from dataplatform.forecast.versions import (
+    StreamDeduper,
+    dedupe_forecasts,
+    forecaster_labels,
+    resolve_versions,
+    version_label,
+)
+
+start = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+end = dt.datetime(2025, 1, 8, tzinfo=dt.UTC)
+
+
+def make_forecaster(name: str, version: str) -> types.SimpleNamespace:
+    return types.SimpleNamespace(forecaster_name=name, forecaster_version=version)
+
+
+def test_forecaster_labels():
+    forecasters = [
+        make_forecaster("pvnet_v2", "1.0"),
+        make_forecaster("pvnet_v2", "1.1"),
+        make_forecaster("blend", "0.3"),
+    ]
+
+    assert version_label(forecasters[0]) == "pvnet_v2:1.0"
+    assert forecaster_labels(forecasters) == ["pvnet_v2", "blend"]
+    assert forecaster_labels(forecasters, compare_versions=True) == [
+        "pvnet_v2:1.0", "pvnet_v2:1.1", "blend:0.3",
+    ]
+
+
+def test_dedupe_forecasts_keeps_latest_created():
+    target = pd.Timestamp("2025-01-01 12:00", tz="UTC")
+    df = pd.DataFrame(
+        {
+            "forecaster_name": ["pvnet_v2", "pvnet_v2", "blend"],
+            "initialization_timestamp_utc": [target] * 3,
+            "target_timestamp_utc": [target] * 3,
+            "created_timestamp_utc": [
+                target, target + pd.Timedelta(minutes=5), target,
+            ],
+            "p50_watts": [1.0, 2.0, 3.0],
+        },
+    )
+
+    deduped_df, n_dropped = dedupe_forecasts(df)
+
+    assert n_dropped == 1
+    assert sorted(deduped_df["p50_watts"]) == [2.0, 3.0]
+    assert dedupe_forecasts(pd.DataFrame())[1] == 0
+
+
+def test_stream_deduper_drops_duplicates_across_batches():
+    target = pd.Timestamp("2025-01-01 12:00", tz="UTC")
+    deduper = StreamDeduper()
+
+    def batch(hours: list[int], p50: float) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "forecaster_name": ["pvnet_v2"] * len(hours),
+                "initialization_timestamp_utc": [target] * len(hours),
+                "target_timestamp_utc": [target + pd.Timedelta(hours=h) for h in hours],
+                "p50_watts": [p50] * len(hours),
+            },
+        )
+
+    n_rows = 0
+    n_dropped = 0
+    # each batch repeats the target times of the one before, from another version
+    for i in range(10):
+        deduped_df, dropped = deduper.dedupe(batch([i, i + 1], float(i)))
+        n_rows += len(deduped_df)
+        n_dropped += dropped
+
+    assert n_rows == 11
+    assert n_dropped == 9
+    # the seen keys are merged into a few sorted arrays
+    assert len(deduper.seen_hashes) <= 4
+
+
+def test_resolve_versions(monkeypatch):
+    forecasters = [
+        make_forecaster("pvnet_v2", "1.0"),
+        make_forecaster("pvnet_v2", "1.1"),
+        make_forecaster("pvnet_v2", "1.2"),
+        make_forecaster("blend", "0.3"),
+        make_forecaster("old", "0.1"),
+        make_forecaster("old", "0.2"),
+    ]
+    probes = []
+
+    async def fake_stream(client, location_uuid, start_date, end_date, forecasters, keep_versions):
+        probes.append(([version_label(f) for f in forecasters], keep_versions))
+        # 1.0 has data at the start of the window, and 1.2 at the end
+        label = "pvnet_v2:1.0" if start_date == start else "pvnet_v2:1.2"
+        yield pd.DataFrame({"forecaster_name": [label]})
+
+    monkeypatch.setattr(versions, "stream_all_forecasts", fake_stream)
+
+    resolution = asyncio.run(resolve_versions(None, "uuid", start, end, forecasters))
+
+    assert [version_label(f) for f in resolution.forecasters] == [
+        "pvnet_v2:1.0", "pvnet_v2:1.2", "blend:0.3", "old:0.1", "old:0.2",
+    ]
+    assert resolution.dropped == ["pvnet_v2:1.1"]
+    # a probe every 12 hours, and one just before the end
+    assert resolution.probe_rpcs == 15
+    # forecasters with one version aren't probed
+    assert all("blend:0.3" not in labels and keep for labels, keep in probes)
+
+
+def test_resolve_versions_without_duplicates_skips_probes():
+    forecasters = [make_forecaster("pvnet_v2", "1.0"), make_forecaster("blend", "0.3")]
+
+    resolution = asyncio.run(resolve_versions(None, "uuid", start, end, forecasters))
+
+    assert resolution.forecasters == forecasters
+    assert resolution.probe_rpcs == 0
+
+
+def test_resolve_versions_keeps_version_with_data_mid_window(monkeypatch):
+    forecasters = [make_forecaster("pvnet_v2", "1.0"), make_forecaster("pvnet_v2", "1.1")]
+    mid_window = start + dt.timedelta(days=3)
+
+    async def fake_stream(client, location_uuid, start_date, end_date, forecasters, keep_versions):
+        label = "pvnet_v2:1.1" if start_date <= mid_window < end_date else "pvnet_v2:1.0"
+        yield pd.DataFrame({"forecaster_name": [label]})
+
+    monkeypatch.setattr(versions, "stream_all_forecasts", fake_stream)
+
+    resolution = asyncio.run(resolve_versions(None, "uuid", start, end, forecasters))
+
+    assert resolution.forecasters == forecasters
+    assert resolution.dropped == []
+
+
+def test_resolve_versions_probes_up_to_now(monkeypatch):
+    forecasters = [make_forecaster("pvnet_v2", "1.0"), make_forecaster("pvnet_v2", "1.1")]
+    now = dt.datetime.now(dt.UTC)
+    probe_ends = []
+
+    async def fake_stream(client, location_uuid, start_date, end_date, forecasters, keep_versions):
+        probe_ends.append(end_date)
+        yield pd.DataFrame({"forecaster_name": ["pvnet_v2:1.0"]})
+
+    monkeypatch.setattr(versions, "stream_all_forecasts", fake_stream)
+
+    resolution = asyncio.run(
+        resolve_versions(
+            None, "uuid", now - dt.timedelta(days=1), now + dt.timedelta(days=2), forecasters,
+        ),
+    )
+
+    assert resolution.dropped == ["pvnet_v2:1.1"]
+    assert max(probe_ends) <= dt.datetime.now(dt.UTC)
+    # a window starting in the future can't be probed, so all versions are kept
+    future = asyncio.run(
+        resolve_versions(
+            None, "uuid", now + dt.timedelta(days=1), now + dt.timedelta(days=2), forecasters,
+        ),
+    )
+    assert future.forecasters == forecasters
+    assert future.probe_rpcs == 0
+
+
+def test_resolve_versions_spreads_probes_through_long_window(monkeypatch):
+    forecasters = [make_forecaster("pvnet_v2", "1.0"), make_forecaster("pvnet_v2", "1.1")]
+    probe_starts = []
+
+    async def fake_stream(client, location_uuid, start_date, end_date, forecasters, keep_versions):
+        probe_starts.append(start_date)
+        yield pd.DataFrame({"forecaster_name": ["pvnet_v2:1.0"]})
+
+    monkeypatch.setattr(versions, "stream_all_forecasts", fake_stream)
+
+    resolution = asyncio.run(
+        resolve_versions(None, "uuid", start, start + dt.timedelta(days=30), forecasters),
+    )
+
+    assert resolution.dropped == ["pvnet_v2:1.1"]
+    assert resolution.probe_rpcs == versions.probe_max_rpcs
+    assert min(probe_starts) == start
+    assert max(probe_starts) == start + dt.timedelta(days=30) - versions.probe_window
@@ -0,0 +1,71 @@
+"""Tests for export.py"""
+
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import export
+from export import data_fingerprint, export_file
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "export_dir", tmp_path)
+    monkeypatch.setattr(export, "export_chunk_rows", 7)
+    return tmp_path
+
+
+def make_df(n: int = 30) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "target_timestamp_utc": pd.date_range("2025-06-01", periods=n, freq="30min", tz="UTC"),
+            "forecaster_name": "pvnet_v2",
+            "p50_watts": np.arange(n, dtype=float),
+        },
+    )
+
+
+def test_data_fingerprint():
+    df = make_df()
+    assert data_fingerprint(df) == data_fingerprint(df.copy())
+
+    changed_df = df.copy()
+    changed_df.loc[3, "p50_watts"] = -1
+    assert data_fingerprint(df) != data_fingerprint(changed_df)
+
+
+def test_export_csv_gzip():
+    df = make_df()
+
+    with gzip.open(export_file(df, "CSV (gzip)", index=False)) as f:
+        exported_df = pd.read_csv(f, parse_dates=["target_timestamp_utc"])
+
+    pd.testing.assert_frame_equal(exported_df, df)
+
+
+def test_export_parquet():
+    df = make_df()
+
+    exported_df = pd.read_parquet(export_file(df, "Parquet"))
+
+    pd.testing.assert_frame_equal(exported_df, df)
+
+
+def test_export_reuses_file(export_dir):
+    df = make_df()
+
+    path = export_file(df, "Parquet")
+    assert export_file(df.copy(), "Parquet") == path
+
+    assert len(list(export_dir.iterdir())) == 1
+
+
+def test_export_evicts_old_files(export_dir, monkeypatch):
+    monkeypatch.setattr(export, "max_cached_exports", 2)
+
+    for n in [10, 11, 12]:
+        export_file(make_df(n), "CSV (gzip)")
+
+    assert len(list(export_dir.iterdir())) == 2